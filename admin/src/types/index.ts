@@ -159,6 +159,7 @@ export interface Product {
   price: string
   stock: number
   is_active: boolean
+  is_flash_sale: boolean
   sort_order: number
   category: Category | null
   primary_image: string | null
@@ -176,6 +177,8 @@ export interface InventoryItem {
   content: string
   is_sold: boolean
   sold_at: string | null
+  reserved_by_order_id?: number | null
+  reserved_until?: string | null
   created_at: string
   updated_at: string
 }
@@ -7,7 +7,13 @@ from tortoise.expressions import Q
 
 from app.core.exceptions import BadRequestException, NotFoundException
 from app.core.logger import logger
-from app.core.response import PaginatedData, ResponseModel, success_response
+from app.core.middleware import invalidate_response_cache
+from app.core.response import (
+    CursorPaginatedData,
+    PaginatedData,
+    ResponseModel,
+    success_response,
+)
 from app.models.order import Order, OrderLog
 from app.schemas.order import (
     OrderDetailResponse,
@@ -18,10 +24,15 @@ from app.schemas.order import (
     OrderUpdate,
 )
 from app.services.delivery import DeliveryService
-from app.utils.common import paginate
+from app.services.order import OrderService
+from app.utils.cache import CACHE_TAG_PRODUCTS
+from app.utils.common import paginate, paginate_cursor
 
 router = APIRouter()
 
+# 订单列表排序，id 保证排序键唯一（游标分页需要）
+ORDER_LIST_ORDER = ["-created_at", "-id"]
+
 
 async def _get_order_detail(order_id: int) -> OrderDetailResponse:
     order = await Order.filter(id=order_id).first()
@@ -59,6 +70,10 @@ async def get_orders(
     product_id: int | None = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(
+        None,
+        description="游标分页: 传空值获取第一页，之后传上一页返回的 next_cursor；不传则按页码分页",
+    ),
 ):
     logger.info(
         f"获取订单列表(管理): status={status}, search={search}, "
@@ -106,7 +121,18 @@ async def get_orders(
         order_ids = await OrderItem.filter(product_id=product_id).values_list("order_id", flat=True)
         query = query.filter(id__in=list(order_ids))
 
-    query = query.order_by("-created_at")
+    if cursor is not None:
+        items, next_cursor = await paginate_cursor(query, ORDER_LIST_ORDER, cursor, page_size)
+        logger.info(f"获取到 {len(items)} 个订单, has_more={next_cursor is not None}")
+        data = CursorPaginatedData(
+            items=[OrderListResponse.model_validate(item) for item in items],
+            page_size=page_size,
+            next_cursor=next_cursor,
+            has_more=next_cursor is not None,
+        )
+        return success_response(data=data)
+
+    query = query.order_by(*ORDER_LIST_ORDER)
     items, total, pages = await paginate(query, page, page_size)
 
     logger.info(f"获取到 {len(items)} 个订单, 共 {total} 条")
@@ -185,6 +211,7 @@ async def deliver_order(order_id: int, remark: str | None = None, item_ids: str
     if not success:
         raise BadRequestException(message=message)
 
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     return success_response(message=message)
 
 
@@ -199,22 +226,9 @@ async def cancel_order(order_id: int):
     if order.status != OrderStatus.PENDING:
         raise BadRequestException(message="只有待支付的订单可以取消")
 
-    await order.fetch_related("items")
-    for item in order.items:
-        await item.fetch_related("product")
-        product = item.product
-        product.stock += item.quantity
-        await product.save()
-
-    order.status = OrderStatus.CANCELLED
-    await order.save()
-
-    await OrderLog.create(
-        order=order,
-        action="cancel",
-        content="订单已取消",
-        operator="admin",
-    )
+    # 恢复库存、释放预留卡密、清理待支付数据
+    if not await OrderService.cancel_order(order=order, operator="admin"):
+        raise BadRequestException(message="订单状态已变化，无法取消")
 
     logger.info(f"订单取消成功: order_no={order.order_no}")
     return success_response(message="订单已取消")
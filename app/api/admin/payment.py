@@ -3,10 +3,15 @@
 from fastapi import APIRouter
 
 from app.core.logger import logger
+from app.core.middleware import get_response_cache
+from app.core.rate_limit import get_rate_limit_stats, reset_rate_limit_stats
 from app.core.response import ResponseModel, success_response
 from app.services.payment.registry import get_registry
+from app.utils.cache import get_cache_stats
+from app.utils.cache_metrics import get_cache_metrics
 from app.utils.redis_client import (
     get_all_pending_orders,
+    get_redis_manager,
     get_scan_logs,
     get_scan_logs_count,
 )
@@ -63,6 +68,42 @@ async def get_payment_scan_logs(limit: int = 50, offset: int = 0):
     )
 
 
+@router.get("/cache-stats", response_model=ResponseModel, summary="获取缓存统计")
+async def get_cache_statistics():
+    """获取缓存统计（当前 worker）：各命名空间命中率、后端延迟、写入体积，Redis 熔断状态"""
+    response_cache = get_response_cache()
+    return success_response(
+        data={
+            **get_cache_stats(),
+            "response_cache": {
+                "entries": len(response_cache.entries),
+                "max_entries": response_cache.max_entries,
+            },
+            "redis": get_redis_manager().stats(),
+        }
+    )
+
+
+@router.post("/cache-stats/reset", response_model=ResponseModel, summary="重置缓存统计")
+async def reset_cache_statistics():
+    """重置当前 worker 的缓存指标计数"""
+    get_cache_metrics().reset()
+    return success_response(message="缓存统计已重置")
+
+
+@router.get("/rate-limit-stats", response_model=ResponseModel, summary="获取限流统计")
+async def get_rate_limit_statistics():
+    """获取限流统计（当前 worker）：各规则放行/拒绝次数，Redis 不可用时的降级次数"""
+    return success_response(data=get_rate_limit_stats())
+
+
+@router.post("/rate-limit-stats/reset", response_model=ResponseModel, summary="重置限流统计")
+async def reset_rate_limit_statistics():
+    """重置当前 worker 的限流计数"""
+    reset_rate_limit_stats()
+    return success_response(message="限流统计已重置")
+
+
 @router.post("/reload", response_model=ResponseModel, summary="重新加载支付提供者")
 async def reload_payment_providers():
     """重新加载支付提供者（配置变更后调用）"""
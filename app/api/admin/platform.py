@@ -4,6 +4,7 @@ from fastapi import APIRouter
 
 from app.core.exceptions import BadRequestException, NotFoundException
 from app.core.logger import logger
+from app.core.middleware import invalidate_response_cache
 from app.core.response import ResponseModel, success_response
 from app.models.platform import (
     Announcement,
@@ -28,6 +29,7 @@ from app.schemas.platform import (
     PlatformConfigResponse,
     PlatformConfigUpdate,
 )
+from app.utils.cache import CACHE_TAG_PLATFORM
 
 router = APIRouter()
 
@@ -74,6 +76,7 @@ async def create_platform_config(data: PlatformConfigCreate):
     if await PlatformConfig.filter(key=data.key).exists():
         raise BadRequestException(message="配置键已存在")
     config = await PlatformConfig.create(**data.model_dump())
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"平台配置创建成功: id={config.id}")
     return success_response(data=PlatformConfigResponse.model_validate(config))
 
@@ -86,6 +89,7 @@ async def update_platform_config(key: str, data: PlatformConfigUpdate):
         raise NotFoundException(message="配置不存在")
     update_data = data.model_dump(exclude_unset=True)
     await config.update_from_dict(update_data).save()
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"平台配置更新成功: key={key}")
     return success_response(data=PlatformConfigResponse.model_validate(config))
 
@@ -182,6 +186,7 @@ async def create_announcement(data: AnnouncementCreate):
     if data.is_popup:
         await Announcement.filter(is_popup=True).update(is_popup=False)
     announcement = await Announcement.create(**data.model_dump())
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"公告创建成功: id={announcement.id}")
     return success_response(data=AnnouncementResponse.model_validate(announcement))
 
@@ -198,6 +203,7 @@ async def update_announcement(announcement_id: int, data: AnnouncementUpdate):
         await Announcement.filter(is_popup=True).exclude(id=announcement_id).update(is_popup=False)
 
     await announcement.update_from_dict(update_data).save()
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"公告更新成功: id={announcement_id}")
     return success_response(data=AnnouncementResponse.model_validate(announcement))
 
@@ -208,6 +214,7 @@ async def delete_announcement(announcement_id: int):
     deleted = await Announcement.filter(id=announcement_id).delete()
     if not deleted:
         raise NotFoundException(message="公告不存在")
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"公告删除成功: id={announcement_id}")
     return success_response(message="删除成功")
 
@@ -225,6 +232,7 @@ async def get_banners():
 async def create_banner(data: BannerCreate):
     logger.info(f"创建Banner: title={data.title}")
     banner = await Banner.create(**data.model_dump())
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"Banner创建成功: id={banner.id}")
     return success_response(data=BannerResponse.model_validate(banner))
 
@@ -237,6 +245,7 @@ async def update_banner(banner_id: int, data: BannerUpdate):
         raise NotFoundException(message="Banner不存在")
     update_data = data.model_dump(exclude_unset=True)
     await banner.update_from_dict(update_data).save()
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"Banner更新成功: id={banner_id}")
     return success_response(data=BannerResponse.model_validate(banner))
 
@@ -247,6 +256,7 @@ async def delete_banner(banner_id: int):
     deleted = await Banner.filter(id=banner_id).delete()
     if not deleted:
         raise NotFoundException(message="Banner不存在")
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"Banner删除成功: id={banner_id}")
     return success_response(message="删除成功")
 
@@ -264,6 +274,7 @@ async def get_footer_links():
 async def create_footer_link(data: FooterLinkCreate):
     logger.info(f"创建底部链接: title={data.title}")
     link = await FooterLink.create(**data.model_dump())
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"底部链接创建成功: id={link.id}")
     return success_response(data=FooterLinkResponse.model_validate(link))
 
@@ -276,6 +287,7 @@ async def update_footer_link(link_id: int, data: FooterLinkUpdate):
         raise NotFoundException(message="链接不存在")
     update_data = data.model_dump(exclude_unset=True)
     await link.update_from_dict(update_data).save()
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"底部链接更新成功: id={link_id}")
     return success_response(data=FooterLinkResponse.model_validate(link))
 
@@ -286,5 +298,6 @@ async def delete_footer_link(link_id: int):
     deleted = await FooterLink.filter(id=link_id).delete()
     if not deleted:
         raise NotFoundException(message="链接不存在")
+    await invalidate_response_cache(CACHE_TAG_PLATFORM)
     logger.info(f"底部链接删除成功: id={link_id}")
     return success_response(message="删除成功")
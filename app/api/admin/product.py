@@ -1,9 +1,11 @@
 """商品管理API"""
 
 from fastapi import APIRouter, Query
+from tortoise.transactions import in_transaction
 
 from app.core.exceptions import BadRequestException, NotFoundException
 from app.core.logger import logger
+from app.core.middleware import invalidate_response_cache
 from app.core.response import PaginatedData, ResponseModel, success_response
 from app.models.product import (
     Category,
@@ -34,11 +36,22 @@ from app.schemas.product import (
     ProductIntroUpdate,
     ProductListResponse,
     ProductTagResponse,
+    ProductType,
     ProductUpdate,
 )
+from app.services.category import invalidate_category_tree
 from app.services.delivery import DeliveryService
-from app.utils.cache import get_tag_suggestions, update_tag_suggestions
-from app.utils.common import paginate
+from app.services.flash_sale import FlashItem, FlashSaleService
+from app.services.product import (
+    get_primary_image_url,
+    invalidate_all_product_details,
+    invalidate_product_detail,
+    invalidate_product_detail_by_id,
+)
+from app.services.search import get_search_backend
+from app.services.tag_facet import invalidate_tag_facets, sync_product_tags
+from app.utils.cache import CACHE_TAG_PRODUCTS, get_tag_suggestions, update_tag_suggestions
+from app.utils.common import paginate, paginate_ids
 
 router = APIRouter()
 
@@ -78,6 +91,8 @@ async def create_category(data: CategoryCreate):
             raise BadRequestException(message="只支持两级分类")
 
     category = await Category.create(**data.model_dump())
+    await invalidate_category_tree()
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"分类创建成功: id={category.id}")
     return success_response(data=CategoryResponse.model_validate(category))
 
@@ -117,8 +132,13 @@ async def update_category(category_id: int, data: CategoryUpdate):
             f"分类已禁用，自动下架商品: category_id={category_id}, "
             f"子分类数={len(child_ids)}, 下架商品数={affected + child_affected}"
         )
+        if affected + child_affected:
+            await invalidate_tag_facets()
 
     await category.update_from_dict(update_data).save()
+    await invalidate_category_tree()
+    await invalidate_all_product_details()
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"分类更新成功: id={category_id}")
     return success_response(data=CategoryResponse.model_validate(category))
 
@@ -152,6 +172,9 @@ async def delete_category(category_id: int):
             f"分类下商品已全部下架，已清空商品分类: category_id={category_id}"
         )
     await category.delete()
+    await invalidate_category_tree()
+    await invalidate_all_product_details()
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"分类删除成功: id={category_id}")
     return success_response(message="删除成功")
 
@@ -169,6 +192,7 @@ async def get_payment_methods():
 async def create_payment_method(data: PaymentMethodCreate):
     logger.info(f"创建支付方式: name={data.name}")
     method = await PaymentMethod.create(**data.model_dump())
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"支付方式创建成功: id={method.id}")
     return success_response(data=PaymentMethodAdminResponse.model_validate(method))
 
@@ -181,6 +205,8 @@ async def update_payment_method(method_id: int, data: PaymentMethodUpdate):
         raise NotFoundException(message="支付方式不存在")
     update_data = data.model_dump(exclude_unset=True)
     await method.update_from_dict(update_data).save()
+    await invalidate_all_product_details()
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"支付方式更新成功: id={method_id}")
     return success_response(data=PaymentMethodAdminResponse.model_validate(method))
 
@@ -191,6 +217,8 @@ async def delete_payment_method(method_id: int):
     deleted = await PaymentMethod.filter(id=method_id).delete()
     if not deleted:
         raise NotFoundException(message="支付方式不存在")
+    await invalidate_all_product_details()
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"支付方式删除成功: id={method_id}")
     return success_response(message="删除成功")
 
@@ -235,14 +263,12 @@ async def _get_product_detail(product_id: int) -> ProductDetailResponse:
         price=product.price,
         stock=product.stock,
         is_active=product.is_active,
+        is_flash_sale=product.is_flash_sale,
         sort_order=product.sort_order,
         created_at=product.created_at,
         updated_at=product.updated_at,
         category=CategoryResponse.model_validate(product.category) if product.category else None,
-        primary_image=next(
-            (img.image_url for img in product.images if img.is_primary),
-            product.images[0].image_url if product.images else None,
-        ),
+        primary_image=product.primary_image_url,
         images=[ProductImageResponse.model_validate(img) for img in product.images],
         tags=[ProductTagResponse.model_validate(tag) for tag in product.tags],
         intros=[ProductIntroResponse.model_validate(intro) for intro in product.intros],
@@ -267,19 +293,21 @@ async def get_products(
         query = query.filter(category_id=category_id)
     if is_active is not None:
         query = query.filter(is_active=is_active)
+    ranked_ids = None
     if search:
-        query = query.filter(name__icontains=search)
+        query, ranked_ids = await get_search_backend().apply(query, search)
+
+    if ranked_ids is not None:
+        items, total, pages = await paginate_ids(query, ranked_ids, page, page_size)
+    else:
+        query = query.order_by("sort_order", "-created_at")
+        items, total, pages = await paginate(query, page, page_size)
 
-    query = query.order_by("sort_order", "-created_at")
-    items, total, pages = await paginate(query, page, page_size)
+    # 整页批量加载关联数据：每个关联一条查询，避免逐个商品 fetch_related
+    await Product.fetch_for_list(items, "category", "tags")
 
     result = []
     for item in items:
-        await item.fetch_related("category", "images", "tags")
-        primary_image = next((img for img in item.images if img.is_primary), None)
-        if not primary_image and item.images:
-            primary_image = item.images[0]
-
         item_dict = ProductListResponse(
             id=item.id,
             name=item.name,
@@ -288,10 +316,11 @@ async def get_products(
             price=item.price,
             stock=item.stock,
             is_active=item.is_active,
+            is_flash_sale=item.is_flash_sale,
             created_at=item.created_at,
             updated_at=item.updated_at,
             category=CategoryResponse.model_validate(item.category) if item.category else None,
-            primary_image=primary_image.image_url if primary_image else None,
+            primary_image=item.primary_image_url,
             tags=[ProductTagResponse.model_validate(tag) for tag in item.tags],
         ).model_dump()
         result.append(item_dict)
@@ -331,10 +360,26 @@ async def create_product(data: ProductCreate):
             raise BadRequestException(message=f"支付方式ID {pm_id} 不存在")
         payment_methods.append(pm)
 
+    if data.is_flash_sale:
+        await FlashSaleService.ensure_available()
+
+    # 秒杀模式在卡密写入后开启，按最终库存建立 Redis 计数器
     product_data = data.model_dump(
-        exclude={"payment_method_ids", "images", "tags", "intros", "inventory_contents"}
+        exclude={
+            "payment_method_ids",
+            "images",
+            "tags",
+            "intros",
+            "inventory_contents",
+            "is_flash_sale",
+        }
     )
-    product = await Product.create(**product_data)
+    # 搜索索引与商品在同一事务中写入，保存失败时不会留下孤立的索引
+    async with in_transaction():
+        product = await Product.create(
+            **product_data, primary_image_url=get_primary_image_url(data.images)
+        )
+        await get_search_backend().index_product(product.id, product.name)
 
     await product.payment_methods.add(*payment_methods)
 
@@ -348,20 +393,38 @@ async def create_product(data: ProductCreate):
     if data.tags:
         await update_tag_suggestions([t.model_dump() for t in data.tags])
 
+    # 更新标签筛选索引
+    await sync_product_tags(
+        product.id,
+        old_tags=[],
+        new_tags=[(t.key, t.value) for t in data.tags],
+        was_active=False,
+        is_active=product.is_active,
+    )
+
     for intro_data in data.intros:
         await ProductIntro.create(product=product, **intro_data.model_dump())
 
     # 创建虚拟商品卡密
     if data.product_type == "virtual" and data.inventory_contents:
-        for content in data.inventory_contents:
-            await InventoryItem.create(product=product, content=content)
-        # 更新库存数量
-        product.stock = len(data.inventory_contents)
-        await product.save()
+        count = len(data.inventory_contents)
+        async with in_transaction():
+            await InventoryItem.bulk_create(
+                [
+                    InventoryItem(product_id=product.id, content=content)
+                    for content in data.inventory_contents
+                ]
+            )
+            # 更新库存数量
+            await DeliveryService.adjust_virtual_stock(product.id, count)
         logger.info(f"已添加 {len(data.inventory_contents)} 条卡密")
 
+    if data.is_flash_sale:
+        await FlashSaleService.enable(product.id)
+
     logger.info(f"商品创建成功: id={product.id}")
     response_data = await _get_product_detail(product.id)
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     return success_response(data=response_data)
 
 
@@ -385,7 +448,36 @@ async def update_product(product_id: int, data: ProductUpdate):
         if not await Category.filter(id=update_data["category_id"]).exists():
             raise BadRequestException(message="分类不存在")
 
-    await product.update_from_dict(update_data).save()
+    # 秒杀模式切换单独处理：开启需先建立计数器，关闭需先写回 Redis 中的扣减
+    flash_sale = update_data.pop("is_flash_sale", None)
+    if flash_sale and not product.is_flash_sale:
+        await FlashSaleService.ensure_available()
+    elif flash_sale is False and product.is_flash_sale:
+        await FlashSaleService.disable(product_id)
+        product.is_flash_sale = False
+    if product.is_flash_sale and "stock" in update_data:
+        # 秒杀模式下库存以 Redis 计数器为准，修改库存需先关闭秒杀模式
+        logger.warning(f"秒杀模式商品忽略库存修改: id={product_id}")
+        update_data.pop("stock")
+
+    was_active = product.is_active
+    old_slug = product.slug
+    old_tags = await ProductTag.filter(product_id=product_id).values_list("key", "value")
+
+    # 只写回本次修改的字段，避免覆盖并发更新的库存计数器；搜索索引在同一事务中更新
+    async with in_transaction():
+        await product.update_from_dict(update_data).save(
+            update_fields=[*update_data, "updated_at"]
+        )
+        if "name" in update_data:
+            await get_search_backend().index_product(product_id, product.name)
+
+    if flash_sale and not product.is_flash_sale:
+        await FlashSaleService.enable(product_id)
+        product.is_flash_sale = True
+    elif product.is_flash_sale and "product_type" in update_data:
+        # 商品类型决定计数器对应的库存字段，重新对账
+        await FlashSaleService.sync(product_id)
 
     # 更新支付方式
     if data.payment_method_ids is not None:
@@ -397,11 +489,15 @@ async def update_product(product_id: int, data: ProductUpdate):
                 payment_methods.append(pm)
         await product.payment_methods.add(*payment_methods)
 
-    # 更新商品图片
+    # 更新商品图片，主图字段与图片在同一事务中更新
     if data.images is not None:
-        await ProductImage.filter(product_id=product_id).delete()
-        for img_data in data.images:
-            await ProductImage.create(product=product, **img_data.model_dump())
+        async with in_transaction():
+            await ProductImage.filter(product_id=product_id).delete()
+            for img_data in data.images:
+                await ProductImage.create(product=product, **img_data.model_dump())
+            await Product.filter(id=product_id).update(
+                primary_image_url=get_primary_image_url(data.images)
+            )
 
     # 更新商品标签
     if data.tags is not None:
@@ -412,14 +508,27 @@ async def update_product(product_id: int, data: ProductUpdate):
         if data.tags:
             await update_tag_suggestions([t.model_dump() for t in data.tags])
 
+    # 更新标签筛选索引
+    await sync_product_tags(
+        product_id,
+        old_tags=old_tags,
+        new_tags=[(t.key, t.value) for t in data.tags] if data.tags is not None else old_tags,
+        was_active=was_active,
+        is_active=product.is_active,
+    )
+
     # 更新商品介绍
     if data.intros is not None:
         await ProductIntro.filter(product_id=product_id).delete()
         for intro_data in data.intros:
             await ProductIntro.create(product=product, **intro_data.model_dump())
 
+    # 修改别名时新旧别名的详情缓存都需要失效
+    await invalidate_product_detail(old_slug, product.slug)
+
     logger.info(f"商品更新成功: id={product_id}")
     response_data = await _get_product_detail(product_id)
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     return success_response(data=response_data)
 
 
@@ -430,12 +539,18 @@ async def delete_product(product_id: int):
     if not product:
         raise NotFoundException(message="商品不存在")
     message = "删除成功"
+    old_tags = await ProductTag.filter(product_id=product_id).values_list("key", "value")
 
     # 1️⃣ 是否有关联订单
     has_orders = await OrderItem.filter(product_id=product_id).exists()
     if not has_orders:
         # 无任何订单 → 直接硬删除
-        await product.delete()
+        async with in_transaction():
+            await product.delete()
+            await get_search_backend().remove_product(product_id)
+        await sync_product_tags(product_id, old_tags, [], product.is_active, False)
+        await invalidate_product_detail(product.slug)
+        await invalidate_response_cache(CACHE_TAG_PRODUCTS)
         logger.info(f"商品删除成功: id={product_id}")
         return success_response(message=message)
 
@@ -455,7 +570,10 @@ async def delete_product(product_id: int):
     if product.is_active:
         product.is_active = False
         await product.save(update_fields=["is_active"])
+        await sync_product_tags(product_id, old_tags, [], True, False)
+        await invalidate_product_detail(product.slug)
     message = "商品已下架（有关联订单，无法彻底删除）"
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"商品删除成功: id={product_id}")
     return success_response(message=message)
 
@@ -465,19 +583,23 @@ async def delete_product(product_id: int):
     "/{product_id}/inventory/stats", response_model=ResponseModel, summary="获取虚拟商品库存统计"
 )
 async def get_inventory_stats(product_id: int):
-    """获取虚拟商品的库存统计（可用数量、已售数量）"""
+    """获取虚拟商品的库存统计（可用数量、已预留数量、已售数量）"""
     logger.info(f"获取库存统计: product_id={product_id}")
     product = await Product.filter(id=product_id).first()
     if not product:
         raise NotFoundException(message="商品不存在")
 
-    available = await DeliveryService.get_virtual_stock_count(product_id)
+    available = product.available_stock
     sold = await InventoryItem.filter(product_id=product_id, is_sold=True).count()
-    total = available + sold
+    reserved = await InventoryItem.filter(
+        product_id=product_id, is_sold=False, reserved_by_order_id__isnull=False
+    ).count()
+    total = available + reserved + sold
 
     return success_response(
         data={
             "available": available,
+            "reserved": reserved,
             "sold": sold,
             "total": total,
         }
@@ -511,14 +633,17 @@ async def add_inventory(product_id: int, data: InventoryItemBatchCreate):
     if not product:
         raise NotFoundException(message="商品不存在")
 
-    for content in data.contents:
-        await InventoryItem.create(product=product, content=content)
-
-    unsold_count = await InventoryItem.filter(product_id=product_id, is_sold=False).count()
-    product.stock = unsold_count
-    await product.save()
+    async with in_transaction():
+        await InventoryItem.bulk_create(
+            [InventoryItem(product_id=product_id, content=content) for content in data.contents]
+        )
+        await DeliveryService.adjust_virtual_stock(product_id, len(data.contents))
+    if product.is_flash_sale and product.product_type == ProductType.VIRTUAL:
+        await FlashSaleService.restock([FlashItem(product_id, len(data.contents), persist=False)])
+    await invalidate_product_detail(product.slug)
 
-    logger.info(f"成功添加 {len(data.contents)} 条库存, 当前库存: {unsold_count}")
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
+    logger.info(f"成功添加 {len(data.contents)} 条库存")
     return success_response(message=f"成功添加 {len(data.contents)} 条库存")
 
 
@@ -532,15 +657,23 @@ async def delete_inventory(product_id: int, item_id: int):
         raise NotFoundException(message="库存项不存在")
     if item.is_sold:
         raise BadRequestException(message="已售出的库存项无法删除")
-
-    await item.delete()
-
-    unsold_count = await InventoryItem.filter(product_id=product_id, is_sold=False).count()
+    if item.reserved_by_order_id:
+        raise BadRequestException(message="已被订单预留的库存项无法删除")
+
+    async with in_transaction():
+        # 带条件删除，避免删除期间刚被售出或预留的卡密
+        deleted = await InventoryItem.filter(
+            id=item_id, is_sold=False, reserved_by_order_id=None
+        ).delete()
+        if not deleted:
+            raise BadRequestException(message="已售出或已预留的库存项无法删除")
+        await DeliveryService.adjust_virtual_stock(product_id, -1)
     product = await Product.filter(id=product_id).first()
-    if product:
-        product.stock = unsold_count
-        await product.save()
+    if product and product.is_flash_sale and product.product_type == ProductType.VIRTUAL:
+        await FlashSaleService.restock([FlashItem(product_id, -1, persist=False)])
+    await invalidate_product_detail_by_id(product_id)
 
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"库存项删除成功: id={item_id}")
     return success_response(message="删除成功")
 
@@ -569,6 +702,8 @@ async def create_product_intro(product_id: int, data: ProductIntroCreate):
         raise NotFoundException(message="商品不存在")
 
     intro = await ProductIntro.create(product=product, **data.model_dump())
+    await invalidate_product_detail(product.slug)
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"商品介绍添加成功: id={intro.id}")
     return success_response(data=ProductIntroResponse.model_validate(intro))
 
@@ -583,6 +718,8 @@ async def update_product_intro(product_id: int, intro_id: int, data: ProductIntr
 
     update_data = data.model_dump(exclude_unset=True)
     await intro.update_from_dict(update_data).save()
+    await invalidate_product_detail_by_id(product_id)
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"商品介绍更新成功: id={intro_id}")
     return success_response(data=ProductIntroResponse.model_validate(intro))
 
@@ -598,5 +735,7 @@ async def delete_product_intro(product_id: int, intro_id: int):
         raise NotFoundException(message="商品介绍不存在")
 
     await intro.delete()
+    await invalidate_product_detail_by_id(product_id)
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
     logger.info(f"商品介绍删除成功: id={intro_id}")
     return success_response(message="删除成功")
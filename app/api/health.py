@@ -0,0 +1,30 @@
+"""健康检查API"""
+
+from fastapi import APIRouter
+
+from app.core.exceptions import ServiceUnavailableException
+from app.core.response import ResponseModel, success_response
+from app.core.warmup import get_warmup_report, is_ready
+from app.utils.redis_client import get_redis_manager
+
+router = APIRouter()
+
+
+@router.get("", response_model=ResponseModel, summary="存活检查")
+async def liveness():
+    """进程存活即返回 200"""
+    return success_response(data={"status": "ok"})
+
+
+@router.get("/ready", response_model=ResponseModel, summary="就绪检查")
+async def readiness():
+    """
+    就绪检查
+
+    启动预热结束前（以及应用关闭期间）返回 503，负载均衡据此决定是否导入流量。
+    Redis 熔断不影响就绪（会降级到内存缓存），仅在结果中展示。
+    """
+    data = {"warmup": get_warmup_report(), "redis": get_redis_manager().stats()}
+    if not is_ready():
+        raise ServiceUnavailableException(message="服务未就绪", data=data)
+    return success_response(data={"status": "ready", **data})
@@ -3,9 +3,12 @@
 from decimal import Decimal
 
 from fastapi import APIRouter
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
 
 from app.core.exceptions import BadRequestException, NotFoundException
 from app.core.logger import logger
+from app.core.middleware import invalidate_response_cache
 from app.core.response import ResponseModel, success_response
 from app.models.order import Order, OrderItem, OrderLog
 from app.models.product import PaymentMethod, Product
@@ -18,13 +21,80 @@ from app.schemas.order import (
     OrderStatus,
 )
 from app.schemas.product import ProductType
-from app.services.delivery import DeliveryService
+from app.services.flash_sale import FlashItem, FlashSaleService
+from app.services.inventory import InventoryService
+from app.utils.cache import CACHE_TAG_PRODUCTS
 
 router = APIRouter()
 
 
+async def _create_order_records(
+    data: OrderCreate,
+    payment_method: PaymentMethod,
+    total_price: Decimal,
+    quantities: dict[int, int],
+    products: dict[int, Product],
+    order_items_data: list[dict],
+) -> tuple[Order, list[OrderItem]]:
+    """在同一事务中扣减库存、创建订单、商品项和日志"""
+    async with in_transaction():
+        order = await Order.create(
+            email=data.email,
+            currency=data.currency,
+            total_price=total_price,
+            payment_method=payment_method,
+            shipping_name=data.shipping_name,
+            shipping_phone=data.shipping_phone,
+            shipping_address=data.shipping_address,
+            remark=data.remark,
+        )
+
+        # 按商品ID顺序扣减，并发下单时行锁获取顺序一致，避免死锁
+        reserved_until = InventoryService.reservation_deadline()
+        for product_id in sorted(quantities):
+            product = products[product_id]
+            quantity = quantities[product_id]
+            if product.product_type == ProductType.VIRTUAL:
+                await InventoryService.reserve(
+                    order.id, product_id, quantity, product.name, reserved_until
+                )
+                continue
+            if product.is_flash_sale:
+                # 已在 Redis 中扣减，由后台任务批量写回
+                continue
+            updated = await Product.filter(id=product_id, stock__gte=quantity).update(
+                stock=F("stock") - quantity
+            )
+            if not updated:
+                logger.warning(f"扣减库存失败（并发下单）: {product.name}, need={quantity}")
+                raise BadRequestException(message=f"商品 {product.name} 库存不足")
+
+        order_items = [OrderItem(order=order, **item_data) for item_data in order_items_data]
+        await OrderItem.bulk_create(order_items)
+        # bulk_create 不回填自增主键，按插入顺序取回
+        item_ids = (
+            await OrderItem.filter(order_id=order.id).order_by("id").values_list("id", flat=True)
+        )
+        for order_item, item_id in zip(order_items, item_ids, strict=True):
+            order_item.id = item_id
+
+        await OrderLog.create(order=order, action="create", content="订单创建")
+
+    return order, order_items
+
+
 @router.post("", response_model=ResponseModel, summary="创建订单")
 async def create_order(data: OrderCreate):
+    """
+    创建订单
+
+    商品、支付方式支持关系各一条查询批量加载；扣减库存、创建订单和商品项在同一事务中完成，
+    库存用带条件的 UPDATE 原子扣减（stock >= 数量），影响行数为 0 即库存不足，整单回滚。
+    虚拟商品同时预留具体卡密，支付后发货直接售出预留的卡密。
+
+    秒杀模式商品先在 Redis 中原子扣减，实体商品不再更新 product 行（后台批量写回），
+    事务失败时加回 Redis 库存。
+    """
     logger.info(f"创建订单: email={data.email}, items={len(data.items)}")
 
     payment_method = await PaymentMethod.filter(id=data.payment_method_id, is_active=True).first()
@@ -32,39 +102,51 @@ async def create_order(data: OrderCreate):
         logger.warning(f"支付方式不存在: id={data.payment_method_id}")
         raise BadRequestException(message="支付方式不存在或已禁用")
 
-    total_price = Decimal("0")
-    order_items_data = []
-
+    # 同一商品可能出现在多个商品项中，库存按商品合计数量校验和扣减
+    quantities: dict[int, int] = {}
     for item in data.items:
-        product = await Product.filter(id=item.product_id, is_active=True).first()
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+    products = {
+        product.id: product
+        for product in await Product.filter(id__in=list(quantities), is_active=True)
+    }
+    supported_ids = set(
+        await Product.filter(
+            id__in=list(products), payment_methods__id=payment_method.id
+        ).values_list("id", flat=True)
+    )
+
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
         if not product:
-            logger.warning(f"商品不存在: id={item.product_id}")
-            raise BadRequestException(message=f"商品ID {item.product_id} 不存在或已下架")
+            logger.warning(f"商品不存在: id={product_id}")
+            raise BadRequestException(message=f"商品ID {product_id} 不存在或已下架")
 
-        # 虚拟商品检查InventoryItem库存，实体商品检查stock
+        # 虚拟商品检查可用卡密数，实体商品检查stock
         if product.product_type == ProductType.VIRTUAL:
-            is_sufficient, available = await DeliveryService.check_virtual_stock(
-                product.id, item.quantity
-            )
-            if not is_sufficient:
+            if product.available_stock < quantity:
                 logger.warning(
-                    f"虚拟商品库存不足: {product.name}, available={available}, need={item.quantity}"
+                    f"虚拟商品库存不足: {product.name}, "
+                    f"available={product.available_stock}, need={quantity}"
                 )
                 raise BadRequestException(
-                    message=f"商品 {product.name} 库存不足（可用: {available}）"
+                    message=f"商品 {product.name} 库存不足（可用: {product.available_stock}）"
                 )
-        else:
-            if product.stock < item.quantity:
-                logger.warning(
-                    f"实体商品库存不足: {product.name}, stock={product.stock}, need={item.quantity}"
-                )
-                raise BadRequestException(message=f"商品 {product.name} 库存不足")
+        elif product.stock < quantity:
+            logger.warning(
+                f"实体商品库存不足: {product.name}, stock={product.stock}, need={quantity}"
+            )
+            raise BadRequestException(message=f"商品 {product.name} 库存不足")
 
-        await product.fetch_related("payment_methods")
-        if payment_method not in product.payment_methods:
+        if product_id not in supported_ids:
             logger.warning(f"商品不支持此支付方式: {product.name}")
             raise BadRequestException(message=f"商品 {product.name} 不支持此支付方式")
 
+    total_price = Decimal("0")
+    order_items_data = []
+    for item in data.items:
+        product = products[item.product_id]
         subtotal = product.price * item.quantity
         total_price += subtotal
         order_items_data.append(
@@ -84,27 +166,31 @@ async def create_order(data: OrderCreate):
         fee = payment_method.fee_value
     total_price += fee
 
-    order = await Order.create(
-        email=data.email,
-        currency=data.currency,
-        total_price=total_price,
-        payment_method=payment_method,
-        shipping_name=data.shipping_name,
-        shipping_phone=data.shipping_phone,
-        shipping_address=data.shipping_address,
-        remark=data.remark,
-    )
-
-    logger.info(f"订单创建成功: order_no={order.order_no}")
+    flash_items = [
+        FlashItem(
+            product_id,
+            quantities[product_id],
+            persist=products[product_id].product_type == ProductType.PHYSICAL,
+            name=products[product_id].name,
+        )
+        for product_id in sorted(quantities)
+        if products[product_id].is_flash_sale
+    ]
+    if flash_items:
+        await FlashSaleService.acquire(flash_items)
 
-    for item_data in order_items_data:
-        product = item_data.pop("product")
-        await OrderItem.create(order=order, product=product, **item_data)
-        product.stock -= item_data["quantity"]
-        await product.save()
+    try:
+        order, order_items = await _create_order_records(
+            data, payment_method, total_price, quantities, products, order_items_data
+        )
+    except Exception:
+        if flash_items:
+            await FlashSaleService.restock(flash_items)
+        raise
 
-    await OrderLog.create(order=order, action="create", content="订单创建")
-    await order.fetch_related("items")
+    # 商品列表响应包含库存
+    await invalidate_response_cache(CACHE_TAG_PRODUCTS)
+    logger.info(f"订单创建成功: order_no={order.order_no}")
 
     response_data = OrderDetailResponse(
         id=order.id,
@@ -121,7 +207,7 @@ async def create_order(data: OrderCreate):
         remark=order.remark,
         created_at=order.created_at,
         updated_at=order.updated_at,
-        items=[OrderItemResponse.model_validate(item) for item in order.items],
+        items=[OrderItemResponse.model_validate(item) for item in order_items],
     )
     return success_response(data=response_data, message="订单创建成功")
 
@@ -12,6 +12,7 @@ from app.core.response import ResponseModel, success_response
 from app.models.order import Order
 from app.schemas.order import OrderStatus, PaymentInitRequest, PaymentInitResponse
 from app.services.email import EmailService
+from app.services.inventory import InventoryService
 from app.services.payment.registry import get_registry
 from app.utils.redis_client import (
     ORDER_TIMEOUT,
@@ -113,6 +114,9 @@ async def init_payment(data: PaymentInitRequest):
 
     logger.info(f"支付初始化成功: order_no={data.order_no}")
 
+    # 卡密预留延长到支付过期时间，支付期间不会因预留过期被取消
+    await InventoryService.extend(order.id, InventoryService.reservation_deadline(ORDER_TIMEOUT))
+
     # 异步发送待支付通知邮件（不阻塞响应）
     asyncio.create_task(
         EmailService.send_payment_pending_email(
@@ -1,67 +1,42 @@
 """商品前台API"""
 
 from fastapi import APIRouter, Query
+from tortoise.expressions import Q, Subquery
+from tortoise.functions import Count
+from tortoise.queryset import QuerySet
 
 from app.core.exceptions import NotFoundException
 from app.core.logger import logger
-from app.core.response import PaginatedData, ResponseModel, success_response
-from app.models.product import Category, PaymentMethod, Product, ProductTag
+from app.core.response import (
+    CursorPaginatedData,
+    PaginatedData,
+    ResponseModel,
+    success_response,
+)
+from app.models.product import PaymentMethod, Product, ProductTag
 from app.schemas.product import (
-    CategoryResponse,
-    CategoryTreeResponse,
     PaymentMethodResponse,
-    ProductDetailResponse,
-    ProductImageResponse,
-    ProductIntroResponse,
     ProductListResponse,
     ProductTagResponse,
     ProductType,
 )
-from app.services.delivery import DeliveryService
-from app.utils.common import paginate
+from app.services.category import get_category_tree
+from app.services.product import get_product_detail
+from app.services.search import get_search_backend
+from app.services.tag_facet import get_tag_facets
+from app.utils.common import paginate, paginate_cursor, paginate_ids
 
 router = APIRouter()
 
+# 商品列表默认排序，id 保证排序键唯一（游标分页需要）
+PRODUCT_LIST_ORDER = ["sort_order", "-created_at", "-id"]
+
 
 @router.get("/categories", response_model=ResponseModel, summary="获取分类树")
 async def get_categories():
     logger.info("获取分类树")
-    categories = await Category.filter(is_active=True, parent_id=None).order_by("sort_order")
-    result = []
-    for cat in categories:
-        children = await Category.filter(is_active=True, parent_id=cat.id).order_by("sort_order")
-        # 先构建子分类列表
-        children_list = [
-            CategoryTreeResponse(
-                id=c.id,
-                name=c.name,
-                slug=c.slug,
-                description=c.description,
-                icon=c.icon,
-                parent_id=getattr(c, "parent_id", None),
-                sort_order=c.sort_order,
-                is_active=c.is_active,
-                created_at=c.created_at,
-                updated_at=c.updated_at,
-                children=[],
-            )
-            for c in children
-        ]
-        # 构建父分类
-        cat_response = CategoryTreeResponse(
-            id=cat.id,
-            name=cat.name,
-            slug=cat.slug,
-            description=cat.description,
-            icon=cat.icon,
-            parent_id=getattr(cat, "parent_id", None),
-            sort_order=cat.sort_order,
-            is_active=cat.is_active,
-            created_at=cat.created_at,
-            updated_at=cat.updated_at,
-            children=children_list,
-        )
-        result.append(cat_response)
+    tree = await get_category_tree()
+    result = tree.active_tree()
     logger.info(f"获取到 {len(result)} 个顶级分类")
     return success_response(data=result)
 
@@ -69,12 +44,50 @@ async def get_categories():
 @router.get("/categories/{slug}", response_model=ResponseModel, summary="获取分类详情")
 async def get_category(slug: str):
     logger.info(f"获取分类详情: slug={slug}")
-    category = await Category.filter(slug=slug, is_active=True).first()
-    if not category:
+    tree = await get_category_tree()
+    category = tree.get(slug)
+    if not category or not category.is_active:
         logger.warning(f"分类不存在: slug={slug}")
         raise NotFoundException(message="分类不存在")
-    data = CategoryResponse.model_validate(category)
-    return success_response(data=data)
+    return success_response(data=category)
+
+
+def _filter_by_tags(
+    query: QuerySet[Product], tag_filters: list[tuple[str, str]]
+) -> QuerySet[Product]:
+    """
+    多标签 AND 筛选，在数据库端完成
+
+    生成子查询:
+        SELECT product_id FROM product_tag
+        WHERE (key=? AND value=?) OR ...
+        GROUP BY product_id HAVING COUNT(DISTINCT <列>) = n
+    参数个数只与标签条件数有关，与匹配商品数量无关
+    """
+    pairs = list(dict.fromkeys(tag_filters))
+    condition = Q(*[Q(key=key, value=value) for key, value in pairs], join_type=Q.OR)
+
+    # 条件中 key 互不相同时按 key 计数，value 互不相同时按 value 计数，
+    # 两者都能唯一区分每个条件（同一条件的重复标签行不会被重复计数）
+    if len({key for key, _ in pairs}) == len(pairs):
+        count_field = "key"
+    elif len({value for _, value in pairs}) == len(pairs):
+        count_field = "value"
+    else:
+        # key 和 value 都有重复时无法用单列区分，逐条件嵌套子查询
+        for key, value in pairs:
+            matched = ProductTag.filter(key=key, value=value).values_list("product_id", flat=True)
+            query = query.filter(id__in=Subquery(matched))
+        return query
+
+    matched = (
+        ProductTag.filter(condition)
+        .annotate(matched_count=Count(count_field, distinct=True))
+        .group_by("product_id")
+        .filter(matched_count=len(pairs))
+        .values_list("product_id", flat=True)
+    )
+    return query.filter(id__in=Subquery(matched))
 
 
 @router.get("", response_model=ResponseModel, summary="获取商品列表")
@@ -88,6 +101,10 @@ async def get_products(
     ),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: str | None = Query(
+        None,
+        description="游标分页: 传空值获取第一页，之后传上一页返回的 next_cursor；不传则按页码分页",
+    ),
 ):
     """
     获取商品列表，支持分类、搜索、多标签组合筛选
@@ -96,6 +113,10 @@ async def get_products(
     - 格式: `key:value`，多个标签用逗号分隔
     - 多个标签为 AND 关系（同时满足）
     - 示例: `?tags=platform:PC端,region:国服` 表示筛选平台为PC端且区服为国服的商品
+
+    分页说明：
+    - 默认按页码分页，返回总数和总页数
+    - 传 `cursor` 时使用游标分页，不返回总数，翻页深度不影响查询速度（搜索时按默认排序）
     """
     logger.info(
         f"获取商品列表: category={category_slug}, search={search}, tags={tags}, page={page}"
@@ -103,14 +124,10 @@ async def get_products(
     query = Product.filter(is_active=True)
 
     if category_slug:
-        category = await Category.filter(slug=category_slug).first()
-        if category:
-            child_ids = await Category.filter(parent_id=category.id).values_list("id", flat=True)
-            category_ids = [category.id] + list(child_ids)
-            query = query.filter(category_id__in=category_ids)
-
-    if search:
-        query = query.filter(name__icontains=search)
+        tree = await get_category_tree()
+        category_ids = tree.descendant_ids.get(category_slug)
+        if category_ids:
+            query = query.filter(category_id__in=list(category_ids))
 
     # 多标签筛选（AND逻辑）
     if tags:
@@ -122,53 +139,47 @@ async def get_products(
                 tag_filters.append((key.strip(), value.strip()))
 
         if tag_filters:
-            # 找到同时包含所有指定标签的商品
-            # 对每个标签条件，找出满足的商品ID，然后取交集
-            product_ids_sets = []
-            for key, value in tag_filters:
-                ids = await ProductTag.filter(key=key, value=value).values_list(
-                    "product_id", flat=True
-                )
-                product_ids_sets.append(set(ids))
-
-            if product_ids_sets:
-                # 取所有集合的交集
-                matched_ids = product_ids_sets[0]
-                for ids_set in product_ids_sets[1:]:
-                    matched_ids = matched_ids & ids_set
-
-                if matched_ids:
-                    query = query.filter(id__in=list(matched_ids))
-                else:
-                    # 没有交集，返回空结果
-                    return success_response(
-                        data=PaginatedData(
-                            items=[],
-                            total=0,
-                            page=page,
-                            page_size=page_size,
-                            pages=0,
-                        )
-                    )
-
-    query = query.order_by("sort_order", "-created_at")
-    items, total, pages = await paginate(query, page, page_size)
+            query = _filter_by_tags(query, tag_filters)
+
+    # 搜索放在其他筛选之后，检索结果数上限只作用于符合条件的商品
+    ranked_ids = None
+    if search:
+        query, ranked_ids = await get_search_backend().apply(query, search)
+
+    next_cursor = None
+    if cursor is not None:
+        items, next_cursor = await paginate_cursor(query, PRODUCT_LIST_ORDER, cursor, page_size)
+    elif ranked_ids is not None:
+        # 全文检索按相关度排序
+        items, total, pages = await paginate_ids(query, ranked_ids, page, page_size)
+    else:
+        query = query.order_by(*PRODUCT_LIST_ORDER)
+        items, total, pages = await paginate(query, page, page_size)
+
+    # 整页批量加载关联数据：每个关联一条查询，避免逐个商品 fetch_related
+    await Product.fetch_for_list(items, "category", "tags")
 
     result = []
     for item in items:
-        await item.fetch_related("category", "images", "tags")
         item_dict = ProductListResponse.model_validate(item).model_dump()
-        primary_image = next((img for img in item.images if img.is_primary), None)
-        if not primary_image and item.images:
-            primary_image = item.images[0]
-        item_dict["primary_image"] = primary_image.image_url if primary_image else None
+        item_dict["primary_image"] = item.primary_image_url
         # 列表中也返回标签
         item_dict["tags"] = [ProductTagResponse.model_validate(tag) for tag in item.tags]
-        # 虚拟商品使用 InventoryItem 计算库存
+        # 虚拟商品使用可用库存计数器
         if item.product_type == ProductType.VIRTUAL:
-            item_dict["stock"] = await DeliveryService.get_virtual_stock_count(item.id)
+            item_dict["stock"] = item.available_stock
         result.append(item_dict)
 
+    if cursor is not None:
+        logger.info(f"获取到 {len(result)} 个商品, has_more={next_cursor is not None}")
+        data = CursorPaginatedData(
+            items=result,
+            page_size=page_size,
+            next_cursor=next_cursor,
+            has_more=next_cursor is not None,
+        )
+        return success_response(data=data)
+
     logger.info(f"获取到 {len(result)} 个商品, 共 {total} 条")
     data = PaginatedData(
         items=result,
@@ -184,18 +195,8 @@ async def get_products(
 async def get_tags():
     """获取所有商品标签，按key分组返回所有可选值"""
     logger.info("获取所有标签")
-    # 只获取上架商品的标签
-    tags = await ProductTag.filter(product__is_active=True).all()
-
-    # 按key分组，去重value
-    tag_map: dict[str, set[str]] = {}
-    for tag in tags:
-        if tag.key not in tag_map:
-            tag_map[tag.key] = set()
-        tag_map[tag.key].add(tag.value)
-
-    # 转换为列表格式
-    data = [{"key": k, "values": sorted(list(v))} for k, v in sorted(tag_map.items())]
+    # 只包含上架商品的标签，由标签筛选索引维护
+    data = await get_tag_facets()
     logger.info(f"获取到 {len(data)} 种标签")
     return success_response(data=data)
 
@@ -212,45 +213,8 @@ async def get_payment_methods():
 @router.get("/{slug}", response_model=ResponseModel, summary="获取商品详情")
 async def get_product(slug: str):
     logger.info(f"获取商品详情: slug={slug}")
-    product = await Product.filter(slug=slug, is_active=True).first()
-    if not product:
+    data = await get_product_detail(slug)
+    if data is None:
         logger.warning(f"商品不存在: slug={slug}")
         raise NotFoundException(message="商品不存在")
-
-    await product.fetch_related("category", "images", "tags", "intros", "payment_methods")
-
-    # 只获取启用的介绍内容
-    active_intros = [intro for intro in product.intros if intro.is_active]
-    active_intros.sort(key=lambda x: x.sort_order)
-
-    # 虚拟商品使用 InventoryItem 计算库存
-    stock = product.stock
-    if product.product_type == ProductType.VIRTUAL:
-        stock = await DeliveryService.get_virtual_stock_count(product.id)
-
-    data = ProductDetailResponse(
-        id=product.id,
-        name=product.name,
-        slug=product.slug,
-        product_type=product.product_type,
-        price=product.price,
-        stock=stock,
-        is_active=product.is_active,
-        sort_order=product.sort_order,
-        created_at=product.created_at,
-        updated_at=product.updated_at,
-        category=CategoryResponse.model_validate(product.category) if product.category else None,
-        primary_image=next(
-            (img.image_url for img in product.images if img.is_primary),
-            product.images[0].image_url if product.images else None,
-        ),
-        images=[ProductImageResponse.model_validate(img) for img in product.images],
-        tags=[ProductTagResponse.model_validate(tag) for tag in product.tags],
-        intros=[ProductIntroResponse.model_validate(intro) for intro in active_intros],
-        payment_methods=[
-            PaymentMethodResponse.model_validate(pm)
-            for pm in product.payment_methods
-            if pm.is_active
-        ],
-    )
     return success_response(data=data)
@@ -30,6 +30,20 @@ class Settings(BaseSettings):
 
     # Redis 配置（可选，不配置则使用内存缓存）
     redis_url: str | None = None
+    redis_max_connections: int = 50  # 连接池大小
+    redis_socket_timeout: float = 1.0  # 读写超时(秒)
+    redis_connect_timeout: float = 1.0  # 连接超时(秒)
+    redis_breaker_threshold: int = 3  # 连续失败多少次后熔断，熔断期间直接走降级逻辑
+    redis_probe_interval: float = 5.0  # 熔断期间健康探测间隔(秒)
+
+    # 内存缓存配置
+    memory_cache_max_entries: int = 10000  # 最多缓存条目数，超出后淘汰最久未使用的
+    memory_cache_sweep_interval: int = 60  # 过期条目清理间隔(秒)
+    # 配置 Redis 时的进程内 L1 缓存，失效通过 pub/sub 广播；TTL 为 0 关闭 L1
+    cache_l1_ttl: int = 5  # L1 缓存时间(秒)，也是订阅断开时其他 worker 读到旧数据的上限
+    cache_l1_max_entries: int = 2000
+    # 缓存值/待支付订单的编码: auto(按 orjson > msgpack > json 选择已安装的) / json / orjson / msgpack
+    cache_codec: str = "auto"
 
     # JWT 配置
     secret_key: str = "change-me-in-production"
@@ -47,6 +61,55 @@ class Settings(BaseSettings):
     # 默认货币
     default_currency: str = "USD"
 
+    # 虚拟商品下单时预留卡密的时间(秒)，发起支付时延长到支付过期时间，过期未支付的订单自动取消
+    inventory_reservation_ttl: int = 15 * 60
+
+    # 秒杀模式商品在 Redis 中扣减的库存批量写回数据库的间隔(秒)
+    flash_sale_flush_interval: float = 1.0
+
+    # 商品搜索配置
+    # auto: 按数据库类型选择（SQLite -> FTS5, PostgreSQL -> pg_trgm/tsvector）
+    # 可选: auto / like / sqlite_fts5 / postgres
+    search_backend: str = "auto"
+    search_max_results: int = 1000  # 全文检索最多返回的商品数
+
+    # 商品详情缓存配置
+    product_detail_cache_ttl: int = 300  # 详情缓存时间(秒)，0 表示不缓存
+    # 缓存中库存允许的陈旧时间(秒)：0 表示每次命中都用一条主键查询覆盖实时库存，
+    # 大于 0 时缓存超过该时间才覆盖实时库存
+    product_detail_stock_max_age: int = 0
+
+    # 响应缓存配置（前台公开 GET 接口，进程内缓存完整响应体）
+    response_cache_enabled: bool = True
+    response_cache_ttl: int = 30  # 新鲜期(秒)，库存等高频变化数据最多陈旧这么久
+    response_cache_stale_ttl: int = 300  # 过期后仍可返回旧数据并后台刷新的时间(秒)
+    response_cache_stale_if_error: int = 3600  # 后端出错时可返回旧数据的时间(秒)
+    response_cache_max_entries: int = 2000  # 最多缓存的响应数，超出后淘汰最久未使用的
+
+    # 启动预热配置（启动后在后台预先请求热点前台接口，填充各级缓存，完成前就绪检查返回 503）
+    warmup_enabled: bool = True
+    warmup_timeout: float = 10.0  # 预热时间上限(秒)，超时未完成的请求取消，直接标记就绪
+    warmup_concurrency: int = 4  # 同时进行的预热请求数
+
+    # 幂等键配置（下单、发起支付接口的 Idempotency-Key 请求头）
+    idempotency_ttl: int = 24 * 60 * 60  # 首次响应保存时间(秒)
+    idempotency_lock_ttl: int = 60  # 处理中占位的过期时间(秒)，需大于接口最长耗时
+    idempotency_wait_timeout: float = 10.0  # 重复请求等待首次请求完成的最长时间(秒)
+
+    # 限流配置（令牌桶）："方法 路径模板" -> "维度:次数/秒数"，多个维度逗号分隔
+    # 维度: ip=客户端IP, email=请求中的邮箱, route=整个接口共享
+    rate_limit_enabled: bool = True
+    # 按反向代理设置的 X-Real-IP / X-Forwarded-For 识别客户端IP，仅在代理之后部署时开启
+    rate_limit_trust_proxy: bool = False
+    rate_limit_rules: dict[str, str] = {
+        "POST /api/v1/orders": "ip:10/60,email:5/60",
+        "POST /api/v1/orders/query": "ip:30/60",
+        "GET /api/v1/orders/{order_no}": "ip:60/60",
+        "POST /api/v1/orders/{order_no}/cancel": "ip:10/60",
+        "POST /api/v1/payment/init": "ip:20/60",
+        "GET /api/v1/payment/status/{order_no}": "ip:120/60",
+    }
+
 
 @lru_cache
 def get_settings() -> Settings:
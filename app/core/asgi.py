@@ -0,0 +1,30 @@
+"""ASGI 中间件公共工具 - 读取请求体并交给下游重放"""
+
+from starlette.types import Message, Receive
+
+
+async def read_body(receive: Receive) -> bytes:
+    """读取完整请求体（读取后需用 replay_body 交给下游）"""
+    chunks: list[bytes] = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def replay_body(body: bytes, receive: Receive) -> Receive:
+    """返回先发送已读取请求体、之后转发原 receive 的 receive（如 http.disconnect）"""
+    body_sent = False
+
+    async def replay_receive() -> Message:
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay_receive
@@ -63,3 +63,10 @@ class InternalServerException(AppException):
 
     def __init__(self, message: str = "服务器内部错误", data: Any = None):
         super().__init__(code=500, message=message, data=data)
+
+
+class ServiceUnavailableException(AppException):
+    """503 服务暂不可用"""
+
+    def __init__(self, message: str = "服务暂不可用", data: Any = None):
+        super().__init__(code=503, message=message, data=data)
@@ -0,0 +1,271 @@
+"""中间件 - 下单、发起支付接口的幂等键（Idempotency-Key）
+
+客户端重试 POST 请求时携带同一个 Idempotency-Key 请求头:
+
+- 首次请求执行路由，响应（状态码 < 500）保存 IDEMPOTENCY_TTL 秒
+- 重复请求直接返回保存的响应（响应头 Idempotent-Replayed: true），不再访问数据库
+- 首次请求仍在处理中时，重复请求等待其完成（最多 IDEMPOTENCY_WAIT_TIMEOUT 秒，超时返回 409）
+- 同一个 key 用于不同的请求参数时返回 422
+- 首次请求异常或返回 5xx 时删除记录，之后的重试重新执行
+
+记录保存在 Redis（各 worker 共享）；Redis 不可用时使用进程内存储（各 worker 独立）。
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.core.asgi import read_body, replay_body
+from app.core.logger import logger
+from app.utils.cache import MemoryCache
+from app.utils.redis_client import get_redis
+
+settings = get_settings()
+
+# 支持幂等键的接口 (方法, 路径)
+IDEMPOTENT_ROUTES: set[tuple[str, str]] = {
+    ("POST", "/api/v1/orders"),
+    ("POST", "/api/v1/payment/init"),
+}
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+IDEMPOTENCY_PREFIX = "idempotency:"
+MAX_KEY_LENGTH = 255
+
+_STATE_PROCESSING = "processing"
+_STATE_DONE = "done"
+
+# 重放时不保存/不返回的响应头
+_SKIP_HEADERS = (b"content-length", b"set-cookie", b"idempotent-replayed")
+
+# Redis 不可用时的进程内存储
+_memory_store = MemoryCache(settings.memory_cache_max_entries, name="idempotency")
+
+# 本 worker 正在处理的 key，同 worker 的重复请求直接等待结果，无需轮询
+_inflight: dict[str, asyncio.Future[dict | None]] = {}
+
+
+class _RedisStore:
+    def __init__(self, redis: Any):
+        self.redis = redis
+
+    async def claim(self, key: str, record: dict, ttl: int) -> bool:
+        return bool(await self.redis.set(key, json.dumps(record), nx=True, ex=ttl))
+
+    async def get(self, key: str) -> dict | None:
+        raw = await self.redis.get(key)
+        return json.loads(raw) if raw else None
+
+    async def put(self, key: str, record: dict, ttl: int) -> None:
+        await self.redis.set(key, json.dumps(record), ex=ttl)
+
+    async def delete(self, key: str) -> None:
+        await self.redis.delete(key)
+
+
+class _MemoryStore:
+    async def claim(self, key: str, record: dict, ttl: int) -> bool:
+        if _memory_store.get(key) is not None:
+            return False
+        _memory_store.set(key, record, ttl)
+        return True
+
+    async def get(self, key: str) -> dict | None:
+        return _memory_store.get(key)
+
+    async def put(self, key: str, record: dict, ttl: int) -> None:
+        _memory_store.set(key, record, ttl)
+
+    async def delete(self, key: str) -> None:
+        _memory_store.delete(key)
+
+
+async def _get_store() -> _RedisStore | _MemoryStore:
+    redis = await get_redis()
+    return _RedisStore(redis) if redis else _MemoryStore()
+
+
+def _get_header(scope: Scope, name: bytes) -> str | None:
+    for key, value in scope["headers"]:
+        if key.lower() == name:
+            return value.decode("latin-1").strip()
+    return None
+
+
+def _fingerprint(scope: Scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{scope['method']} {scope['path']}?".encode())
+    digest.update(scope["query_string"])
+    digest.update(b"\n")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+async def _send_json(send: Send, status: int, message: str) -> None:
+    body = json.dumps({"code": status, "message": message, "data": None}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_record(send: Send, record: dict) -> None:
+    body = base64.b64decode(record["body"])
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in record["headers"]]
+    headers.append((b"content-length", str(len(body)).encode()))
+    headers.append((b"idempotent-replayed", b"true"))
+    await send({"type": "http.response.start", "status": record["status"], "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """幂等键中间件（纯 ASGI 实现）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        idempotency_key = _get_header(scope, IDEMPOTENCY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key 长度需为 1-{MAX_KEY_LENGTH}")
+            return
+
+        body = await read_body(receive)
+        fingerprint = _fingerprint(scope, body)
+        key = f"{IDEMPOTENCY_PREFIX}{scope['path']}:{idempotency_key}"
+
+        store = await _get_store()
+        deadline = time.monotonic() + settings.idempotency_wait_timeout
+        while True:
+            try:
+                claimed = await store.claim(
+                    key,
+                    {"state": _STATE_PROCESSING, "fingerprint": fingerprint},
+                    settings.idempotency_lock_ttl,
+                )
+            except Exception as e:
+                logger.warning(f"幂等键存储不可用，改用进程内存储: {e}")
+                store = _MemoryStore()
+                continue
+            if claimed:
+                await self._execute(scope, body, receive, send, store, key, fingerprint)
+                return
+
+            record = await self._wait(store, key, deadline)
+            if record is None:
+                if time.monotonic() >= deadline:
+                    await _send_json(send, 409, "相同 Idempotency-Key 的请求正在处理中，请稍后重试")
+                    return
+                # 首次请求失败已删除记录，重新抢占执行
+                continue
+            if record["fingerprint"] != fingerprint:
+                await _send_json(send, 422, "Idempotency-Key 已用于不同的请求参数")
+                return
+            logger.info(f"幂等键重放: {scope['path']}, key={idempotency_key}")
+            await _send_record(send, record)
+            return
+
+    async def _execute(
+        self,
+        scope: Scope,
+        body: bytes,
+        receive: Receive,
+        send: Send,
+        store: _RedisStore | _MemoryStore,
+        key: str,
+        fingerprint: str,
+    ) -> None:
+        """执行首次请求，保存响应"""
+        future: asyncio.Future[dict | None] = asyncio.get_running_loop().create_future()
+        _inflight[key] = future
+        record: dict | None = None
+        status = 500
+        headers: list[tuple[bytes, bytes]] = []
+        chunks: list[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(k.lower(), v) for k, v in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body(body, receive), capture)
+            if status < 500:
+                record = {
+                    "state": _STATE_DONE,
+                    "fingerprint": fingerprint,
+                    "status": status,
+                    "headers": [
+                        (k.decode("latin-1"), v.decode("latin-1"))
+                        for k, v in headers
+                        if k not in _SKIP_HEADERS
+                    ],
+                    "body": base64.b64encode(b"".join(chunks)).decode(),
+                }
+        finally:
+            try:
+                if record is not None:
+                    await store.put(key, record, settings.idempotency_ttl)
+                else:
+                    await store.delete(key)
+            except Exception as e:
+                logger.error(f"保存幂等键记录失败: {key}, {e}")
+            future.set_result(record)
+            if _inflight.get(key) is future:
+                del _inflight[key]
+
+    @staticmethod
+    async def _wait(store: _RedisStore | _MemoryStore, key: str, deadline: float) -> dict | None:
+        """
+        等待首次请求完成
+
+        Returns:
+            保存的响应记录；首次请求失败（记录已删除）或等待超时返回 None
+        """
+        future = _inflight.get(key)
+        if future is not None:
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(future), max(deadline - time.monotonic(), 0)
+                )
+            except TimeoutError:
+                return None
+
+        # 首次请求在其他 worker 上，轮询存储
+        interval = 0.05
+        while True:
+            try:
+                record = await store.get(key)
+            except Exception as e:
+                logger.warning(f"读取幂等键记录失败: {key}, {e}")
+                record = None
+            if record is None or record["state"] == _STATE_DONE:
+                return record
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 0.5)
@@ -0,0 +1,275 @@
+"""中间件 - 前台公开 GET 接口响应缓存
+
+按 路径 + 查询参数 缓存完整响应体（字节），命中时直接返回，不再执行路由和 pydantic 序列化。
+
+缓存状态（响应头 X-Cache）:
+- HIT: 新鲜期内直接返回
+- STALE: 超过新鲜期但在 stale-while-revalidate 窗口内，返回旧数据并在后台刷新
+- STALE-IF-ERROR: 后端异常或返回 5xx 时，在 stale-if-error 窗口内返回旧数据
+- MISS: 执行路由并写入缓存；同一 key 的并发未命中只执行一次路由，其余请求共用其响应
+
+管理端写入后调用 invalidate_response_cache(tag) 按标签失效，并通过缓存失效广播通知其他 worker。
+下单、取消订单、释放过期预留改变库存，同样失效 products 标签（商品列表响应包含库存）。
+商品详情不经过响应缓存（见 CACHE_EXACT_RULES），库存以商品详情缓存叠加的实时值为准。
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.core.logger import logger
+from app.utils.cache import (
+    CACHE_TAG_PLATFORM,
+    CACHE_TAG_PRODUCTS,
+    broadcast_invalidation,
+    invalidate_cached_tags,
+    register_invalidation_handler,
+)
+
+settings = get_settings()
+
+# 缓存的路由前缀 -> 标签
+CACHE_RULES: list[tuple[str, str]] = [
+    ("/api/v1/products/categories", CACHE_TAG_PRODUCTS),
+    ("/api/v1/products/tags", CACHE_TAG_PRODUCTS),
+    ("/api/v1/products/payment-methods", CACHE_TAG_PRODUCTS),
+    ("/api/v1/platform", CACHE_TAG_PLATFORM),
+]
+
+# 只缓存路径本身（不含子路径）的路由 -> 标签
+# 商品详情 /api/v1/products/{slug} 不经过响应缓存：下单、取消、发货随时改变库存，
+# 详情由商品详情缓存提供，命中时叠加实时库存
+CACHE_EXACT_RULES: dict[str, str] = {
+    "/api/v1/products": CACHE_TAG_PRODUCTS,
+}
+
+
+@dataclass
+class CachedResponse:
+    """缓存的响应"""
+
+    status: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+    tag: str
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+
+class ResponseCacheStore:
+    """
+    进程内响应缓存（LRU）
+
+    每个标签维护一个 generation，失效时递增：请求开始时记录 generation，写入时若已变化
+    说明期间发生过失效，放弃写入，避免把失效前查到的旧数据写回缓存。
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.generations: dict[str, int] = {}
+        # 正在后台刷新的 key，避免同一 key 重复刷新
+        self.refreshing: dict[str, asyncio.Task] = {}
+        # 正在执行的未命中请求，并发的相同请求等待其结果
+        self.inflight: dict[str, asyncio.Future[CachedResponse | None]] = {}
+
+    def generation(self, tag: str) -> int:
+        return self.generations.get(tag, 0)
+
+    def get(self, key: str) -> CachedResponse | None:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse, generation: int) -> None:
+        if generation != self.generation(entry.tag):
+            return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, tags: set[str]) -> int:
+        for tag in tags:
+            self.generations[tag] = self.generation(tag) + 1
+        keys = [k for k, v in self.entries.items() if v.tag in tags]
+        for key in keys:
+            del self.entries[key]
+        return len(keys)
+
+
+# 全局缓存实例
+_store = ResponseCacheStore(settings.response_cache_max_entries)
+
+
+def get_response_cache() -> ResponseCacheStore:
+    """获取响应缓存实例"""
+    return _store
+
+
+async def invalidate_response_cache(*tags: str) -> None:
+    """管理端写入后按标签失效响应缓存，以及同标签的 @cached 数据缓存"""
+    # 先失效数据缓存，避免响应缓存重建时读到旧数据
+    await invalidate_cached_tags(*tags)
+    count = _store.invalidate(set(tags))
+    logger.debug(f"响应缓存已失效: tags={tags}, count={count}")
+    await broadcast_invalidation("response", list(tags))
+
+
+def _on_remote_invalidation(tags: list[str]) -> None:
+    count = _store.invalidate(set(tags))
+    logger.debug(f"响应缓存已失效(其他 worker): tags={tags}, count={count}")
+
+
+register_invalidation_handler("response", _on_remote_invalidation)
+
+
+def _match_tag(path: str) -> str | None:
+    if path in CACHE_EXACT_RULES:
+        return CACHE_EXACT_RULES[path]
+    for prefix, tag in CACHE_RULES:
+        if path == prefix or path.startswith(prefix + "/"):
+            return tag
+    return None
+
+
+def _cache_key(scope: Scope) -> str:
+    # 查询参数排序，参数顺序不同的相同请求共用缓存
+    query = urlencode(sorted(parse_qsl(scope["query_string"].decode("latin-1"), True)))
+    return f"{scope['path']}?{query}"
+
+
+async def _empty_receive() -> Message:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+class ResponseCacheMiddleware:
+    """前台公开 GET 接口响应缓存中间件（纯 ASGI 实现）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.store = _store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not settings.response_cache_enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        tag = _match_tag(scope["path"])
+        if tag is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = _cache_key(scope)
+        entry = self.store.get(key)
+
+        if entry is not None:
+            if entry.age < settings.response_cache_ttl:
+                await self._send_cached(send, entry, "HIT")
+                return
+            if entry.age < settings.response_cache_ttl + settings.response_cache_stale_ttl:
+                if key not in self.store.refreshing:
+                    self.store.refreshing[key] = asyncio.create_task(
+                        self._refresh(dict(scope), key, tag)
+                    )
+                await self._send_cached(send, entry, "STALE")
+                return
+
+        leader = self.store.inflight.get(key)
+        if leader is not None:
+            response = await asyncio.shield(leader)
+            if response is not None and self._cacheable(response):
+                await self._send_cached(send, response, "MISS")
+                return
+
+        future: asyncio.Future[CachedResponse | None] = asyncio.get_running_loop().create_future()
+        if leader is None:
+            self.store.inflight[key] = future
+        generation = self.store.generation(tag)
+        response = None
+        try:
+            response = await self._fetch(scope, receive, tag)
+        except Exception:
+            if self._can_serve_on_error(entry):
+                logger.exception(f"响应缓存: 后端异常，返回旧数据 {key}")
+                await self._send_cached(send, entry, "STALE-IF-ERROR")
+                return
+            raise
+        finally:
+            future.set_result(response)
+            if self.store.inflight.get(key) is future:
+                del self.store.inflight[key]
+
+        if response.status >= 500 and self._can_serve_on_error(entry):
+            logger.warning(f"响应缓存: 后端返回 {response.status}，返回旧数据 {key}")
+            await self._send_cached(send, entry, "STALE-IF-ERROR")
+            return
+
+        if self._cacheable(response):
+            self.store.put(key, response, generation)
+        await self._send_cached(send, response, "MISS")
+
+    def _can_serve_on_error(self, entry: CachedResponse | None) -> bool:
+        return entry is not None and entry.age < (
+            settings.response_cache_ttl + settings.response_cache_stale_if_error
+        )
+
+    @staticmethod
+    def _cacheable(response: CachedResponse) -> bool:
+        return response.status == 200 and not any(
+            name == b"set-cookie" for name, _ in response.headers
+        )
+
+    async def _fetch(self, scope: Scope, receive: Receive, tag: str) -> CachedResponse:
+        """执行下游应用并收集完整响应"""
+        status = 500
+        headers: list[tuple[bytes, bytes]] = []
+        chunks: list[bytes] = []
+
+        async def capture(message: Message) -> None:
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [(k.lower(), v) for k, v in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        return CachedResponse(status=status, headers=headers, body=b"".join(chunks), tag=tag)
+
+    async def _refresh(self, scope: Scope, key: str, tag: str) -> None:
+        """后台刷新过期缓存"""
+        generation = self.store.generation(tag)
+        try:
+            response = await self._fetch(scope, _empty_receive, tag)
+            if self._cacheable(response):
+                self.store.put(key, response, generation)
+        except Exception as e:
+            logger.warning(f"响应缓存后台刷新失败: {key}, {e}")
+        finally:
+            self.store.refreshing.pop(key, None)
+
+    @staticmethod
+    async def _send_cached(send: Send, response: CachedResponse, state: str) -> None:
+        headers = [
+            (name, value)
+            for name, value in response.headers
+            if name not in (b"content-length", b"x-cache")
+        ]
+        headers.append((b"content-length", str(len(response.body)).encode()))
+        headers.append((b"x-cache", state.encode()))
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": response.body})
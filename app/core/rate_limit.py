@@ -0,0 +1,338 @@
+"""中间件 - 前台订单/支付接口限流（令牌桶）
+
+按 RATE_LIMIT_RULES 为每个接口配置一个或多个限流维度，"维度:次数/秒数" 表示桶容量为
+次数、每秒补充 次数/秒数 个令牌:
+
+- ip: 按客户端IP（部署在反向代理后时取 X-Real-IP / X-Forwarded-For）
+- email: 按请求中的邮箱（查询参数或 JSON 请求体），请求中没有邮箱时不限
+- route: 整个接口共享一个桶
+
+同一请求的多个维度由一个 Lua 脚本原子检查，全部有令牌才一起扣减；任一维度不足时返回 429
+（带 Retry-After 响应头），不扣减其他维度。桶保存在 Redis（各 worker 共享），Redis 不可用时
+使用进程内令牌桶（各 worker 独立计数）。各规则放行/拒绝次数见管理端 /payment/rate-limit-stats。
+"""
+
+import hashlib
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from urllib.parse import parse_qsl
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import get_settings
+from app.core.asgi import read_body, replay_body
+from app.core.logger import logger
+from app.utils.redis_client import get_redis
+
+settings = get_settings()
+
+RATE_LIMIT_PREFIX = "ratelimit:"
+DIMENSIONS = ("ip", "email", "route")
+
+# 全部维度有令牌才一起扣减，返回 {0, "0"} 放行，{i, 等待秒数} 第 i 个桶令牌不足
+# KEYS: 桶...；ARGV: 容量, 每秒补充数, ...
+_TOKEN_BUCKET_SCRIPT = """
+local now = redis.call("time")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local tokens = {}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local bucket = redis.call("hmget", KEYS[i], "tokens", "ts")
+    local current = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    current = math.min(capacity, current + math.max(0, now - ts) * rate)
+    if current < 1 then
+        return {i, tostring((1 - current) / rate)}
+    end
+    tokens[i] = current
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    redis.call("hset", KEYS[i], "tokens", tokens[i] - 1, "ts", now)
+    redis.call("expire", KEYS[i], math.ceil(capacity / rate) + 1)
+end
+return {0, "0"}
+"""
+
+
+@dataclass(frozen=True)
+class Limit:
+    """限流维度"""
+
+    dimension: str
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        """每秒补充的令牌数"""
+        return self.capacity / self.period
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """接口限流规则"""
+
+    name: str
+    method: str
+    pattern: re.Pattern
+    limits: tuple[Limit, ...]
+
+
+def _parse_rule(name: str, spec: str) -> RateLimitRule:
+    """
+    解析限流规则
+
+    Args:
+        name: "方法 路径模板"，如 "GET /api/v1/orders/{order_no}"
+        spec: "维度:次数/秒数"，多个维度逗号分隔，如 "ip:10/60,email:5/60"
+    """
+    method, _, path = name.strip().partition(" ")
+    path = path.strip()
+    if not method or not path.startswith("/"):
+        raise ValueError(f"限流规则格式错误: {name!r}")
+    regex = re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(path))
+
+    limits = []
+    for part in spec.split(","):
+        match = re.fullmatch(r"\s*(\w+)\s*:\s*(\d+)\s*/\s*(\d+(?:\.\d+)?)\s*", part)
+        if not match or match.group(1) not in DIMENSIONS:
+            raise ValueError(f"限流规则格式错误: {name!r}: {spec!r}")
+        capacity, period = int(match.group(2)), float(match.group(3))
+        if capacity <= 0 or period <= 0:
+            raise ValueError(f"限流规则格式错误: {name!r}: {spec!r}")
+        limits.append(Limit(match.group(1), capacity, period))
+
+    return RateLimitRule(
+        name=f"{method.upper()} {path}",
+        method=method.upper(),
+        pattern=re.compile(f"^{regex}$"),
+        limits=tuple(limits),
+    )
+
+
+_rules: list[RateLimitRule] = [
+    _parse_rule(name, spec) for name, spec in settings.rate_limit_rules.items()
+]
+
+
+class LocalTokenBuckets:
+    """
+    进程内令牌桶（Redis 不可用时使用）
+
+    不含 await 的同步代码，在事件循环中天然原子；超出容量时淘汰最久未使用的桶。
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def acquire(self, keys: list[str], limits: list[Limit]) -> tuple[int, float]:
+        """返回 (0, 0) 放行，(i, 等待秒数) 第 i 个桶令牌不足"""
+        now = time.monotonic()
+        tokens = []
+        for i, (key, limit) in enumerate(zip(keys, limits, strict=True), 1):
+            current, ts = self._buckets.get(key, (limit.capacity, now))
+            current = min(limit.capacity, current + (now - ts) * limit.rate)
+            if current < 1:
+                return i, (1 - current) / limit.rate
+            tokens.append(current)
+
+        for key, current in zip(keys, tokens, strict=True):
+            self._buckets[key] = (current - 1, now)
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_entries:
+            self._buckets.popitem(last=False)
+        return 0, 0.0
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class RateLimitStats:
+    """限流计数（当前 worker）"""
+
+    def __init__(self):
+        self.allowed: dict[str, int] = {}
+        # {规则: {维度: 拒绝次数}}
+        self.limited: dict[str, dict[str, int]] = {}
+        # Redis 不可用改用进程内令牌桶的次数
+        self.fallbacks = 0
+
+    def record(self, rule: str, dimension: str | None) -> None:
+        if dimension is None:
+            self.allowed[rule] = self.allowed.get(rule, 0) + 1
+            return
+        counts = self.limited.setdefault(rule, {})
+        counts[dimension] = counts.get(dimension, 0) + 1
+
+    def snapshot(self) -> dict:
+        rules = {}
+        for rule in sorted(set(self.allowed) | set(self.limited)):
+            allowed = self.allowed.get(rule, 0)
+            limited = sum(self.limited.get(rule, {}).values())
+            total = allowed + limited
+            rules[rule] = {
+                "allowed": allowed,
+                "limited": limited,
+                "limited_by": dict(self.limited.get(rule, {})),
+                "limited_rate": round(limited / total, 4) if total else 0.0,
+            }
+        return {"enabled": settings.rate_limit_enabled, "fallbacks": self.fallbacks, "rules": rules}
+
+    def reset(self) -> None:
+        self.allowed.clear()
+        self.limited.clear()
+        self.fallbacks = 0
+
+
+_local_buckets = LocalTokenBuckets(settings.memory_cache_max_entries)
+_stats = RateLimitStats()
+
+
+def get_rate_limit_stats() -> dict:
+    """限流统计：各规则放行/拒绝次数（当前 worker）"""
+    return _stats.snapshot()
+
+
+def reset_rate_limit_stats() -> None:
+    """重置当前 worker 的限流计数"""
+    _stats.reset()
+
+
+def _match_rule(method: str, path: str) -> RateLimitRule | None:
+    for rule in _rules:
+        if rule.method == method and rule.pattern.match(path):
+            return rule
+    return None
+
+
+def _client_ip(scope: Scope) -> str:
+    if settings.rate_limit_trust_proxy:
+        headers = dict(scope["headers"])
+        real_ip = headers.get(b"x-real-ip")
+        if real_ip:
+            return real_ip.decode("latin-1").strip()
+        # 最左侧的地址由客户端提供，可任意伪造；最右一跳由最近一层代理追加
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded:
+            return forwarded.decode("latin-1").split(",")[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _email_from(scope: Scope, body: bytes) -> str | None:
+    for name, value in parse_qsl(scope["query_string"].decode("latin-1")):
+        if name == "email" and value:
+            return value
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(data, dict) and isinstance(data.get("email"), str):
+            return data["email"]
+    return None
+
+
+def _bucket_key(rule: RateLimitRule, dimension: str, value: str) -> str:
+    # 邮箱等标识取摘要，避免明文写入 Redis
+    digest = hashlib.sha256(value.encode()).hexdigest()[:24]
+    return f"{RATE_LIMIT_PREFIX}{rule.name}:{dimension}:{digest}"
+
+
+async def _acquire(keys: list[str], limits: list[Limit]) -> tuple[int, float]:
+    redis = await get_redis()
+    if redis:
+        args: list[float] = []
+        for limit in limits:
+            args += [limit.capacity, limit.rate]
+        try:
+            index, retry_after = await redis.eval(_TOKEN_BUCKET_SCRIPT, len(keys), *keys, *args)
+            return int(index), float(retry_after)
+        except Exception as e:
+            logger.warning(f"Redis 限流失败，改用进程内令牌桶: {e}")
+    _stats.fallbacks += 1
+    return _local_buckets.acquire(keys, limits)
+
+
+async def _send_too_many_requests(send: Send, retry_after: float) -> None:
+    body = json.dumps(
+        {"code": 429, "message": "请求过于频繁，请稍后重试", "data": None}, ensure_ascii=False
+    ).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(math.ceil(retry_after), 1)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """令牌桶限流中间件（纯 ASGI 实现）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.rate_limit_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        rule = _match_rule(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = b""
+        body_read = False
+        if any(limit.dimension == "email" for limit in rule.limits) and scope["method"] in (
+            "POST",
+            "PUT",
+            "PATCH",
+        ):
+            body = await read_body(receive)
+            body_read = True
+
+        keys: list[str] = []
+        limits: list[Limit] = []
+        for limit in rule.limits:
+            if limit.dimension == "ip":
+                value = _client_ip(scope)
+            elif limit.dimension == "email":
+                value = _email_from(scope, body)
+                if not value:
+                    continue
+                value = value.strip().lower()
+            else:
+                value = "*"
+            keys.append(_bucket_key(rule, limit.dimension, value))
+            limits.append(limit)
+
+        if keys:
+            index, retry_after = await _acquire(keys, limits)
+            if index:
+                dimension = limits[index - 1].dimension
+                _stats.record(rule.name, dimension)
+                logger.info(f"请求被限流: {rule.name}, dimension={dimension}")
+                await _send_too_many_requests(send, retry_after)
+                return
+        _stats.record(rule.name, None)
+
+        if not body_read:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, replay_body(body, receive), send)
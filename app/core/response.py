@@ -41,6 +41,15 @@ class PaginatedData(BaseModel, Generic[T]):
     pages: int
 
 
+class CursorPaginatedData(BaseModel, Generic[T]):
+    """游标分页数据"""
+
+    items: list[T]
+    page_size: int
+    next_cursor: str | None = None
+    has_more: bool = False
+
+
 def success_response(
     data: Any = None,
     message: str = "success",
@@ -0,0 +1,134 @@
+"""启动预热 - 重启/发布后预先请求热点前台接口
+
+部署或重启后第一波流量会同时穿透到数据库。启动时在后台按前台页面实际的请求参数
+并发请求以下接口（经过完整中间件链），一次性填充响应缓存、@cached 数据缓存、
+分类树和标签索引:
+分类树、站点配置、Banner、公告、弹窗公告、底部链接、支付方式、标签、商品列表首页。
+
+预热受 WARMUP_TIMEOUT 时间上限约束，超时未完成的请求直接取消。预热结束（无论成败）
+后标记就绪，/api/health/ready 在此之前返回 503，负载均衡可据此延后导入流量。
+"""
+
+import asyncio
+import time
+
+import httpx
+from starlette.types import ASGIApp
+
+from app.config import get_settings
+from app.core.logger import logger
+
+settings = get_settings()
+
+# 预热的前台接口（查询参数与前台页面请求一致，才能命中同一响应缓存 key）
+WARMUP_PATHS: list[str] = [
+    "/api/v1/products/categories",
+    "/api/v1/platform/site-config",
+    "/api/v1/platform/banners",
+    "/api/v1/platform/announcements",
+    "/api/v1/platform/announcements/popup",
+    "/api/v1/platform/footer-links",
+    "/api/v1/products/payment-methods",
+    "/api/v1/products/tags",
+    # 首页
+    "/api/v1/products?page_size=8",
+    # 商品列表页第一页
+    "/api/v1/products?page=1&page_size=20",
+]
+
+_ready = False
+_report: dict = {"status": "pending"}
+_warmup_task: asyncio.Task | None = None
+
+
+def is_ready() -> bool:
+    """是否就绪（预热已结束）"""
+    return _ready
+
+
+def get_warmup_report() -> dict:
+    """最近一次预热的结果"""
+    return _report
+
+
+async def _fetch(client: httpx.AsyncClient, path: str, results: dict[str, dict]) -> None:
+    start = time.perf_counter()
+    try:
+        response = await client.get(path)
+        results[path] = {"status": response.status_code}
+    except Exception as e:
+        results[path] = {"error": str(e)}
+    results[path]["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+
+async def warm_up(app: ASGIApp) -> dict:
+    """在时间上限内请求所有预热接口，返回预热结果"""
+    started = time.perf_counter()
+    results: dict[str, dict] = {}
+    semaphore = asyncio.Semaphore(max(settings.warmup_concurrency, 1))
+
+    async def fetch(client: httpx.AsyncClient, path: str) -> None:
+        async with semaphore:
+            await _fetch(client, path, results)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+        tasks = [asyncio.create_task(fetch(client, path)) for path in WARMUP_PATHS]
+        _, pending = await asyncio.wait(tasks, timeout=settings.warmup_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    failed = [path for path in WARMUP_PATHS if results.get(path, {}).get("status") != 200]
+    return {
+        "status": "timeout" if pending else "done",
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "warmed": len(WARMUP_PATHS) - len(failed),
+        "failed": failed,
+        "paths": results,
+    }
+
+
+async def _run(app: ASGIApp) -> None:
+    global _ready, _report
+    _report = {"status": "running"}
+    try:
+        _report = await warm_up(app)
+        if _report["failed"]:
+            logger.warning(
+                f"缓存预热结束({_report['status']}): {_report['warmed']}/{len(WARMUP_PATHS)}, "
+                f"未完成: {_report['failed']}"
+            )
+        else:
+            logger.info(f"缓存预热完成: {_report['warmed']} 个接口, {_report['elapsed_ms']}ms")
+    except Exception as e:
+        logger.error(f"缓存预热失败: {e}")
+        _report = {"status": "error", "error": str(e)}
+    finally:
+        _ready = True
+
+
+def start_warmup(app: ASGIApp) -> None:
+    """启动后台预热（应用启动时调用），未启用预热时直接标记就绪"""
+    global _ready, _report, _warmup_task
+    if not settings.warmup_enabled:
+        _ready = True
+        _report = {"status": "disabled"}
+        return
+    if _warmup_task is None or _warmup_task.done():
+        _ready = False
+        _warmup_task = asyncio.create_task(_run(app))
+        logger.info("缓存预热已启动")
+
+
+async def stop_warmup() -> None:
+    """停止预热并标记未就绪（应用关闭时调用，关闭期间不再接收新流量）"""
+    global _ready, _warmup_task
+    if _warmup_task is not None:
+        _warmup_task.cancel()
+        try:
+            await _warmup_task
+        except asyncio.CancelledError:
+            pass
+        _warmup_task = None
+    _ready = False
@@ -12,6 +12,7 @@ from tortoise.contrib.fastapi import RegisterTortoise
 
 from app.api.admin import router as admin_router
 from app.api.common import router as common_router
+from app.api.health import router as health_router
 from app.api.v1 import router as v1_router
 from app.config import TORTOISE_ORM, get_settings
 from app.core.exceptions import AppException
@@ -22,7 +23,21 @@ from app.core.handlers import (
     pydantic_exception_handler,
     validation_exception_handler,
 )
+from app.core.idempotency import IdempotencyMiddleware
 from app.core.logger import logger, setup_logging
+from app.core.middleware import ResponseCacheMiddleware
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.warmup import start_warmup, stop_warmup
+from app.services.flash_sale import start_flash_sale_flusher, stop_flash_sale_flusher
+from app.services.product import ensure_product_list_index
+from app.services.search import setup_search_backend
+from app.utils.cache import (
+    start_cache_invalidation_listener,
+    start_cache_sweeper,
+    stop_cache_invalidation_listener,
+    stop_cache_sweeper,
+)
+from app.utils.redis_client import close_redis, init_redis
 
 settings = get_settings()
 
@@ -59,7 +74,6 @@ async def shutdown_payment_system():
     try:
         from app.services.payment.registry import get_registry
         from app.services.payment.timeout import get_timeout_task
-        from app.utils.redis_client import close_redis
 
         # 停止订单超时检查任务
         timeout_task = get_timeout_task()
@@ -69,9 +83,6 @@ async def shutdown_payment_system():
         registry = get_registry()
         await registry.stop_all_providers()
 
-        # 关闭 Redis 连接
-        await close_redis()
-
         logger.info("支付系统已关闭")
     except Exception as e:
         logger.error(f"支付系统关闭失败: {e}")
@@ -90,14 +101,46 @@ async def lifespan(app: FastAPI):
     ):
         logger.info("数据库连接已建立")
 
+        # 建立 Redis 连接（未配置时跳过）
+        await init_redis()
+
+        # 初始化商品搜索后端（建立全文索引）
+        await setup_search_backend()
+
+        # 建立商品列表排序键索引（列方向与列表排序一致）
+        await ensure_product_list_index()
+
+        # 启动内存缓存过期清理
+        start_cache_sweeper()
+
+        # 订阅缓存失效广播（多 worker 间同步 L1 缓存和响应缓存）
+        await start_cache_invalidation_listener()
+
+        # 秒杀库存对账并启动批量写回任务
+        await start_flash_sale_flusher()
+
         # 启动支付系统
         await startup_payment_system()
 
+        # 后台预热热点前台接口，完成前就绪检查返回 503
+        start_warmup(app)
+
         yield
 
+        await stop_warmup()
+
         # 关闭支付系统
         await shutdown_payment_system()
 
+        # 停止秒杀库存写回任务并写回剩余扣减
+        await stop_flash_sale_flusher()
+
+        await stop_cache_invalidation_listener()
+        await stop_cache_sweeper()
+
+        # 关闭 Redis 连接
+        await close_redis()
+
     logger.info("应用已关闭")
 
 
@@ -192,6 +235,15 @@ app.add_exception_handler(RequestValidationError, validation_exception_handler)
 app.add_exception_handler(ValidationError, pydantic_exception_handler)
 app.add_exception_handler(Exception, global_exception_handler)
 
+# 前台公开接口响应缓存（在 CORS 内层，命中的响应同样经过 CORS 处理）
+app.add_middleware(ResponseCacheMiddleware)
+
+# 下单、发起支付接口的幂等键（重放的响应同样经过 CORS 处理）
+app.add_middleware(IdempotencyMiddleware)
+
+# 前台订单/支付接口限流（在幂等键之前，超限请求直接返回 429）
+app.add_middleware(RateLimitMiddleware)
+
 # CORS 配置
 app.add_middleware(
     CORSMiddleware,
@@ -209,6 +261,7 @@ app.mount(
 )
 
 # 注册路由
+app.include_router(health_router, prefix="/api/health", tags=["健康检查"])
 app.include_router(common_router, prefix="/api/common", tags=["通用接口"])
 app.include_router(v1_router, prefix="/api")
 app.include_router(admin_router, prefix="/api")
@@ -54,6 +54,8 @@ class Order(BaseModel):
         table = "order"
         table_description = "订单表"
         ordering = ["-created_at"]
+        # 列表排序键索引，游标分页按该索引定位
+        indexes = (("created_at", "id"),)
 
     @staticmethod
     def generate_order_no() -> str:
@@ -1,12 +1,16 @@
 """商品相关模型"""
 
 from decimal import Decimal
+from typing import TYPE_CHECKING
 
 from tortoise import fields
 
 from app.models.base import BaseModel
 from app.schemas.product import FeeType, ProductType
 
+if TYPE_CHECKING:
+    from app.models.order import Order
+
 
 class Category(BaseModel):
     """商品分类(最多2层)"""
@@ -68,6 +72,13 @@ class Product(BaseModel):
     )
     price = fields.DecimalField(max_digits=10, decimal_places=2, description="商品价格")
     stock = fields.IntField(default=0, description="库存数量")
+    available_stock = fields.IntField(
+        default=0, description="可用库存(虚拟商品未售卡密数，随库存写入在同一事务中维护)"
+    )
+
+    primary_image_url = fields.CharField(
+        max_length=500, null=True, description="主图URL(随商品图片写入维护，列表直接读取)"
+    )
 
     # 外键关系
     category: fields.ForeignKeyNullableRelation["Category"] = fields.ForeignKeyField(
@@ -89,6 +100,9 @@ class Product(BaseModel):
     # 状态
     is_active = fields.BooleanField(default=True, description="是否上架")
     sort_order = fields.IntField(default=0, description="排序")
+    is_flash_sale = fields.BooleanField(
+        default=False, description="秒杀模式(库存在 Redis 中扣减，后台批量写回)"
+    )
 
     # 反向关系
     images: fields.ReverseRelation["ProductImage"]
@@ -100,6 +114,7 @@ class Product(BaseModel):
         table = "product"
         table_description = "商品表"
         ordering = ["sort_order", "-created_at"]
+        # 列表排序键索引需要倒序列，见 app.services.product.ensure_product_list_index
 
 
 class ProductImage(BaseModel):
@@ -178,6 +193,18 @@ class InventoryItem(BaseModel):
     is_sold = fields.BooleanField(default=False, description="是否已售出")
     sold_at = fields.DatetimeField(null=True, description="售出时间")
 
+    # 下单时预留给订单，售出后保留作为购买记录
+    reserved_by_order: fields.ForeignKeyNullableRelation["Order"] = fields.ForeignKeyField(
+        "models.Order",
+        related_name="reserved_inventory",
+        null=True,
+        on_delete=fields.SET_NULL,
+        description="预留订单",
+    )
+    reserved_until = fields.DatetimeField(null=True, description="预留截止时间(未支付则释放)")
+
     class Meta:
         table = "inventory_item"
         table_description = "虚拟商品库存项表"
+        # 按商品取未售未预留的卡密
+        indexes = (("product_id", "is_sold", "reserved_by_order_id"),)
@@ -1,5 +1,6 @@
 """商品相关Schema"""
 
+from datetime import datetime
 from decimal import Decimal
 from enum import Enum
 from typing import Any
@@ -281,6 +282,7 @@ class ProductBase(BaseSchema):
     category_id: int | None = Field(None, description="所属分类ID")
     is_active: bool = Field(True, description="是否上架")
     sort_order: int = Field(0, ge=0, description="排序值，越小越靠前")
+    is_flash_sale: bool = Field(False, description="是否秒杀模式（库存在 Redis 中扣减）")
 
 
 class ProductCreate(ProductBase):
@@ -312,6 +314,7 @@ class ProductUpdate(BaseSchema):
     category_id: int | None = Field(None, description="分类ID")
     is_active: bool | None = Field(None, description="是否上架")
     sort_order: int | None = Field(None, description="排序值")
+    is_flash_sale: bool | None = Field(None, description="是否秒杀模式")
     payment_method_ids: list[int] | None = Field(None, description="支付方式ID列表")
     images: list[ProductImageCreate] | None = Field(None, description="商品图片列表")
     tags: list[ProductTagCreate] | None = Field(None, description="商品标签列表")
@@ -327,6 +330,7 @@ class ProductListResponse(IDSchema, TimestampSchema):
     price: Decimal = Field(..., description="商品价格")
     stock: int = Field(..., description="库存数量")
     is_active: bool = Field(..., description="是否上架")
+    is_flash_sale: bool = Field(False, description="是否秒杀模式")
     category: CategoryResponse | None = Field(None, description="所属分类")
     primary_image: str | None = Field(None, description="商品主图URL")
     tags: list[ProductTagResponse] = Field(default_factory=list, description="商品标签列表")
@@ -374,3 +378,5 @@ class InventoryItemResponse(InventoryItemBase, IDSchema, TimestampSchema):
     """库存项响应"""
 
     is_sold: bool = Field(..., description="是否已售出")
+    reserved_by_order_id: int | None = Field(None, description="预留订单ID")
+    reserved_until: datetime | None = Field(None, description="预留截止时间")
@@ -0,0 +1,110 @@
+"""分类服务 - 物化分类树"""
+
+import asyncio
+import uuid
+
+from app.core.logger import logger
+from app.models.product import Category
+from app.schemas.product import CategoryResponse, CategoryTreeResponse
+from app.utils.cache import cache_get, cache_set
+
+# 分类树版本号（跨 worker 共享），管理端修改分类后更新版本号使各进程重建
+CATEGORY_TREE_VERSION_KEY = "category:tree:version"
+CATEGORY_TREE_VERSION_TTL = 24 * 3600
+
+# 进程内已构建的分类树及其版本
+_tree: "CategoryTree | None" = None
+_tree_version: str | None = None
+_tree_lock = asyncio.Lock()
+
+
+class CategoryTree:
+    """
+    分类树（内存结构）
+
+    由一次 Category 全表查询构建:
+    - nodes: slug -> 分类
+    - children: 分类ID -> 子分类列表（按 sort_order 排序）
+    - descendant_ids: slug -> 自身及所有后代分类ID
+    """
+
+    def __init__(self, categories: list[CategoryResponse]):
+        ordered = sorted(categories, key=lambda c: (c.sort_order, c.id))
+        self.nodes: dict[str, CategoryResponse] = {c.slug: c for c in ordered}
+        self.children: dict[int, list[CategoryResponse]] = {}
+        self.roots: list[CategoryResponse] = []
+
+        ids = {c.id for c in ordered}
+        for category in ordered:
+            # 父分类不存在时按顶级分类处理
+            if category.parent_id and category.parent_id in ids:
+                self.children.setdefault(category.parent_id, []).append(category)
+            else:
+                self.roots.append(category)
+
+        self.descendant_ids: dict[str, set[int]] = {
+            c.slug: self._collect_ids(c.id) for c in ordered
+        }
+        self._active_tree = [self._build_node(c) for c in self.roots if c.is_active]
+
+    def _collect_ids(self, category_id: int) -> set[int]:
+        ids = {category_id}
+        stack = [category_id]
+        while stack:
+            for child in self.children.get(stack.pop(), []):
+                if child.id not in ids:
+                    ids.add(child.id)
+                    stack.append(child.id)
+        return ids
+
+    def _build_node(self, category: CategoryResponse) -> CategoryTreeResponse:
+        return CategoryTreeResponse(
+            **category.model_dump(),
+            children=[
+                self._build_node(c) for c in self.children.get(category.id, []) if c.is_active
+            ],
+        )
+
+    def get(self, slug: str) -> CategoryResponse | None:
+        """按别名获取分类"""
+        return self.nodes.get(slug)
+
+    def active_tree(self) -> list[CategoryTreeResponse]:
+        """前台分类树（仅启用的分类）"""
+        return self._active_tree
+
+
+async def _build_tree() -> CategoryTree:
+    categories = await Category.all()
+    tree = CategoryTree([CategoryResponse.model_validate(c) for c in categories])
+    logger.info(f"分类树已重建: {len(categories)} 个分类")
+    return tree
+
+
+async def get_category_tree() -> CategoryTree:
+    """获取分类树（版本未变化时直接返回进程内缓存）"""
+    global _tree, _tree_version
+
+    version = await cache_get(CATEGORY_TREE_VERSION_KEY)
+    if _tree is not None and version is not None and version == _tree_version:
+        return _tree
+
+    async with _tree_lock:
+        if _tree is not None and version is not None and version == _tree_version:
+            return _tree
+
+        if version is None:
+            version = uuid.uuid4().hex
+            await cache_set(CATEGORY_TREE_VERSION_KEY, version, CATEGORY_TREE_VERSION_TTL)
+
+        _tree = await _build_tree()
+        _tree_version = version
+        return _tree
+
+
+async def invalidate_category_tree() -> None:
+    """分类变更后调用，使所有进程在下次读取时重建分类树"""
+    global _tree, _tree_version
+    _tree = None
+    _tree_version = None
+    await cache_set(CATEGORY_TREE_VERSION_KEY, uuid.uuid4().hex, CATEGORY_TREE_VERSION_TTL)
@@ -1,21 +1,28 @@
 """发货服务"""
 
 import asyncio
-from datetime import datetime
+from datetime import UTC, datetime
 
+from tortoise.expressions import F, Q
+from tortoise.functions import Count
+from tortoise.transactions import in_transaction
+
+from app.core.exceptions import BadRequestException
 from app.core.logger import logger
 from app.models.order import Order, OrderLog
 from app.models.platform import PlatformConfig
-from app.models.product import InventoryItem
+from app.models.product import InventoryItem, Product
 from app.schemas.order import OrderStatus
 from app.schemas.product import ProductType
 from app.services.email import EmailService
+from app.utils.cache import CACHE_TAG_PLATFORM, cached
 
 
 class DeliveryService:
     """发货服务"""
 
     @staticmethod
+    @cached("auto_delivery", tags=(CACHE_TAG_PLATFORM,))
     async def get_auto_delivery_enabled() -> bool:
         """获取虚拟商品自动发货配置"""
         config = await PlatformConfig.filter(key="auto_delivery_virtual").first()
@@ -60,27 +67,18 @@ class DeliveryService:
             product = item.product
 
             if product.product_type == ProductType.VIRTUAL:
-                # 虚拟商品：从库存中获取卡密
-                inventory_items = await InventoryItem.filter(
-                    product_id=item.product_id,
-                    is_sold=False,
-                ).limit(item.quantity)
-
-                if len(inventory_items) < item.quantity:
-                    error_msg = f"商品 {item.product_name} 库存不足，需要 {item.quantity}，实际 {len(inventory_items)}"
-                    logger.error(f"发货失败 - {error_msg}")
-                    return False, error_msg, delivered_count
-
-                delivery_contents = []
-                for inv_item in inventory_items:
-                    inv_item.is_sold = True
-                    inv_item.sold_at = datetime.now()
-                    await inv_item.save()
-                    delivery_contents.append(inv_item.content)
-
-                item.delivery_content = "\n".join(delivery_contents)
-                item.delivered_at = datetime.now()
-                await item.save()
+                # 虚拟商品：售出下单时预留的卡密，售出与发货记录在同一事务中完成
+                try:
+                    async with in_transaction():
+                        delivery_contents = await DeliveryService._sell_inventory(
+                            order.id, item.product_id, item.quantity, item.product_name
+                        )
+                        item.delivery_content = "\n".join(delivery_contents)
+                        item.delivered_at = datetime.now(UTC)
+                        await item.save()
+                except BadRequestException as e:
+                    logger.error(f"发货失败 - {e.message}")
+                    return False, e.message, delivered_count
 
                 all_delivery_contents.append(f"【{item.product_name}】\n{item.delivery_content}")
                 delivered_count += 1
@@ -88,7 +86,7 @@ class DeliveryService:
                 # 实体商品：标记已发货，delivery_content 为备注信息
                 if remark:
                     item.delivery_content = remark
-                item.delivered_at = datetime.now()
+                item.delivered_at = datetime.now(UTC)
                 await item.save()
 
                 all_delivery_contents.append(f"【{item.product_name}】实体商品已发货")
@@ -135,6 +133,66 @@ class DeliveryService:
         )
         return True, "发货成功", delivered_count
 
+    @staticmethod
+    async def _sell_inventory(
+        order_id: int, product_id: int, quantity: int, product_name: str
+    ) -> list[str]:
+        """
+        售出卡密（需在事务中调用）
+
+        直接售出本订单下单时预留的卡密（预留时已扣减库存）。预留已释放的部分
+        （如预留过期后才完成支付、预留功能上线前的订单）再从未预留的卡密中取，并扣减库存。
+
+        Returns:
+            售出的卡密内容列表
+
+        Raises:
+            BadRequestException: 库存不足或卡密已被并发售出
+        """
+        inventory_items = (
+            await InventoryItem.filter(
+                reserved_by_order_id=order_id, product_id=product_id, is_sold=False
+            )
+            .select_for_update()
+            .order_by("id")
+            .limit(quantity)
+        )
+        reserved_count = len(inventory_items)
+
+        missing = quantity - reserved_count
+        if missing:
+            unreserved = (
+                await InventoryItem.filter(
+                    product_id=product_id, is_sold=False, reserved_by_order_id=None
+                )
+                .select_for_update()
+                .limit(missing)
+            )
+            if len(unreserved) < missing:
+                raise BadRequestException(
+                    message=f"商品 {product_name} 库存不足，"
+                    f"需要 {quantity}，实际 {reserved_count + len(unreserved)}"
+                )
+            inventory_items += unreserved
+
+        # 带 is_sold=False 条件更新，并发发货时同一卡密不会被售出两次；售出的卡密记录购买订单
+        sold = await InventoryItem.filter(
+            Q(reserved_by_order_id=order_id) | Q(reserved_by_order_id=None),
+            id__in=[inv_item.id for inv_item in inventory_items],
+            is_sold=False,
+        ).update(
+            is_sold=True,
+            sold_at=datetime.now(UTC),
+            reserved_by_order_id=order_id,
+            reserved_until=None,
+        )
+        if sold != quantity:
+            raise BadRequestException(message=f"商品 {product_name} 库存已被占用，请重试")
+
+        if missing:
+            await DeliveryService.adjust_virtual_stock(product_id, -missing)
+        return [inv_item.content for inv_item in inventory_items]
+
     @staticmethod
     async def auto_deliver_virtual_items(order: Order) -> tuple[bool, str, int]:
         """
@@ -169,7 +227,7 @@ class DeliveryService:
     @staticmethod
     async def check_virtual_stock(product_id: int, quantity: int) -> tuple[bool, int]:
         """
-        检查虚拟商品库存（基于InventoryItem）
+        检查虚拟商品库存（基于 Product.available_stock 计数器，不含已预留的卡密）
 
         Args:
             product_id: 商品ID
@@ -178,16 +236,94 @@ class DeliveryService:
         Returns:
             (is_sufficient, available_count)
         """
-        available = await InventoryItem.filter(
-            product_id=product_id,
-            is_sold=False,
-        ).count()
+        available = await DeliveryService.get_virtual_stock_count(product_id)
         return available >= quantity, available
 
     @staticmethod
     async def get_virtual_stock_count(product_id: int) -> int:
         """获取虚拟商品可用库存数量"""
-        return await InventoryItem.filter(
-            product_id=product_id,
-            is_sold=False,
-        ).count()
+        available = (
+            await Product.filter(id=product_id).first().values_list("available_stock", flat=True)
+        )
+        return available or 0
+
+    @staticmethod
+    async def adjust_virtual_stock(product_id: int, delta: int) -> None:
+        """
+        按增量调整虚拟商品库存（stock 与 available_stock 同步调整）
+
+        两者都表示未售出且未预留的卡密数，卡密新增/删除/预留/释放/售出时统一经此调整。
+        使用 F 表达式原子更新，需与卡密变更在同一事务中调用
+        """
+        await Product.filter(id=product_id).update(
+            available_stock=F("available_stock") + delta, stock=F("stock") + delta
+        )
+
+    @staticmethod
+    async def count_unsold_inventory(product_ids: list[int] | None = None) -> dict[int, int]:
+        """
+        实时统计未售且未预留的卡密数量（单条 GROUP BY 查询，用于校正计数器）
+
+        Args:
+            product_ids: 商品ID列表，None 表示全部商品
+
+        Returns:
+            {product_id: unsold_count}，无可用卡密的商品不在结果中
+        """
+        query = InventoryItem.filter(is_sold=False, reserved_by_order_id=None)
+        if product_ids is not None:
+            if not product_ids:
+                return {}
+            query = query.filter(product_id__in=product_ids)
+
+        rows = (
+            await query.annotate(count=Count("id"))
+            .group_by("product_id")
+            .values("product_id", "count")
+        )
+        return {row["product_id"]: row["count"] for row in rows}
+
+    @staticmethod
+    async def reconcile_available_stock(dry_run: bool = False) -> list[tuple[int, int, int]]:
+        """
+        校正虚拟商品库存计数器（available_stock 与 stock）
+
+        先批量找出计数器与实际可用卡密数不一致的商品，再逐个加行锁重新统计并写回，
+        避免与进行中的发货相互覆盖。
+
+        Args:
+            dry_run: 只检查不修复
+
+        Returns:
+            存在偏差的商品 [(product_id, 可用库存计数器值, 实际可用数)]
+        """
+        products = await Product.filter(product_type=ProductType.VIRTUAL).values_list(
+            "id", "available_stock", "stock"
+        )
+        unsold = await DeliveryService.count_unsold_inventory()
+        drifted = [
+            (product_id, counter, unsold.get(product_id, 0))
+            for product_id, counter, stock in products
+            if not counter == stock == unsold.get(product_id, 0)
+        ]
+        if dry_run:
+            return drifted
+
+        fixed = []
+        for product_id, _, _ in drifted:
+            async with in_transaction():
+                product = await Product.filter(id=product_id).select_for_update().first()
+                if not product:
+                    continue
+                actual = await InventoryItem.filter(
+                    product_id=product_id, is_sold=False, reserved_by_order_id=None
+                ).count()
+                if not product.available_stock == product.stock == actual:
+                    fixed.append((product_id, product.available_stock, actual))
+                    await Product.filter(id=product_id).update(
+                        available_stock=actual, stock=actual
+                    )
+
+        for product_id, counter, actual in fixed:
+            logger.warning(f"可用库存已校正: product_id={product_id}, {counter} -> {actual}")
+        return fixed
@@ -16,7 +16,7 @@ class EmailService:
 
     @staticmethod
     async def get_config() -> EmailConfig | None:
-        """获取邮件配置"""
+        """获取邮件配置（不缓存：配置含 SMTP 密码，不能写入共享缓存）"""
         return await EmailConfig.filter(is_verified=True).first()
 
     @classmethod
@@ -0,0 +1,394 @@
+"""秒杀模式 - 热点商品库存在 Redis 中原子扣减
+
+开启秒杀模式的商品（Product.is_flash_sale），下单时不再逐单更新 product 行，而是由
+Lua 脚本在 Redis 计数器上原子检查并扣减（flash:stock:{id}），避免大量并发下单争抢
+同一行锁:
+
+- 实体商品: 扣减记入待写回增量（flash:pending），后台任务按间隔批量写回 Product.stock，
+  每个商品每个周期一条 UPDATE
+- 虚拟商品: Redis 计数器只作为限流闸门，卡密预留仍在数据库事务中完成（需锁定具体卡密）
+
+计数器 = 数据库库存 - 未写回增量。启动时、关闭秒杀模式时、后台发现计数器缺失时
+（如 Redis 重启）先写回增量再按数据库重新对账；对账与写回在同一把分布式锁下串行执行。
+计数器缺失或 Redis 不可用时秒杀商品拒绝下单（503），不会超卖。
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import NamedTuple
+
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+
+from app.config import get_settings
+from app.core.exceptions import BadRequestException, ServiceUnavailableException
+from app.core.logger import logger
+from app.models.product import Product
+from app.schemas.product import ProductType
+from app.utils.redis_client import DistributedLock, get_redis
+
+settings = get_settings()
+
+FLASH_STOCK_PREFIX = "flash:stock:"
+# 已在 Redis 扣减、尚未写回数据库的实体商品库存 {product_id: 数量}
+FLASH_PENDING_KEY = "flash:pending"
+# 已建立计数器的商品ID集合（对账时清理已关闭秒杀模式的计数器）
+FLASH_PRODUCTS_KEY = "flash:products"
+FLASH_LOCK_NAME = "flash_sale"
+FLASH_LOCK_TTL = 30
+
+# 全部检查通过才扣减（整单原子），返回 0 成功，-i 第 i 个计数器不存在，i 第 i 个库存不足
+# KEYS: 计数器..., 待写回哈希；ARGV: 数量..., 是否写回(1/0)..., 商品ID...
+_ACQUIRE_SCRIPT = """
+local n = #KEYS - 1
+for i = 1, n do
+    local stock = redis.call("get", KEYS[i])
+    if not stock then
+        return -i
+    end
+    if tonumber(stock) < tonumber(ARGV[i]) then
+        return i
+    end
+end
+for i = 1, n do
+    redis.call("decrby", KEYS[i], ARGV[i])
+    if ARGV[n + i] == "1" then
+        redis.call("hincrby", KEYS[n + 1], ARGV[2 * n + i], ARGV[i])
+    end
+end
+return 0
+"""
+
+# 加回库存（取消订单、下单失败补偿、补充卡密），只处理仍存在的计数器，返回每项是否已处理
+_RESTOCK_SCRIPT = """
+local n = #KEYS - 1
+local restocked = {}
+for i = 1, n do
+    if redis.call("exists", KEYS[i]) == 1 then
+        redis.call("incrby", KEYS[i], ARGV[i])
+        if ARGV[n + i] == "1" then
+            redis.call("hincrby", KEYS[n + 1], ARGV[2 * n + i], -tonumber(ARGV[i]))
+        end
+        restocked[i] = 1
+    else
+        restocked[i] = 0
+    end
+end
+return restocked
+"""
+
+# 取出并清空待写回增量
+_TAKE_PENDING_SCRIPT = """
+local deltas = redis.call("hgetall", KEYS[1])
+redis.call("del", KEYS[1])
+return deltas
+"""
+
+# 按数据库库存重建计数器（扣除仍未写回的增量）
+_SYNC_SCRIPT = """
+local pending = tonumber(redis.call("hget", KEYS[2], ARGV[2]) or "0")
+local stock = tonumber(ARGV[1]) - pending
+redis.call("set", KEYS[1], stock)
+redis.call("sadd", KEYS[3], ARGV[2])
+return stock
+"""
+
+_flusher_task: asyncio.Task | None = None
+
+
+class FlashItem(NamedTuple):
+    """秒杀扣减项"""
+
+    product_id: int
+    quantity: int
+    # 实体商品扣减需写回数据库；虚拟商品库存由卡密预留维护
+    persist: bool
+    name: str = ""
+
+
+def _stock_key(product_id: int) -> str:
+    return f"{FLASH_STOCK_PREFIX}{product_id}"
+
+
+def _script_args(items: list[FlashItem]) -> tuple[list[str], list]:
+    keys = [_stock_key(item.product_id) for item in items] + [FLASH_PENDING_KEY]
+    args = (
+        [item.quantity for item in items]
+        + ["1" if item.persist else "0" for item in items]
+        + [item.product_id for item in items]
+    )
+    return keys, args
+
+
+@asynccontextmanager
+async def _flash_lock(wait: float = 5.0):
+    """对账/写回锁（阻塞等待，超时按服务繁忙处理）"""
+    lock = DistributedLock(FLASH_LOCK_NAME, ttl=FLASH_LOCK_TTL)
+    deadline = time.monotonic() + wait
+    while not await lock.acquire():
+        if time.monotonic() >= deadline:
+            raise ServiceUnavailableException(message="秒杀库存同步中，请稍后重试")
+        await asyncio.sleep(0.05)
+    try:
+        yield
+    finally:
+        await lock.release()
+
+
+class FlashSaleService:
+    """秒杀库存服务"""
+
+    @staticmethod
+    async def acquire(items: list[FlashItem]) -> None:
+        """
+        在 Redis 中原子扣减整单秒杀商品库存（在下单事务之前调用）
+
+        Raises:
+            BadRequestException: 库存不足
+            ServiceUnavailableException: Redis 不可用或计数器未就绪
+        """
+        redis = await get_redis()
+        if not redis:
+            raise ServiceUnavailableException(message="秒杀服务暂不可用，请稍后重试")
+
+        keys, args = _script_args(items)
+        try:
+            result = int(await redis.eval(_ACQUIRE_SCRIPT, len(keys), *keys, *args))
+        except Exception as e:
+            logger.error(f"秒杀库存扣减失败: {e}")
+            raise ServiceUnavailableException(message="秒杀服务暂不可用，请稍后重试")
+
+        if result > 0:
+            item = items[result - 1]
+            logger.warning(f"秒杀库存不足: {item.name}, need={item.quantity}")
+            raise BadRequestException(message=f"商品 {item.name} 库存不足")
+        if result < 0:
+            # 计数器缺失（Redis 重启或正在切换模式），由后台任务重新对账
+            item = items[-result - 1]
+            logger.warning(f"秒杀库存计数器不存在: product_id={item.product_id}")
+            raise ServiceUnavailableException(message="秒杀库存同步中，请稍后重试")
+
+    @staticmethod
+    async def restock(items: list[FlashItem]) -> None:
+        """
+        加回秒杀库存（取消订单、下单失败补偿、补充/删除卡密）
+
+        计数器已不存在（已关闭秒杀模式）或 Redis 不可用时，实体商品直接加回数据库库存；
+        未写回的扣减稍后照常写回，两者相抵。
+        """
+        restocked = [0] * len(items)
+        redis = await get_redis()
+        if redis:
+            keys, args = _script_args(items)
+            try:
+                restocked = await redis.eval(_RESTOCK_SCRIPT, len(keys), *keys, *args)
+            except Exception as e:
+                logger.error(f"秒杀库存回补失败: {e}")
+
+        for item, done in zip(items, restocked, strict=True):
+            if int(done) or not item.persist:
+                continue
+            await Product.filter(id=item.product_id).update(stock=F("stock") + item.quantity)
+            logger.info(
+                f"秒杀计数器不可用，直接回补数据库库存: "
+                f"product_id={item.product_id}, quantity={item.quantity}"
+            )
+
+    @staticmethod
+    async def flush() -> int:
+        """
+        将待写回增量批量写回数据库（需持有对账锁）
+
+        Returns:
+            写回的商品数
+        """
+        redis = await get_redis()
+        if not redis:
+            return 0
+
+        raw = await redis.eval(_TAKE_PENDING_SCRIPT, 1, FLASH_PENDING_KEY)
+        deltas = {
+            int(raw[i]): int(raw[i + 1]) for i in range(0, len(raw), 2) if int(raw[i + 1])
+        }
+        if not deltas:
+            return 0
+
+        try:
+            async with in_transaction():
+                for product_id, delta in sorted(deltas.items()):
+                    await Product.filter(id=product_id).update(stock=F("stock") - delta)
+        except Exception:
+            # 写回失败，增量放回 Redis 等待下个周期
+            async with redis.pipeline(transaction=True) as pipe:
+                for product_id, delta in deltas.items():
+                    pipe.hincrby(FLASH_PENDING_KEY, product_id, delta)
+                await pipe.execute()
+            raise
+
+        logger.debug(f"秒杀库存写回: {deltas}")
+        return len(deltas)
+
+    @staticmethod
+    async def _sync_locked(product_id: int) -> int | None:
+        """按数据库库存重建计数器（需持有对账锁），非秒杀商品删除计数器"""
+        redis = await get_redis()
+        if not redis:
+            return None
+
+        product = await Product.filter(id=product_id).first()
+        if not product or not product.is_flash_sale:
+            await redis.delete(_stock_key(product_id))
+            await redis.srem(FLASH_PRODUCTS_KEY, product_id)
+            return None
+
+        if product.product_type == ProductType.VIRTUAL:
+            db_stock = product.available_stock
+        else:
+            db_stock = product.stock
+        stock = int(
+            await redis.eval(
+                _SYNC_SCRIPT,
+                3,
+                _stock_key(product_id),
+                FLASH_PENDING_KEY,
+                FLASH_PRODUCTS_KEY,
+                db_stock,
+                product_id,
+            )
+        )
+        logger.info(f"秒杀库存已对账: product_id={product_id}, stock={stock}")
+        return stock
+
+    @staticmethod
+    async def sync(product_id: int) -> int | None:
+        """写回增量后按数据库库存重建计数器（管理员修改库存/卡密后调用）"""
+        if not await get_redis():
+            return None
+        async with _flash_lock():
+            await FlashSaleService.flush()
+            return await FlashSaleService._sync_locked(product_id)
+
+    @staticmethod
+    async def ensure_available() -> None:
+        """
+        检查能否开启秒杀模式
+
+        Raises:
+            BadRequestException: Redis 未配置或不可用
+        """
+        if not await get_redis():
+            raise BadRequestException(message="Redis 不可用，无法开启秒杀模式")
+
+    @staticmethod
+    async def enable(product_id: int) -> None:
+        """
+        开启秒杀模式
+
+        Raises:
+            BadRequestException: Redis 未配置或不可用
+        """
+        await FlashSaleService.ensure_available()
+        await Product.filter(id=product_id).update(is_flash_sale=True)
+        await FlashSaleService.sync(product_id)
+        logger.info(f"秒杀模式已开启: product_id={product_id}")
+
+    @staticmethod
+    async def disable(product_id: int) -> None:
+        """
+        关闭秒杀模式
+
+        先删除计数器（之后的秒杀下单被拒绝），再写回全部增量，最后清除标记，
+        此后按数据库库存正常下单。
+        """
+        redis = await get_redis()
+        if not redis:
+            await Product.filter(id=product_id).update(is_flash_sale=False)
+            return
+        async with _flash_lock():
+            await redis.delete(_stock_key(product_id))
+            await redis.srem(FLASH_PRODUCTS_KEY, product_id)
+            await FlashSaleService.flush()
+            await Product.filter(id=product_id).update(is_flash_sale=False)
+        logger.info(f"秒杀模式已关闭: product_id={product_id}")
+
+    @staticmethod
+    async def reconcile() -> None:
+        """启动对账：写回遗留增量，重建所有秒杀商品的计数器，清理已关闭商品的计数器"""
+        redis = await get_redis()
+        if not redis:
+            return
+        async with _flash_lock():
+            await FlashSaleService.flush()
+            product_ids = set(
+                await Product.filter(is_flash_sale=True).values_list("id", flat=True)
+            )
+            members = await redis.smembers(FLASH_PRODUCTS_KEY)
+            known_ids = {int(product_id) for product_id in members}
+            for product_id in sorted(product_ids | known_ids):
+                await FlashSaleService._sync_locked(product_id)
+        if product_ids:
+            logger.info(f"秒杀库存启动对账完成: {len(product_ids)} 个商品")
+
+    @staticmethod
+    async def _resync_missing() -> None:
+        """重建缺失的计数器（需持有对账锁）"""
+        redis = await get_redis()
+        product_ids = await Product.filter(is_flash_sale=True).values_list("id", flat=True)
+        if not redis or not product_ids:
+            return
+        async with redis.pipeline(transaction=False) as pipe:
+            for product_id in product_ids:
+                pipe.exists(_stock_key(product_id))
+            exists = await pipe.execute()
+        for product_id, found in zip(product_ids, exists, strict=True):
+            if not found:
+                await FlashSaleService._sync_locked(product_id)
+
+
+async def _flush_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        if not await get_redis():
+            continue
+        # 多 worker 只需一个执行，拿不到锁说明其他 worker 正在写回
+        lock = DistributedLock(FLASH_LOCK_NAME, ttl=FLASH_LOCK_TTL)
+        if not await lock.acquire():
+            continue
+        try:
+            await FlashSaleService.flush()
+            await FlashSaleService._resync_missing()
+        except Exception as e:
+            logger.error(f"秒杀库存写回失败: {e}")
+        finally:
+            await lock.release()
+
+
+async def start_flash_sale_flusher() -> None:
+    """启动对账并启动秒杀库存写回任务（应用启动时调用）"""
+    global _flusher_task
+    try:
+        await FlashSaleService.reconcile()
+    except Exception as e:
+        logger.error(f"秒杀库存启动对账失败: {e}")
+    if _flusher_task is None or _flusher_task.done():
+        _flusher_task = asyncio.create_task(_flush_loop(settings.flash_sale_flush_interval))
+        logger.info("秒杀库存写回任务已启动")
+
+
+async def stop_flash_sale_flusher() -> None:
+    """停止写回任务并写回剩余增量（应用关闭时调用）"""
+    global _flusher_task
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        try:
+            await _flusher_task
+        except asyncio.CancelledError:
+            pass
+        _flusher_task = None
+    try:
+        if await get_redis():
+            async with _flash_lock():
+                await FlashSaleService.flush()
+    except Exception as e:
+        logger.error(f"秒杀库存关闭写回失败: {e}")
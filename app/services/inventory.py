@@ -0,0 +1,152 @@
+"""虚拟商品库存预留服务
+
+下单时为虚拟商品锁定具体卡密（reserved_by_order / reserved_until），支付后发货直接把
+本订单预留的卡密标记为已售出，并发支付的订单不会争抢同一批卡密。
+
+- 预留: 与订单创建在同一事务中，条件扣减 Product.available_stock 后标记卡密
+- 释放: 取消订单、预留过期时按订单批量释放，并加回库存
+- 延长: 发起支付时延长到支付过期时间
+
+虚拟商品的 Product.stock 与 available_stock 都为未售出且未预留的卡密数，两者同步调整。
+"""
+
+from datetime import UTC, datetime, timedelta
+
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+
+from app.config import get_settings
+from app.core.exceptions import BadRequestException
+from app.core.logger import logger
+from app.models.product import InventoryItem, Product
+from app.schemas.order import OrderStatus
+from app.services.delivery import DeliveryService
+
+settings = get_settings()
+
+# 预留过期后仍保留预留的订单状态（已支付待发货）
+HELD_STATUSES = (OrderStatus.PAID, OrderStatus.PROCESSING)
+
+
+class InventoryService:
+    """虚拟商品库存预留服务"""
+
+    @staticmethod
+    def reservation_deadline(seconds: int | None = None) -> datetime:
+        """预留截止时间"""
+        return datetime.now(UTC) + timedelta(seconds=seconds or settings.inventory_reservation_ttl)
+
+    @staticmethod
+    async def reserve(
+        order_id: int,
+        product_id: int,
+        quantity: int,
+        product_name: str,
+        reserved_until: datetime,
+    ) -> None:
+        """
+        为订单预留卡密（需在事务中调用）
+
+        先带 available_stock >= 数量 条件扣减计数器（同时锁住商品行，
+        同一商品的并发预留串行执行），再标记具体卡密。
+
+        Raises:
+            BadRequestException: 库存不足
+        """
+        updated = await Product.filter(id=product_id, available_stock__gte=quantity).update(
+            available_stock=F("available_stock") - quantity, stock=F("stock") - quantity
+        )
+        # 同 DeliveryService.adjust_virtual_stock 一起扣减两个计数器，另带数量条件防止超卖
+        if not updated:
+            raise BadRequestException(message=f"商品 {product_name} 库存不足")
+
+        inventory_items = (
+            await InventoryItem.filter(
+                product_id=product_id, is_sold=False, reserved_by_order_id=None
+            )
+            .select_for_update()
+            .order_by("id")
+            .limit(quantity)
+        )
+        reserved = 0
+        if len(inventory_items) == quantity:
+            reserved = await InventoryItem.filter(
+                id__in=[inv_item.id for inv_item in inventory_items],
+                is_sold=False,
+                reserved_by_order_id=None,
+            ).update(reserved_by_order_id=order_id, reserved_until=reserved_until)
+        if reserved != quantity:
+            # 计数器与卡密不一致（需执行 scripts/reconcile_products.py 校正）
+            logger.warning(
+                f"预留卡密失败: product_id={product_id}, need={quantity}, got={reserved}"
+            )
+            raise BadRequestException(message=f"商品 {product_name} 库存不足")
+
+    @staticmethod
+    async def release(order_ids: list[int]) -> int:
+        """
+        批量释放订单预留的未售卡密，并加回可用库存
+
+        Returns:
+            释放的卡密数量
+        """
+        if not order_ids:
+            return 0
+
+        async with in_transaction():
+            inventory_items = await InventoryItem.filter(
+                reserved_by_order_id__in=order_ids, is_sold=False
+            ).select_for_update()
+            if not inventory_items:
+                return 0
+
+            await InventoryItem.filter(
+                id__in=[inv_item.id for inv_item in inventory_items], is_sold=False
+            ).update(reserved_by_order_id=None, reserved_until=None)
+
+            counts: dict[int, int] = {}
+            for inv_item in inventory_items:
+                counts[inv_item.product_id] = counts.get(inv_item.product_id, 0) + 1
+            for product_id, count in counts.items():
+                await DeliveryService.adjust_virtual_stock(product_id, count)
+
+        logger.info(f"释放预留卡密: orders={order_ids}, count={len(inventory_items)}")
+        return len(inventory_items)
+
+    @staticmethod
+    async def extend(order_id: int, reserved_until: datetime) -> int:
+        """延长订单的预留截止时间（发起支付时调用，只延长不缩短）"""
+        return await InventoryItem.filter(
+            reserved_by_order_id=order_id, is_sold=False, reserved_until__lt=reserved_until
+        ).update(reserved_until=reserved_until)
+
+    @staticmethod
+    async def get_expired_reservations() -> dict[OrderStatus, list[int]]:
+        """
+        预留已过期的订单
+
+        Returns:
+            {订单状态: [order_id, ...]}
+        """
+        rows = (
+            await InventoryItem.filter(
+                is_sold=False,
+                reserved_by_order_id__isnull=False,
+                reserved_until__lt=datetime.now(UTC),
+            )
+            .distinct()
+            .values_list("reserved_by_order_id", "reserved_by_order__status")
+        )
+        result: dict[OrderStatus, list[int]] = {}
+        for order_id, status in rows:
+            result.setdefault(OrderStatus(status), []).append(order_id)
+        return result
+
+    @staticmethod
+    async def hold(order_ids: list[int]) -> int:
+        """已支付待发货的订单不再过期，保留预留直到发货"""
+        if not order_ids:
+            return 0
+        return await InventoryItem.filter(
+            reserved_by_order_id__in=order_ids, is_sold=False
+        ).update(reserved_until=None)
@@ -1,8 +1,16 @@
 """订单服务"""
 
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+
 from app.core.logger import logger
-from app.models.order import Order, OrderLog, OrderStatus
+from app.core.middleware import invalidate_response_cache
+from app.models.order import Order, OrderItem, OrderLog, OrderStatus
 from app.models.product import Product
+from app.schemas.product import ProductType
+from app.services.flash_sale import FlashItem, FlashSaleService
+from app.services.inventory import InventoryService
+from app.utils.cache import CACHE_TAG_PRODUCTS
 from app.utils.redis_client import (
     get_pending_order,
     remove_pending_order,
@@ -32,26 +40,50 @@ class OrderService:
         # 获取待支付数据用于后续清理
         pending_data = await get_pending_order(order.order_no)
 
-        # 释放库存
-        await order.fetch_related("items")
-        for item in order.items:
-            product = await Product.filter(id=item.product_id).first()
-            if product:
-                # 无论是实体还是虚拟商品，取消订单都需要恢复库存
-                # 注意：虚拟商品下单时是扣减了InventoryItem还是Product.stock需要确认
-                # 根据 app/api/v1/order.py 逻辑：
-                # 虚拟商品检查 DeliveryService.check_virtual_stock (不扣减Product.stock?)
-                # 实体商品扣减 Product.stock
-                # 但 line 103: product.stock -= item_data["quantity"] 对所有商品都执行了扣减
-                # 所以这里统一恢复 Product.stock 是正确的
-
-                product.stock += item.quantity
-                await product.save()
-                logger.info(f"释放库存: product_id={product.id}, quantity={item.quantity}")
-
-        # 更新订单状态
-        order.status = OrderStatus.CANCELLED
-        await order.save()
+        quantities: dict[int, int] = {}
+        virtual_ids: set[int] = set()
+        items = await OrderItem.filter(order_id=order.id).values_list(
+            "product_id", "quantity", "product_type"
+        )
+        for product_id, quantity, product_type in items:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+            if product_type == ProductType.VIRTUAL:
+                virtual_ids.add(product_id)
+        flash_items = [
+            FlashItem(
+                product_id, quantities[product_id], persist=product_type == ProductType.PHYSICAL
+            )
+            for product_id, product_type in await Product.filter(
+                id__in=list(quantities), is_flash_sale=True
+            ).values_list("id", "product_type")
+        ]
+        # 秒杀实体商品的库存在 Redis 中扣减，取消后加回 Redis，不更新数据库
+        redis_only = {item.product_id for item in flash_items if item.persist}
+
+        # 状态更新、恢复库存、释放预留卡密在同一事务中完成；
+        # 带 status=PENDING 条件更新，与支付回调或其他取消并发时只有一方生效
+        async with in_transaction():
+            updated = await Order.filter(id=order.id, status=OrderStatus.PENDING).update(
+                status=OrderStatus.CANCELLED
+            )
+            if not updated:
+                logger.warning(f"订单状态已变化，无法取消: order_no={order.order_no}")
+                return False
+            order.status = OrderStatus.CANCELLED
+
+            # 虚拟商品的库存随预留卡密一起释放
+            for product_id, quantity in sorted(quantities.items()):
+                if product_id in redis_only or product_id in virtual_ids:
+                    continue
+                await Product.filter(id=product_id).update(stock=F("stock") + quantity)
+                logger.info(f"释放库存: product_id={product_id}, quantity={quantity}")
+
+            await InventoryService.release([order.id])
+
+        if flash_items:
+            await FlashSaleService.restock(flash_items)
+        # 事务提交后再失效，避免并发请求把提交前的库存重新写入缓存
+        await invalidate_response_cache(CACHE_TAG_PRODUCTS)
 
         # 记录日志
         log_content = f"订单已取消，操作人：{operator}"
@@ -3,8 +3,10 @@
 import asyncio
 
 from app.core.logger import logger
+from app.core.middleware import invalidate_response_cache
 from app.models.order import Order
 from app.schemas.order import OrderStatus
+from app.utils.cache import CACHE_TAG_PRODUCTS
 from app.utils.redis_client import (
     DistributedLock,
     get_expired_orders,
@@ -67,6 +69,15 @@ class OrderTimeoutTask:
             except Exception as e:
                 logger.error(f"订单超时检查出错: {e}")
 
+            # 预留过期处理不依赖 Redis（未配置或熔断时同样执行）；取消订单和释放预留
+            # 都是带条件的更新，多个 worker 同时执行也只生效一次
+            try:
+                await self._check_expired_reservations()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"卡密预留过期检查出错: {e}")
+
             await asyncio.sleep(CHECK_INTERVAL)
 
         logger.info("订单超时检查循环结束")
@@ -90,6 +101,39 @@ class OrderTimeoutTask:
             except Exception as e:
                 logger.error(f"取消超时订单失败: order_no={order_no}, error={e}")
 
+    async def _check_expired_reservations(self) -> None:
+        """
+        处理卡密预留已过期的订单
+
+        - 待支付: 取消订单（同时释放预留），覆盖下单后未发起支付、不在待支付记录中的订单
+        - 已支付待发货: 保留预留直到发货，不再过期
+        - 其他状态: 释放残留的预留
+        """
+        from app.services.inventory import HELD_STATUSES, InventoryService
+        from app.services.order import OrderService
+
+        expired = await InventoryService.get_expired_reservations()
+        if not expired:
+            return
+
+        pending_ids = expired.pop(OrderStatus.PENDING, [])
+        if pending_ids:
+            logger.info(f"发现 {len(pending_ids)} 个卡密预留过期的待支付订单")
+        for order in await Order.filter(id__in=pending_ids):
+            try:
+                await OrderService.cancel_order(
+                    order=order,
+                    operator="system",
+                    reason="库存预留超时未支付，自动取消",
+                )
+            except Exception as e:
+                logger.error(f"取消预留过期订单失败: order_no={order.order_no}, error={e}")
+
+        held_ids = [oid for status in HELD_STATUSES for oid in expired.pop(status, [])]
+        await InventoryService.hold(held_ids)
+        if await InventoryService.release([oid for ids in expired.values() for oid in ids]):
+            await invalidate_response_cache(CACHE_TAG_PRODUCTS)
+
     async def _cancel_order(self, order_no: str, pending_data: dict) -> None:
         """取消超时订单并释放库存"""
         from app.services.order import OrderService
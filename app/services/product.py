@@ -0,0 +1,187 @@
+"""商品服务 - 主图冗余字段维护、前台商品详情缓存
+
+Product.primary_image_url 在商品图片写入时同步更新，列表页无需查询 product_image 表。
+
+详情响应按 slug 缓存（序列化后的 ProductDetailResponse），由管理端写入显式失效:
+- 商品本身/图片/标签/介绍/支付方式/库存变更: 失效该商品（改 slug 时新旧 slug 都失效）
+- 分类、支付方式本身变更: 详情中内嵌了这些数据，整体失效
+
+库存变化频繁（下单/发货），不依赖失效，而是按 product_detail_stock_max_age
+用一条主键查询覆盖实时库存。
+"""
+
+import time
+from typing import Protocol
+
+from tortoise import connections
+
+from app.config import get_settings
+from app.core.logger import logger
+from app.models.product import Product, ProductImage
+from app.schemas.product import (
+    CategoryResponse,
+    PaymentMethodResponse,
+    ProductDetailResponse,
+    ProductImageResponse,
+    ProductIntroResponse,
+    ProductTagResponse,
+    ProductType,
+)
+from app.utils.cache import cache_delete, get_or_compute, invalidate_namespace, namespace_key
+
+settings = get_settings()
+
+PRODUCT_DETAIL_NAMESPACE = "product:detail"
+
+# 商品列表排序键索引，列方向与前台列表排序 (sort_order, -created_at, -id) 一致，
+# 分页时可沿索引顺序读取而无需额外排序。Meta.indexes 无法声明列方向，启动时建立
+PRODUCT_LIST_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_product_list_order "
+    "ON product (sort_order, created_at DESC, id DESC)"
+)
+
+
+class _ImageLike(Protocol):
+    image_url: str
+    sort_order: int
+    is_primary: bool
+
+
+def get_primary_image_url(images: list[_ImageLike]) -> str | None:
+    """主图: 标记为主图的第一张，没有则取排序最靠前的一张"""
+    ordered = sorted(images, key=lambda img: img.sort_order)
+    primary = next((img for img in ordered if img.is_primary), None)
+    if primary is None and ordered:
+        primary = ordered[0]
+    return primary.image_url if primary else None
+
+
+async def reconcile_primary_images(
+    dry_run: bool = False,
+) -> list[tuple[int, str | None, str | None]]:
+    """
+    按 product_image 表校正 Product.primary_image_url（新增字段后回填 / 修复偏差）
+
+    Args:
+        dry_run: 只检查不修复
+
+    Returns:
+        存在偏差的商品 [(product_id, 当前值, 正确值)]
+    """
+    images: dict[int, list[ProductImage]] = {}
+    for image in await ProductImage.all().order_by("product_id", "sort_order", "id"):
+        images.setdefault(image.product_id, []).append(image)
+
+    drifted = []
+    for product_id, current in await Product.all().values_list("id", "primary_image_url"):
+        expected = get_primary_image_url(images.get(product_id, []))
+        if current != expected:
+            drifted.append((product_id, current, expected))
+
+    if not dry_run:
+        for product_id, _, expected in drifted:
+            await Product.filter(id=product_id).update(primary_image_url=expected)
+    return drifted
+
+
+async def ensure_product_list_index() -> None:
+    """建立商品列表排序键索引（应用启动时调用），失败只影响列表查询性能"""
+    try:
+        await connections.get("default").execute_script(PRODUCT_LIST_INDEX_SQL)
+    except Exception as e:
+        logger.warning(f"商品列表排序索引创建失败: {e}")
+
+
+async def _detail_key(slug: str) -> str:
+    return await namespace_key(PRODUCT_DETAIL_NAMESPACE, slug)
+
+
+def _live_stock(product_type: ProductType, stock: int, available_stock: int) -> int:
+    """虚拟商品使用可用库存计数器"""
+    return available_stock if product_type == ProductType.VIRTUAL else stock
+
+
+async def _build_product_detail(slug: str) -> ProductDetailResponse | None:
+    product = await Product.filter(slug=slug, is_active=True).first()
+    if not product:
+        return None
+
+    await product.fetch_related("category", "images", "tags", "intros", "payment_methods")
+
+    # 只获取启用的介绍内容
+    active_intros = [intro for intro in product.intros if intro.is_active]
+    active_intros.sort(key=lambda x: x.sort_order)
+
+    return ProductDetailResponse(
+        id=product.id,
+        name=product.name,
+        slug=product.slug,
+        product_type=product.product_type,
+        price=product.price,
+        stock=_live_stock(product.product_type, product.stock, product.available_stock),
+        is_active=product.is_active,
+        sort_order=product.sort_order,
+        created_at=product.created_at,
+        updated_at=product.updated_at,
+        category=CategoryResponse.model_validate(product.category) if product.category else None,
+        primary_image=product.primary_image_url,
+        images=[ProductImageResponse.model_validate(img) for img in product.images],
+        tags=[ProductTagResponse.model_validate(tag) for tag in product.tags],
+        intros=[ProductIntroResponse.model_validate(intro) for intro in active_intros],
+        payment_methods=[
+            PaymentMethodResponse.model_validate(pm)
+            for pm in product.payment_methods
+            if pm.is_active
+        ],
+    )
+
+
+async def get_product_detail(slug: str) -> dict | None:
+    """
+    获取前台商品详情（优先读缓存）
+
+    Returns:
+        序列化后的 ProductDetailResponse，商品不存在或已下架时返回 None
+    """
+    async def load() -> dict | None:
+        detail = await _build_product_detail(slug)
+        if detail is None:
+            return None
+        return {"data": detail.model_dump(mode="json"), "cached_at": time.time()}
+
+    # 同一商品的并发未命中只构建一次
+    key = await _detail_key(slug)
+    cached = await get_or_compute(key, load, settings.product_detail_cache_ttl)
+    if cached is None:
+        return None
+
+    data = dict(cached["data"])
+    if time.time() - cached["cached_at"] >= settings.product_detail_stock_max_age:
+        row = (
+            await Product.filter(id=data["id"])
+            .first()
+            .values_list("product_type", "stock", "available_stock")
+        )
+        if row:
+            data["stock"] = _live_stock(ProductType(row[0]), row[1], row[2])
+    return data
+
+
+async def invalidate_product_detail(*slugs: str) -> None:
+    """商品及其图片/标签/介绍/支付方式/库存变更后调用"""
+    for slug in dict.fromkeys(slugs):
+        if slug:
+            await cache_delete(await _detail_key(slug))
+
+
+async def invalidate_product_detail_by_id(product_id: int) -> None:
+    """按商品ID失效详情缓存"""
+    slug = await Product.filter(id=product_id).first().values_list("slug", flat=True)
+    if slug:
+        await invalidate_product_detail(slug)
+
+
+async def invalidate_all_product_details() -> None:
+    """分类/支付方式变更后调用，详情中内嵌的数据需要整体失效"""
+    await invalidate_namespace(PRODUCT_DETAIL_NAMESPACE)
+    logger.info("商品详情缓存已整体失效")
@@ -0,0 +1,270 @@
+"""商品搜索 - 可插拔全文检索后端
+
+- LikeSearchBackend: name ILIKE 全表扫描（兜底，未建索引时使用）
+- SQLiteFTSSearchBackend: SQLite FTS5 trigram 虚拟表，支持中文子串/前缀匹配与 bm25 排序
+- PostgresSearchBackend: pg_trgm + tsvector GIN 索引，按 ts_rank / similarity 排序
+
+后端在应用启动时根据数据库类型和 SEARCH_BACKEND 配置选择，建索引失败自动回退到 LIKE。
+"""
+
+import json
+from abc import ABC, abstractmethod
+
+from tortoise import connections
+from tortoise.queryset import QuerySet
+
+from app.config import get_settings
+from app.core.logger import logger
+from app.models.product import Product
+
+settings = get_settings()
+
+# 全局后端实例
+_backend: "SearchBackend | None" = None
+
+
+def _tokenize(keyword: str) -> list[str]:
+    """按空白切分关键词，去重保序"""
+    return list(dict.fromkeys(t for t in keyword.split() if t))
+
+
+def _escape_like(token: str) -> str:
+    return token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def _scope_ids(query: QuerySet[Product]) -> list[int]:
+    """
+    已筛选商品（上架、分类、标签等条件）的 id
+
+    作为单个参数传入检索 SQL，结果数上限在筛选之后生效，不会被不符合条件的高分商品占满。
+    """
+    return await query.values_list("id", flat=True)
+
+
+class SearchBackend(ABC):
+    """搜索后端基类"""
+
+    # 后端标识
+    name: str = ""
+
+    async def setup(self) -> None:
+        """创建索引等初始化工作，失败时抛出异常由调用方回退"""
+        pass
+
+    @abstractmethod
+    async def apply(
+        self, query: QuerySet[Product], keyword: str
+    ) -> tuple[QuerySet[Product], list[int] | None]:
+        """
+        将搜索条件应用到商品查询
+
+        Returns:
+            (query, ranked_ids)，ranked_ids 为按相关度排序的商品ID，
+            为 None 表示不提供排序，调用方按原有排序分页
+        """
+
+    async def index_product(self, product_id: int, name: str) -> None:
+        """商品创建/更新后同步索引（与商品写入在同一事务中调用）"""
+        pass
+
+    async def remove_product(self, product_id: int) -> None:
+        """商品删除后同步索引（与商品删除在同一事务中调用）"""
+        pass
+
+
+class LikeSearchBackend(SearchBackend):
+    """LIKE 全表扫描"""
+
+    name = "like"
+
+    async def apply(
+        self, query: QuerySet[Product], keyword: str
+    ) -> tuple[QuerySet[Product], list[int] | None]:
+        return query.filter(name__icontains=keyword), None
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 后端
+
+    trigram 分词器按 3 字符切分，可直接匹配中文子串（含前缀），MATCH 结果按 bm25 排序。
+    少于 3 个字符的词无法走 trigram 索引，附加 LIKE 条件过滤。
+    """
+
+    name = "sqlite_fts5"
+    table = "product_fts"
+
+    async def setup(self) -> None:
+        conn = connections.get("default")
+        await conn.execute_script(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+            "USING fts5(name, tokenize='trigram')"
+        )
+        rows = await conn.execute_query_dict(
+            f"SELECT (SELECT COUNT(*) FROM {self.table}) AS indexed, "
+            "(SELECT COUNT(*) FROM product) AS total"
+        )
+        if rows[0]["indexed"] != rows[0]["total"]:
+            await self.rebuild()
+
+    async def rebuild(self) -> None:
+        """全量重建 FTS 索引"""
+        conn = connections.get("default")
+        await conn.execute_script(
+            f"DELETE FROM {self.table}; "
+            f"INSERT INTO {self.table}(rowid, name) SELECT id, name FROM product;"
+        )
+        logger.info("SQLite FTS5 商品索引已重建")
+
+    async def _search(self, query: QuerySet[Product], keyword: str, limit: int) -> list[int]:
+        tokens = _tokenize(keyword)
+        long_tokens = [t for t in tokens if len(t) >= 3]
+        short_tokens = [t for t in tokens if len(t) < 3]
+
+        scope_ids = await _scope_ids(query)
+        if not scope_ids:
+            return []
+
+        params: list = [json.dumps(scope_ids)]
+        scope_sql = "p.id IN (SELECT value FROM json_each(?))"
+        for token in short_tokens:
+            scope_sql += " AND p.name LIKE ? ESCAPE '\\'"
+            params.append(f"%{_escape_like(token)}%")
+
+        if long_tokens:
+            t = self.table
+            match = " ".join('"' + token.replace('"', '""') + '"' for token in long_tokens)
+            sql = (
+                f"SELECT {t}.rowid AS id FROM {t} JOIN product p ON p.id = {t}.rowid "
+                f"WHERE {t} MATCH ? AND {scope_sql} ORDER BY {t}.rank LIMIT ?"
+            )
+            params = [match, *params, limit]
+        else:
+            # 短词无相关度可言，按商品列表默认排序截断
+            sql = (
+                f"SELECT p.id AS id FROM product p WHERE {scope_sql} "
+                "ORDER BY p.sort_order, p.created_at DESC, p.id DESC LIMIT ?"
+            )
+            params.append(limit)
+
+        rows = await connections.get("default").execute_query_dict(sql, params)
+        return [row["id"] for row in rows]
+
+    async def apply(
+        self, query: QuerySet[Product], keyword: str
+    ) -> tuple[QuerySet[Product], list[int] | None]:
+        if not _tokenize(keyword):
+            return query, None
+        ranked_ids = await self._search(query, keyword, settings.search_max_results)
+        return query.filter(id__in=ranked_ids), ranked_ids
+
+    async def index_product(self, product_id: int, name: str) -> None:
+        conn = connections.get("default")
+        await conn.execute_query(f"DELETE FROM {self.table} WHERE rowid = ?", [product_id])
+        await conn.execute_query(
+            f"INSERT INTO {self.table}(rowid, name) VALUES (?, ?)", [product_id, name]
+        )
+
+    async def remove_product(self, product_id: int) -> None:
+        conn = connections.get("default")
+        await conn.execute_query(f"DELETE FROM {self.table} WHERE rowid = ?", [product_id])
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL 后端
+
+    - pg_trgm GIN 索引加速 ILIKE 子串匹配（含中文）
+    - tsvector GIN 索引支持按词前缀匹配（tok:*）
+    索引由数据库随表自动维护，无需应用层同步。
+    """
+
+    name = "postgres"
+
+    async def setup(self) -> None:
+        conn = connections.get("default")
+        await conn.execute_script(
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm; "
+            "CREATE INDEX IF NOT EXISTS idx_product_name_trgm "
+            "ON product USING gin (name gin_trgm_ops); "
+            "CREATE INDEX IF NOT EXISTS idx_product_name_tsv "
+            "ON product USING gin (to_tsvector('simple', name));"
+        )
+
+    async def _search(self, query: QuerySet[Product], keyword: str, limit: int) -> list[int]:
+        tokens = _tokenize(keyword)
+        # tsquery 只保留字母数字，避免特殊符号导致语法错误
+        ts_tokens = ["".join(ch for ch in t if ch.isalnum()) for t in tokens]
+        ts_query = " & ".join(f"{t}:*" for t in ts_tokens if t)
+
+        scope_ids = await _scope_ids(query)
+        if not scope_ids:
+            return []
+
+        params: list = [scope_ids]
+        like_conditions = []
+        for token in tokens:
+            params.append(f"%{_escape_like(token)}%")
+            like_conditions.append(f"name ILIKE ${len(params)}")
+        params.append(keyword)
+        similarity_param = f"${len(params)}"
+
+        where = " AND ".join(like_conditions)
+        rank = "0"
+        if ts_query:
+            params.append(ts_query)
+            tsq = f"to_tsquery('simple', ${len(params)})"
+            where = f"({where}) OR to_tsvector('simple', name) @@ {tsq}"
+            rank = f"ts_rank(to_tsvector('simple', name), {tsq})"
+        params.append(limit)
+
+        sql = (
+            f"SELECT id FROM product WHERE id = ANY($1::int[]) AND ({where}) "
+            f"ORDER BY {rank} DESC, similarity(name, {similarity_param}) DESC, id DESC "
+            f"LIMIT ${len(params)}"
+        )
+        rows = await connections.get("default").execute_query_dict(sql, params)
+        return [row["id"] for row in rows]
+
+    async def apply(
+        self, query: QuerySet[Product], keyword: str
+    ) -> tuple[QuerySet[Product], list[int] | None]:
+        if not _tokenize(keyword):
+            return query, None
+        ranked_ids = await self._search(query, keyword, settings.search_max_results)
+        return query.filter(id__in=ranked_ids), ranked_ids
+
+
+async def setup_search_backend() -> SearchBackend:
+    """根据配置和数据库类型初始化搜索后端（应用启动时调用）"""
+    global _backend
+
+    backend_name = settings.search_backend
+    if backend_name == "auto":
+        dialect = connections.get("default").capabilities.dialect
+        backend_name = {"sqlite": "sqlite_fts5", "postgres": "postgres"}.get(dialect, "like")
+
+    backend_class = {
+        "like": LikeSearchBackend,
+        "sqlite_fts5": SQLiteFTSSearchBackend,
+        "postgres": PostgresSearchBackend,
+    }.get(backend_name, LikeSearchBackend)
+
+    backend = backend_class()
+    try:
+        await backend.setup()
+    except Exception as e:
+        logger.warning(f"搜索后端 {backend.name} 初始化失败，回退到 LIKE 搜索: {e}")
+        backend = LikeSearchBackend()
+
+    _backend = backend
+    logger.info(f"商品搜索后端: {backend.name}")
+    return backend
+
+
+def get_search_backend() -> SearchBackend:
+    """获取当前搜索后端，未初始化时使用 LIKE"""
+    global _backend
+    if _backend is None:
+        _backend = LikeSearchBackend()
+    return _backend
@@ -0,0 +1,218 @@
+"""标签筛选索引 - key -> value -> 上架商品ID集合
+
+前台 /products/tags 直接读取该索引，不再每次扫描 ProductTag 表。
+索引在管理端商品/标签写入时增量维护；批量变更（如禁用分类）时整体失效，
+下次读取时由一次查询重建。
+
+存储:
+- Redis: 每个 (key, value) 一个 Set 保存商品ID，另有一个 Set 记录所有 (key, value)
+- 内存: dict[key, dict[value, set[product_id]]]
+
+两份索引互为降级，各自记录是否过期:
+- Redis 写入成功时内存索引不再同步，标记为过期，回退到内存时从数据库重建
+- Redis 不可用期间的变更只写入内存，Redis 索引标记为过期；恢复后首次读取时直接重建，
+  首次写入时删除就绪标记（各 worker 下次读取时重建）
+"""
+
+import json
+
+from app.core.logger import logger
+from app.models.product import ProductTag
+from app.utils.redis_client import get_redis
+
+FACET_KEY_PREFIX = "product:tags:facet"
+FACET_MEMBERS_KEY = f"{FACET_KEY_PREFIX}:members"
+FACET_READY_KEY = f"{FACET_KEY_PREFIX}:ready"
+
+TagPair = tuple[str, str]
+
+# 内存索引
+_memory_facets: dict[str, dict[str, set[int]]] = {}
+_memory_ready = False
+# Redis 不可用期间有变更未写入 Redis
+_redis_stale = False
+
+
+def _pair_key(pair: TagPair) -> str:
+    return f"{FACET_KEY_PREFIX}:{json.dumps(list(pair), ensure_ascii=False)}"
+
+
+def _normalize(tags: list[TagPair]) -> set[TagPair]:
+    pairs = set()
+    for key, value in tags:
+        key, value = key.strip(), value.strip()
+        if key and value:
+            pairs.add((key, value))
+    return pairs
+
+
+def _format(facets: dict[str, set[str]]) -> list[dict]:
+    return [{"key": k, "values": sorted(v)} for k, v in sorted(facets.items()) if v]
+
+
+async def rebuild_tag_facets() -> None:
+    """从数据库重建索引（单次查询）"""
+    global _memory_ready, _redis_stale
+
+    rows = await ProductTag.filter(product__is_active=True).values_list(
+        "key", "value", "product_id"
+    )
+    index: dict[TagPair, set[int]] = {}
+    for key, value, product_id in rows:
+        for pair in _normalize([(key, value)]):
+            index.setdefault(pair, set()).add(product_id)
+
+    redis = await get_redis()
+    if redis:
+        try:
+            old_members = await redis.smembers(FACET_MEMBERS_KEY)
+            pipe = redis.pipeline(transaction=True)
+            for member in old_members:
+                pipe.delete(_pair_key(tuple(json.loads(member))))
+            pipe.delete(FACET_MEMBERS_KEY)
+            for pair, product_ids in index.items():
+                pipe.sadd(_pair_key(pair), *product_ids)
+                pipe.sadd(FACET_MEMBERS_KEY, json.dumps(list(pair), ensure_ascii=False))
+            pipe.set(FACET_READY_KEY, "1")
+            await pipe.execute()
+            _memory_ready = False
+            _redis_stale = False
+            logger.info(f"标签索引已重建(Redis): {len(index)} 个标签值")
+            return
+        except Exception as e:
+            logger.warning(f"Redis 重建标签索引失败: {e}")
+
+    _memory_facets.clear()
+    for (key, value), product_ids in index.items():
+        _memory_facets.setdefault(key, {})[value] = set(product_ids)
+    _memory_ready = True
+    logger.info(f"标签索引已重建(内存): {len(index)} 个标签值")
+
+
+async def get_tag_facets() -> list[dict]:
+    """获取标签筛选项: [{"key": k, "values": [v, ...]}]，仅包含上架商品的标签"""
+    redis = await get_redis()
+    if redis:
+        try:
+            if _redis_stale or not await redis.exists(FACET_READY_KEY):
+                await rebuild_tag_facets()
+            members = [tuple(json.loads(m)) for m in await redis.smembers(FACET_MEMBERS_KEY)]
+            pipe = redis.pipeline(transaction=False)
+            for pair in members:
+                pipe.scard(_pair_key(pair))
+            counts = await pipe.execute()
+            facets: dict[str, set[str]] = {}
+            for (key, value), count in zip(members, counts, strict=True):
+                if count:
+                    facets.setdefault(key, set()).add(value)
+            return _format(facets)
+        except Exception as e:
+            logger.warning(f"Redis 读取标签索引失败: {e}")
+
+    if not _memory_ready:
+        await rebuild_tag_facets()
+    return _format(
+        {
+            key: {value for value, ids in values.items() if ids}
+            for key, values in _memory_facets.items()
+        }
+    )
+
+
+async def add_product_tags(product_id: int, tags: list[TagPair]) -> None:
+    """将上架商品的标签加入索引"""
+    global _memory_ready, _redis_stale
+
+    pairs = _normalize(tags)
+    if not pairs:
+        return
+
+    redis = await get_redis()
+    if redis:
+        try:
+            pipe = redis.pipeline(transaction=True)
+            for pair in pairs:
+                pipe.sadd(_pair_key(pair), product_id)
+                pipe.sadd(FACET_MEMBERS_KEY, json.dumps(list(pair), ensure_ascii=False))
+            if _redis_stale:
+                pipe.delete(FACET_READY_KEY)
+            await pipe.execute()
+            _memory_ready = False
+            _redis_stale = False
+            return
+        except Exception as e:
+            logger.warning(f"Redis 更新标签索引失败: {e}")
+
+    _redis_stale = True
+
+    for key, value in pairs:
+        _memory_facets.setdefault(key, {}).setdefault(value, set()).add(product_id)
+
+
+async def remove_product_tags(product_id: int, tags: list[TagPair]) -> None:
+    """将商品的标签从索引移除（商品下架/删除/标签变更）"""
+    global _memory_ready, _redis_stale
+
+    pairs = _normalize(tags)
+    if not pairs:
+        return
+
+    redis = await get_redis()
+    if redis:
+        try:
+            pipe = redis.pipeline(transaction=True)
+            for pair in pairs:
+                pipe.srem(_pair_key(pair), product_id)
+            if _redis_stale:
+                pipe.delete(FACET_READY_KEY)
+            await pipe.execute()
+            _memory_ready = False
+            _redis_stale = False
+            return
+        except Exception as e:
+            logger.warning(f"Redis 更新标签索引失败: {e}")
+
+    _redis_stale = True
+
+    for key, value in pairs:
+        product_ids = _memory_facets.get(key, {}).get(value)
+        if product_ids is not None:
+            product_ids.discard(product_id)
+
+
+async def invalidate_tag_facets() -> None:
+    """批量变更后使索引失效，下次读取时重建"""
+    global _memory_ready, _redis_stale
+    _memory_ready = False
+
+    redis = await get_redis()
+    if redis:
+        try:
+            await redis.delete(FACET_READY_KEY)
+            return
+        except Exception as e:
+            logger.warning(f"Redis 标签索引失效失败: {e}")
+    _redis_stale = True
+
+
+async def sync_product_tags(
+    product_id: int,
+    old_tags: list[TagPair],
+    new_tags: list[TagPair],
+    was_active: bool,
+    is_active: bool,
+) -> None:
+    """
+    商品写入后同步索引
+
+    Args:
+        product_id: 商品ID
+        old_tags: 写入前的标签
+        new_tags: 写入后的标签
+        was_active: 写入前是否上架
+        is_active: 写入后是否上架
+    """
+    new_pairs = _normalize(new_tags) if is_active else set()
+    stale_pairs = _normalize(old_tags) - new_pairs if was_active else set()
+    await remove_product_tags(product_id, list(stale_pairs))
+    await add_product_tags(product_id, list(new_pairs))
@@ -1,143 +1,704 @@
-"""缓存工具 - 支持 Redis 和内存缓存"""
+"""缓存工具 - 支持 Redis 和内存缓存
+
+配置 Redis 时为两级缓存:
+- L1: 进程内短 TTL 缓存，热点 key 读取无网络开销
+- L2: Redis，各 worker 共享
+写入/删除时通过 Redis pub/sub 广播失效消息，其他 worker 丢弃各自的 L1 副本；
+订阅断开期间可能漏掉消息，L1 的短 TTL 是陈旧数据的上限。
+
+未配置 Redis 时使用进程内内存缓存（各 worker 独立）。
+"""
 
 import asyncio
+import functools
+import inspect
+import json
+import math
+import random
 import time
-from typing import Any
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from enum import Enum
+from typing import Any, get_type_hints
+
+from pydantic import BaseModel, TypeAdapter
 
 from app.config import get_settings
 from app.core.logger import logger
+from app.utils import codec
+from app.utils.cache_metrics import get_cache_metrics, namespace_of
+from app.utils.redis_client import get_redis
 
 settings = get_settings()
 
-# 内存缓存存储
-_memory_cache: dict[str, tuple[Any, float]] = {}
-_cache_lock = asyncio.Lock()
-
-# Redis 客户端（延迟初始化）
-_redis_client = None
 
+class MemoryCache:
+    """
+    进程内缓存：容量上限 + LRU 淘汰 + TTL
 
-async def get_redis():
-    """获取 Redis 客户端"""
-    global _redis_client
-    if _redis_client is not None:
-        return _redis_client
-
-    if not settings.redis_url:
-        return None
-
-    try:
-        import redis.asyncio as redis
+    所有操作都是不含 await 的同步代码，在事件循环中天然原子，读写无需全局锁；
+    过期条目在读取时惰性删除，并由后台任务定期清理。
+    """
 
-        _redis_client = redis.from_url(settings.redis_url, decode_responses=True)
-        # 测试连接
-        await _redis_client.ping()
-        logger.info("Redis 连接成功")
-        return _redis_client
-    except Exception as e:
-        logger.warning(f"Redis 连接失败，使用内存缓存: {e}")
-        return None
+    def __init__(self, max_entries: int, name: str = "memory"):
+        self.max_entries = max_entries
+        # 指标中的后端名称
+        self.name = name
+        self._data: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expire_at = entry
+        if expire_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            evicted, _ = self._data.popitem(last=False)
+            self.evictions += 1
+            _metrics.eviction(evicted, self.name)
+
+    def delete(self, key: str) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def keys(self) -> list[str]:
+        return list(self._data)
+
+    def sweep(self) -> int:
+        """清理所有已过期条目"""
+        now = time.monotonic()
+        expired = [k for k, (_, expire_at) in self._data.items() if expire_at <= now]
+        for k in expired:
+            del self._data[k]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# 缓存指标
+_metrics = get_cache_metrics()
+
+# 内存缓存存储（未配置 Redis 或 Redis 不可用时使用）
+_memory_cache = MemoryCache(settings.memory_cache_max_entries)
+
+# L1 缓存（配置 Redis 时位于 Redis 之前）
+_l1_cache = MemoryCache(settings.cache_l1_max_entries, name="l1")
+
+# 过期清理任务
+_sweeper_task: asyncio.Task | None = None
+
+# 失效广播
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+# 当前进程标识，忽略自己发出的广播
+_worker_id = uuid.uuid4().hex
+# 消息类型 -> 处理函数
+_invalidation_handlers: dict[str, Callable[[list[str]], Any]] = {}
+_listener_task: asyncio.Task | None = None
+_listener_stop = asyncio.Event()
+
+# 正在计算的 key -> 计算任务（get_or_compute 进程内合并）
+_inflight: dict[str, asyncio.Task] = {}
+# 跨 worker 计算锁
+COMPUTE_LOCK_PREFIX = "lock:compute:"
+COMPUTE_LOCK_TTL = 10  # 秒，持锁 worker 崩溃时锁自动释放
+COMPUTE_WAIT_INTERVAL = 0.05  # 未获得锁时轮询缓存的间隔(秒)
+# 仅当锁仍属于自己时删除
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+_MISSING = object()
+
+
+def get_memory_cache_stats() -> dict[str, int | float]:
+    """内存缓存统计（命中/未命中/淘汰/过期）"""
+    return _memory_cache.stats()
+
+
+def get_l1_cache_stats() -> dict[str, int | float]:
+    """L1 缓存统计"""
+    return _l1_cache.stats()
+
+
+def _entries_by_namespace(cache: MemoryCache) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for key in cache.keys():
+        namespace = namespace_of(key)
+        counts[namespace] = counts.get(namespace, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def get_cache_stats() -> dict[str, Any]:
+    """缓存统计：按命名空间的命中率/延迟/写入体积，以及进程内缓存的容量和条目分布"""
+    return {
+        "metrics": _metrics.snapshot(),
+        "memory": {**_memory_cache.stats(), "entries": _entries_by_namespace(_memory_cache)},
+        "l1": {**_l1_cache.stats(), "entries": _entries_by_namespace(_l1_cache)},
+    }
+
+
+async def _sweep_loop(interval: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        removed = _memory_cache.sweep() + _l1_cache.sweep()
+        if removed:
+            logger.debug(f"内存缓存清理过期条目: {removed}")
+
+
+def start_cache_sweeper() -> None:
+    """启动内存缓存过期清理任务（应用启动时调用）"""
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_sweep_loop(settings.memory_cache_sweep_interval))
+        logger.info("内存缓存清理任务已启动")
+
+
+async def stop_cache_sweeper() -> None:
+    """停止内存缓存过期清理任务"""
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
 
 
 async def cache_get(key: str) -> Any | None:
     """获取缓存值"""
-    redis = await get_redis()
+    redis = await get_redis(binary=True)
 
     if redis:
+        if settings.cache_l1_ttl > 0:
+            start = time.perf_counter()
+            value = _l1_cache.get(key)
+            _metrics.backend_get(key, "l1", value is not None, time.perf_counter() - start)
+            if value is not None:
+                _metrics.lookup(key, True)
+                return value
         try:
-            import json
-
+            start = time.perf_counter()
             value = await redis.get(key)
+            _metrics.backend_get(key, "redis", bool(value), time.perf_counter() - start)
+            _metrics.lookup(key, bool(value))
             if value:
-                return json.loads(value)
+                value = codec.decode(value)
+                if settings.cache_l1_ttl > 0:
+                    _l1_cache.set(key, value, settings.cache_l1_ttl)
+                return value
             return None
         except Exception as e:
+            _metrics.backend_error(key, "redis")
             logger.warning(f"Redis 获取失败: {e}")
 
     # 内存缓存
-    async with _cache_lock:
-        if key in _memory_cache:
-            value, expire_at = _memory_cache[key]
-            if expire_at > time.time():
-                return value
-            # 过期删除
-            del _memory_cache[key]
-        return None
+    start = time.perf_counter()
+    value = _memory_cache.get(key)
+    _metrics.backend_get(key, "memory", value is not None, time.perf_counter() - start)
+    _metrics.lookup(key, value is not None)
+    return value
 
 
 async def cache_set(key: str, value: Any, ttl: int = 3600) -> bool:
-    """设置缓存值"""
-    redis = await get_redis()
+    """设置缓存值（值用 app.utils.codec 编码，支持 Decimal、datetime 等类型）"""
+    redis = await get_redis(binary=True)
 
     if redis:
         try:
-            import json
-
-            await redis.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+            data = codec.encode(value)
+            start = time.perf_counter()
+            await redis.set(key, data, ex=ttl)
+            _metrics.backend_set(key, "redis", time.perf_counter() - start)
+            _metrics.store(key, len(data))
+            if settings.cache_l1_ttl > 0:
+                _l1_cache.set(key, value, min(ttl, settings.cache_l1_ttl))
+            await broadcast_invalidation("keys", [key])
             return True
         except Exception as e:
+            _metrics.backend_error(key, "redis")
             logger.warning(f"Redis 设置失败: {e}")
 
     # 内存缓存
-    async with _cache_lock:
-        expire_at = time.time() + ttl
-        _memory_cache[key] = (value, expire_at)
-        return True
+    start = time.perf_counter()
+    _memory_cache.set(key, value, ttl)
+    _metrics.backend_set(key, "memory", time.perf_counter() - start)
+    _metrics.store(key)
+    return True
 
 
 async def cache_delete(key: str) -> bool:
     """删除缓存"""
     redis = await get_redis()
 
+    _metrics.delete(key)
+    _l1_cache.delete(key)
     if redis:
         try:
             await redis.delete(key)
+            await broadcast_invalidation("keys", [key])
         except Exception as e:
+            _metrics.backend_error(key, "redis")
             logger.warning(f"Redis 删除失败: {e}")
 
     # 同时删除内存缓存
-    async with _cache_lock:
-        if key in _memory_cache:
-            del _memory_cache[key]
+    _memory_cache.delete(key)
     return True
 
 
-async def cache_clear_prefix(prefix: str) -> int:
-    """清除指定前缀的所有缓存"""
-    count = 0
+# ==================== 命名空间 ====================
+# 命名空间内的键带版本号，整体失效只需递增版本（O(1)），旧版本的键不再被读取，随 TTL 过期
+NAMESPACE_VERSION_PREFIX = "ns:version:"
+
+# 进程内命名空间版本（未配置 Redis 或 Redis 不可用时使用）
+_namespace_versions: dict[str, int] = {}
+
+
+async def _namespace_version(namespace: str) -> int:
     redis = await get_redis()
+    if not redis:
+        return _namespace_versions.get(namespace, 0)
+
+    version_key = NAMESPACE_VERSION_PREFIX + namespace
+    if settings.cache_l1_ttl > 0:
+        version = _l1_cache.get(version_key)
+        if version is not None:
+            return version
+    try:
+        # INCRBY 0: 读取版本，不存在时原子地初始化为 0
+        version = await redis.incrby(version_key, 0)
+    except Exception as e:
+        logger.warning(f"Redis 获取命名空间版本失败: {e}")
+        return _namespace_versions.get(namespace, 0)
+    if settings.cache_l1_ttl > 0:
+        _l1_cache.set(version_key, version, settings.cache_l1_ttl)
+    return version
+
 
+async def namespace_key(namespace: str, key: str) -> str:
+    """生成命名空间内的缓存键（带当前版本号）"""
+    version = await _namespace_version(namespace)
+    return f"{namespace}:v{version}:{key}"
+
+
+async def invalidate_namespace(namespace: str) -> None:
+    """使命名空间内的全部缓存失效"""
+    version_key = NAMESPACE_VERSION_PREFIX + namespace
+    _namespace_versions[namespace] = _namespace_versions.get(namespace, 0) + 1
+    _l1_cache.delete(version_key)
+
+    redis = await get_redis()
     if redis:
         try:
-            keys = []
-            async for key in redis.scan_iter(f"{prefix}*"):
-                keys.append(key)
-            if keys:
-                count = await redis.delete(*keys)
+            await redis.incr(version_key)
+            await broadcast_invalidation("keys", [version_key])
         except Exception as e:
-            logger.warning(f"Redis 批量删除失败: {e}")
+            logger.warning(f"Redis 命名空间失效失败: {e}")
 
-    # 内存缓存
-    async with _cache_lock:
-        keys_to_delete = [k for k in _memory_cache.keys() if k.startswith(prefix)]
-        for k in keys_to_delete:
-            del _memory_cache[k]
-            count += 1
 
-    return count
+# ==================== 合并计算 ====================
+async def get_or_compute(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl: int,
+    beta: float = 1.0,
+) -> Any:
+    """
+    读取缓存，未命中时计算并写入；同一 key 的并发未命中只执行一次 loader
+
+    - 进程内: 并发调用等待同一个计算任务
+    - 跨 worker（配置 Redis 时）: 通过 SET NX 锁只让一个 worker 计算，其他 worker 轮询缓存，
+      等待超过 COMPUTE_LOCK_TTL 后自行计算
+    - 提前刷新（XFetch）: 临近过期时按概率提前重算，计算越慢、越接近过期，概率越高，
+      避免热点 key 在同一时刻集中过期；刷新期间其他请求继续使用旧值
+
+    缓存中保存的是 {"value", "delta", "expires_at"} 包装，该 key 只应通过本函数读取。
+    loader 返回 None 时不写缓存。
+
+    Args:
+        key: 缓存键
+        loader: 无参异步函数，返回可 JSON 序列化的值
+        ttl: 缓存时间(秒)，<= 0 时直接调用 loader
+        beta: 提前刷新系数，越大越早刷新，0 关闭提前刷新
+    """
+    if ttl <= 0:
+        return await loader()
+
+    stale = _MISSING
+    envelope = await cache_get(key)
+    if envelope is not None:
+        if not _should_refresh_early(envelope, beta):
+            return envelope["value"]
+        stale = envelope["value"]
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_compute(key, loader, ttl, stale))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: 某个调用方被取消时不影响其他等待同一任务的调用方
+    return await asyncio.shield(task)
+
+
+def _should_refresh_early(envelope: dict, beta: float) -> bool:
+    if beta <= 0:
+        return False
+    # 1 - random() 取值 (0, 1]，避免 log(0)
+    gap = -envelope["delta"] * beta * math.log(1.0 - random.random())
+    return time.time() + gap >= envelope["expires_at"]
+
+
+async def _compute(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl: int,
+    stale: Any,
+) -> Any:
+    token = await _acquire_compute_lock(key)
+    if token is None:
+        # 其他 worker 正在计算：有旧值直接用旧值，否则等待其结果
+        if stale is not _MISSING:
+            return stale
+        value = await _wait_for_value(key)
+        if value is not _MISSING:
+            return value
+
+    try:
+        start = time.monotonic()
+        value = await loader()
+        delta = time.monotonic() - start
+        if value is not None:
+            envelope = {"value": value, "delta": delta, "expires_at": time.time() + ttl}
+            await cache_set(key, envelope, ttl)
+        return value
+    finally:
+        if token:
+            await _release_compute_lock(key, token)
+
+
+async def _acquire_compute_lock(key: str) -> str | None:
+    """
+    获取跨 worker 计算锁
+
+    Returns:
+        锁 token；未配置 Redis 或 Redis 异常时返回空字符串（无需释放）；锁被占用时返回 None
+    """
+    redis = await get_redis()
+    if not redis:
+        return ""
+    token = uuid.uuid4().hex
+    try:
+        acquired = await redis.set(COMPUTE_LOCK_PREFIX + key, token, nx=True, ex=COMPUTE_LOCK_TTL)
+    except Exception as e:
+        logger.warning(f"获取计算锁失败: {e}")
+        return ""
+    return token if acquired else None
+
+
+async def _release_compute_lock(key: str, token: str) -> None:
+    redis = await get_redis()
+    if not redis:
+        return
+    try:
+        await redis.eval(_RELEASE_LOCK_SCRIPT, 1, COMPUTE_LOCK_PREFIX + key, token)
+    except Exception as e:
+        logger.warning(f"释放计算锁失败: {e}")
+
+
+async def _wait_for_value(key: str) -> Any:
+    """等待持锁 worker 写入缓存；锁已释放仍无缓存（结果不可缓存）或超时返回 _MISSING"""
+    redis = await get_redis()
+    deadline = time.monotonic() + COMPUTE_LOCK_TTL
+    while time.monotonic() < deadline:
+        await asyncio.sleep(COMPUTE_WAIT_INTERVAL)
+        envelope = await cache_get(key)
+        if envelope is not None:
+            return envelope["value"]
+        try:
+            if not await redis.exists(COMPUTE_LOCK_PREFIX + key):
+                break
+        except Exception:
+            break
+    return _MISSING
+
+
+# ==================== 缓存装饰器 ====================
+CACHED_NAMESPACE_PREFIX = "cached:"
+
+# 缓存标签（@cached 与前台响应缓存共用，按标签统一失效）
+CACHE_TAG_PRODUCTS = "products"
+CACHE_TAG_PLATFORM = "platform"
 
+# 标签 -> 命名空间
+_tag_namespaces: dict[str, set[str]] = {}
 
-# ==================== 标签缓存 ====================
-TAG_CACHE_KEY = "product:tags:suggestions"
-TAG_CACHE_TTL = 3600  # 1小时
+
+def _key_part(value: Any) -> str:
+    """参数值转为缓存键片段，带类型名区分 1 和 "1" """
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, BaseModel):
+        return value.model_dump_json()
+    return f"{type(value).__name__}:{value}"
+
+
+def cached(
+    namespace: str,
+    key: str | None = None,
+    ttl: int = 300,
+    tags: tuple[str, ...] = (),
+):
+    """
+    缓存异步函数的返回值
+
+    - 缓存键: 命名空间 cached:{namespace} 内的 {key}。key 为格式化模板（如 "{slug}"），
+      按参数名填充；不传时由全部参数（名称、类型、值）生成
+    - 序列化: 按返回值注解用 pydantic TypeAdapter 转换，支持 pydantic 模型、Decimal、datetime、
+      枚举等，读取时还原为注解类型；None 结果也会缓存
+    - 并发未命中合并计算（见 get_or_compute）
+    - 失效: 被装饰函数的 invalidate(*args, **kwargs) 失效单个键，
+      invalidate_cached(namespace) 失效整个命名空间，invalidate_cached_tags(*tags) 按标签失效
+
+    用法:
+        @cached("announcement", key="{announcement_id}", tags=("platform",))
+        async def get_announcement(announcement_id: int) -> AnnouncementResponse: ...
+
+    Args:
+        namespace: 命名空间
+        key: 缓存键模板
+        ttl: 缓存时间(秒)
+        tags: 标签，写入方按标签批量失效
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        signature = inspect.signature(func)
+        try:
+            return_type = get_type_hints(func).get("return", Any)
+        except Exception:
+            return_type = Any
+        adapter = TypeAdapter(return_type)
+        for tag in tags:
+            _tag_namespaces.setdefault(tag, set()).add(namespace)
+
+        async def build_key(*args: Any, **kwargs: Any) -> str:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {
+                name: value
+                for name, value in bound.arguments.items()
+                if name not in ("self", "cls")
+            }
+            if key is not None:
+                suffix = key.format(
+                    **{
+                        name: value.value if isinstance(value, Enum) else value
+                        for name, value in arguments.items()
+                    }
+                )
+            else:
+                suffix = ",".join(f"{name}={_key_part(value)}" for name, value in arguments.items())
+            return await namespace_key(CACHED_NAMESPACE_PREFIX + namespace, suffix or "_")
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            async def load() -> dict:
+                result = await func(*args, **kwargs)
+                return {"v": adapter.dump_python(result, mode="json")}
+
+            cached_value = await get_or_compute(await build_key(*args, **kwargs), load, ttl)
+            return adapter.validate_python(cached_value["v"])
+
+        async def invalidate(*args: Any, **kwargs: Any) -> None:
+            await cache_delete(await build_key(*args, **kwargs))
+
+        wrapper.invalidate = invalidate
+        wrapper.cache_key = build_key
+        return wrapper
+
+    return decorator
+
+
+async def invalidate_cached(*namespaces: str) -> None:
+    """失效命名空间下的全部 @cached 缓存"""
+    for namespace in namespaces:
+        await invalidate_namespace(CACHED_NAMESPACE_PREFIX + namespace)
+
+
+async def invalidate_cached_tags(*tags: str) -> None:
+    """按标签失效 @cached 缓存"""
+    namespaces = set()
+    for tag in tags:
+        namespaces |= _tag_namespaces.get(tag, set())
+    await invalidate_cached(*namespaces)
+
+
+# ==================== 跨进程失效广播 ====================
+def register_invalidation_handler(kind: str, handler: Callable[[list[str]], Any]) -> None:
+    """
+    注册失效消息处理函数
+
+    Args:
+        kind: 消息类型
+        handler: 收到其他 worker 的该类消息时调用，参数为消息内容列表
+    """
+    _invalidation_handlers[kind] = handler
+
+
+async def broadcast_invalidation(kind: str, items: list[str]) -> None:
+    """
+    向其他 worker 广播失效消息（当前进程需自行先完成本地失效）
+
+    未配置 Redis 时无其他 worker 可通知，直接返回
+    """
+    redis = await get_redis()
+    if not redis:
+        return
+    message = json.dumps({"origin": _worker_id, "kind": kind, "items": items}, ensure_ascii=False)
+    try:
+        await redis.publish(CACHE_INVALIDATION_CHANNEL, message)
+    except Exception as e:
+        logger.warning(f"缓存失效广播失败: {e}")
+
+
+def _handle_invalidation(data: str) -> None:
+    try:
+        message = json.loads(data)
+    except (TypeError, ValueError):
+        return
+    if message.get("origin") == _worker_id:
+        return
+    handler = _invalidation_handlers.get(message.get("kind"))
+    if handler:
+        handler(message.get("items", []))
+
+
+async def _listen_invalidation() -> None:
+    # 用带超时的 get_message 轮询而不是 listen()：redis-py 阻塞读取时可能吞掉取消，
+    # 以停止标志退出更可靠
+    while not _listener_stop.is_set():
+        redis = await get_redis()
+        if not redis:
+            # Redis 熔断中，恢复后重新订阅
+            await asyncio.sleep(1)
+            continue
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            # (重新)订阅前的消息可能已丢失，清空 L1
+            _l1_cache.clear()
+            while not _listener_stop.is_set():
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message["type"] == "message":
+                    _handle_invalidation(message["data"])
+        except Exception as e:
+            logger.warning(f"缓存失效订阅断开，稍后重连: {e}")
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+async def start_cache_invalidation_listener() -> None:
+    """订阅缓存失效广播（应用启动时调用，未配置 Redis 时不启动）"""
+    global _listener_task
+    if not settings.redis_url:
+        return
+    if _listener_task is None or _listener_task.done():
+        _listener_stop.clear()
+        _listener_task = asyncio.create_task(_listen_invalidation())
+        logger.info("缓存失效广播订阅已启动")
+
+
+async def stop_cache_invalidation_listener() -> None:
+    """停止订阅缓存失效广播"""
+    global _listener_task
+    if _listener_task is not None:
+        _listener_stop.set()
+        try:
+            await asyncio.wait_for(_listener_task, timeout=5)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        _listener_task = None
+
+
+def _drop_l1_keys(keys: list[str]) -> None:
+    for key in keys:
+        _l1_cache.delete(key)
+
+
+register_invalidation_handler("keys", _drop_l1_keys)
+
+
+# ==================== 标签建议 ====================
+# Redis 中每个标签键一个有序集合（值 -> 最近使用时间），另有一个有序集合记录所有标签键
+TAG_SUGGESTION_PREFIX = "product:tags:suggestions"
+TAG_SUGGESTION_KEYS = f"{TAG_SUGGESTION_PREFIX}:keys"
+TAG_SUGGESTION_TTL = 3600  # 1小时
+TAG_SUGGESTION_LIMIT = 50  # 每个标签键最多保留的值（最近使用的）
+
+# 内存存储（未配置 Redis 或 Redis 不可用时使用）: 标签键 -> 值（按最近使用排序）
+_memory_tag_suggestions: dict[str, dict[str, None]] = {}
+
+
+def _tag_values_key(key: str) -> str:
+    return f"{TAG_SUGGESTION_PREFIX}:values:{key}"
 
 
 async def get_tag_suggestions() -> dict[str, list[str]]:
-    """获取标签建议（key -> [values]）"""
-    cached = await cache_get(TAG_CACHE_KEY)
-    if cached:
-        return cached
-    return {}
+    """获取标签建议（key -> [values]，值按最近使用时间升序）"""
+    redis = await get_redis()
+    if redis:
+        try:
+            keys = await redis.zrange(TAG_SUGGESTION_KEYS, 0, -1)
+            if not keys:
+                return {}
+            async with redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.zrange(_tag_values_key(key), 0, -1)
+                results = await pipe.execute()
+            # 值集合已过期的键不返回
+            return {key: values for key, values in zip(keys, results) if values}
+        except Exception as e:
+            logger.warning(f"Redis 获取标签建议失败: {e}")
+
+    return {key: list(values) for key, values in _memory_tag_suggestions.items()}
 
 
 async def update_tag_suggestions(tags: list[dict[str, str]]) -> None:
@@ -145,24 +706,41 @@ async def update_tag_suggestions(tags: list[dict[str, str]]) -> None:
     更新标签建议
     tags: [{"key": "国家", "value": "中国"}, ...]
     """
-    current = await get_tag_suggestions()
-
+    pairs = []
     for tag in tags:
         key = tag.get("key", "").strip()
         value = tag.get("value", "").strip()
-        if not key or not value:
-            continue
-
-        if key not in current:
-            current[key] = []
+        if key and value:
+            pairs.append((key, value))
+    if not pairs:
+        return
 
-        if value not in current[key]:
-            current[key].append(value)
-            # 限制每个 key 最多保存 50 个 value
-            if len(current[key]) > 50:
-                current[key] = current[key][-50:]
+    redis = await get_redis()
+    if redis:
+        try:
+            now = time.time()
+            # 单个事务内完成写入和裁剪，并发更新不会互相覆盖
+            async with redis.pipeline(transaction=True) as pipe:
+                for i, (key, value) in enumerate(pairs):
+                    values_key = _tag_values_key(key)
+                    # 同一批次内按顺序递增，保持写入顺序
+                    score = now + i * 1e-6
+                    pipe.zadd(TAG_SUGGESTION_KEYS, {key: score})
+                    pipe.zadd(values_key, {value: score})
+                    pipe.zremrangebyrank(values_key, 0, -(TAG_SUGGESTION_LIMIT + 1))
+                    pipe.expire(values_key, TAG_SUGGESTION_TTL)
+                pipe.expire(TAG_SUGGESTION_KEYS, TAG_SUGGESTION_TTL)
+                await pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"Redis 更新标签建议失败: {e}")
 
-    await cache_set(TAG_CACHE_KEY, current, TAG_CACHE_TTL)
+    for key, value in pairs:
+        values = _memory_tag_suggestions.setdefault(key, {})
+        values.pop(value, None)
+        values[value] = None
+        while len(values) > TAG_SUGGESTION_LIMIT:
+            del values[next(iter(values))]
 
 
 async def add_tag_suggestion(key: str, value: str) -> None:
@@ -178,5 +756,10 @@ async def get_tag_keys() -> list[str]:
 
 async def get_tag_values(key: str) -> list[str]:
     """获取指定键的所有值"""
-    suggestions = await get_tag_suggestions()
-    return suggestions.get(key, [])
+    redis = await get_redis()
+    if redis:
+        try:
+            return await redis.zrange(_tag_values_key(key), 0, -1)
+        except Exception as e:
+            logger.warning(f"Redis 获取标签建议失败: {e}")
+    return list(_memory_tag_suggestions.get(key, {}))
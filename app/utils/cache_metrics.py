@@ -0,0 +1,186 @@
+"""缓存指标 - 按命名空间统计命中率、延迟和写入体积
+
+命名空间由缓存键推导（见 namespace_of），各后端:
+- l1: 配置 Redis 时的进程内 L1 缓存
+- redis: Redis
+- memory: 未配置 Redis 或 Redis 不可用时的内存缓存
+
+指标只在当前进程内累计，多 worker 部署时每个 worker 各自统计。
+"""
+
+import re
+import time
+from collections import Counter
+
+# 延迟直方图分桶上界（毫秒）
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+# 带版本号的命名空间键: {namespace}:v{n}:{key}
+_VERSION_SEGMENT = re.compile(r"^v\d+$")
+
+
+def namespace_of(key: str) -> str:
+    """
+    由缓存键推导命名空间
+
+    - 带版本号的键取版本号之前的部分，如 product:detail:v3:slug -> product:detail
+    - 其他键去掉最后一段，如 category:tree:version -> category:tree
+    """
+    parts = key.split(":")
+    for i, part in enumerate(parts):
+        if i > 0 and _VERSION_SEGMENT.match(part):
+            return ":".join(parts[:i])
+    return ":".join(parts[:-1]) if len(parts) > 1 else key
+
+
+class LatencyHistogram:
+    """延迟直方图"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.count += 1
+        self.total_ms += ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, q: float) -> float | None:
+        """按分桶估算分位数（返回所在分桶的上界，超出最大分桶时返回最大上界）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.buckets[:-1]):
+            cumulative += n
+            if cumulative >= target:
+                return LATENCY_BUCKETS_MS[i]
+        return LATENCY_BUCKETS_MS[-1]
+
+    def snapshot(self) -> dict:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 4) if self.count else None,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class NamespaceStats:
+    """单个命名空间的统计"""
+
+    def __init__(self):
+        # 请求级结果（任一后端命中即为命中）
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.deletes = 0
+        self.bytes_written = 0
+        # 后端级计数: (后端, 事件) -> 次数，事件为 hit/miss/error/eviction
+        self.events: Counter[tuple[str, str]] = Counter()
+        # (后端, 操作) -> 延迟
+        self.latency: dict[tuple[str, str], LatencyHistogram] = {}
+
+    def observe(self, backend: str, op: str, seconds: float) -> None:
+        histogram = self.latency.get((backend, op))
+        if histogram is None:
+            histogram = self.latency[(backend, op)] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        backends: dict[str, dict] = {}
+        for (backend, event), n in self.events.items():
+            backends.setdefault(backend, {})[event] = n
+        for (backend, op), histogram in self.latency.items():
+            backends.setdefault(backend, {}).setdefault("latency", {})[op] = histogram.snapshot()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "sets": self.sets,
+            "deletes": self.deletes,
+            "errors": sum(n for (_, event), n in self.events.items() if event == "error"),
+            "evictions": sum(n for (_, event), n in self.events.items() if event == "eviction"),
+            "avg_set_bytes": round(self.bytes_written / self.sets) if self.sets else None,
+            "backends": backends,
+        }
+
+
+class CacheMetrics:
+    """缓存指标"""
+
+    def __init__(self):
+        self.namespaces: dict[str, NamespaceStats] = {}
+        self.started_at = time.time()
+
+    def _stats(self, key: str) -> NamespaceStats:
+        namespace = namespace_of(key)
+        stats = self.namespaces.get(namespace)
+        if stats is None:
+            stats = self.namespaces[namespace] = NamespaceStats()
+        return stats
+
+    def backend_get(self, key: str, backend: str, hit: bool, seconds: float) -> None:
+        """记录某个后端的一次读取"""
+        stats = self._stats(key)
+        stats.events[(backend, "hit" if hit else "miss")] += 1
+        stats.observe(backend, "get", seconds)
+
+    def backend_set(self, key: str, backend: str, seconds: float) -> None:
+        """记录某个后端的一次写入"""
+        self._stats(key).observe(backend, "set", seconds)
+
+    def backend_error(self, key: str, backend: str) -> None:
+        self._stats(key).events[(backend, "error")] += 1
+
+    def eviction(self, key: str, backend: str) -> None:
+        self._stats(key).events[(backend, "eviction")] += 1
+
+    def lookup(self, key: str, hit: bool) -> None:
+        """记录一次 cache_get 的最终结果"""
+        stats = self._stats(key)
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+
+    def store(self, key: str, size: int | None = None) -> None:
+        """记录一次 cache_set"""
+        stats = self._stats(key)
+        stats.sets += 1
+        if size is not None:
+            stats.bytes_written += size
+
+    def delete(self, key: str) -> None:
+        self._stats(key).deletes += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "since": self.started_at,
+            "namespaces": {
+                namespace: stats.snapshot() for namespace, stats in sorted(self.namespaces.items())
+            },
+        }
+
+    def reset(self) -> None:
+        self.namespaces.clear()
+        self.started_at = time.time()
+
+
+# 全局指标实例
+_metrics = CacheMetrics()
+
+
+def get_cache_metrics() -> CacheMetrics:
+    """获取缓存指标实例"""
+    return _metrics
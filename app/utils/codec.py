@@ -0,0 +1,261 @@
+"""序列化编解码 - 缓存值和 Redis 队列数据
+
+支持的编码（CACHE_CODEC 配置）:
+- json: 标准库 json
+- orjson: 与 json 相同的文本格式，编解码更快（需安装 orjson）
+- msgpack: 二进制格式，体积更小（需安装 msgpack）
+- auto: 按 orjson > msgpack > json 选择已安装的（orjson 编解码最快且保持文本可读）
+
+Decimal、datetime、date、Enum 编码后可原样还原:
+- json/orjson 编码为带类型标记的对象，如 {"__type__": "decimal", "value": "9.90"}
+- msgpack 使用扩展类型
+继承 str/int 的枚举（如 OrderStatus）按基础类型直接编码，解码为其值（与枚举成员相等）。
+
+解码根据数据本身识别编码（msgpack 数据带 MSGPACK_MARKER 前缀，JSON 文本不会以该字节开头），
+切换编码或滚动发布期间新旧数据可以共存。
+"""
+
+import importlib
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+from app.config import get_settings
+from app.core.logger import logger
+
+settings = get_settings()
+
+TYPE_FIELD = "__type__"
+_TYPE_FIELD_BYTES = f'"{TYPE_FIELD}"'.encode()
+
+# msgpack 数据前缀（0xC1 在 msgpack 中未使用，也不是合法的 UTF-8 首字节）
+MSGPACK_MARKER = b"\xc1"
+
+# msgpack 扩展类型编号
+_EXT_DECIMAL = 1
+_EXT_DATETIME = 2
+_EXT_DATE = 3
+_EXT_ENUM = 4
+
+# 只还原本项目内的枚举，避免按缓存数据导入任意模块
+_ENUM_MODULE_PREFIX = "app."
+_enum_classes: dict[str, type[Enum]] = {}
+
+
+def _enum_path(value: Enum) -> str:
+    cls = type(value)
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _load_enum(path: str, value: Any) -> Enum | Any:
+    cls = _enum_classes.get(path)
+    if cls is None:
+        module_name, _, qualname = path.partition(":")
+        if not module_name.startswith(_ENUM_MODULE_PREFIX):
+            return value
+        try:
+            obj: Any = importlib.import_module(module_name)
+            for attr in qualname.split("."):
+                obj = getattr(obj, attr)
+        except (ImportError, AttributeError):
+            return value
+        if not (isinstance(obj, type) and issubclass(obj, Enum)):
+            return value
+        cls = _enum_classes[path] = obj
+    return cls(value)
+
+
+# ==================== JSON 类型标记 ====================
+def _json_default(value: Any) -> dict:
+    if isinstance(value, Decimal):
+        return {TYPE_FIELD: "decimal", "value": str(value)}
+    if isinstance(value, datetime):
+        return {TYPE_FIELD: "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {TYPE_FIELD: "date", "value": value.isoformat()}
+    if isinstance(value, Enum):
+        return {TYPE_FIELD: "enum", "cls": _enum_path(value), "value": value.value}
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def _json_object_hook(obj: dict) -> Any:
+    kind = obj.get(TYPE_FIELD)
+    if kind is None:
+        return obj
+    if kind == "decimal":
+        return Decimal(obj["value"])
+    if kind == "datetime":
+        return datetime.fromisoformat(obj["value"])
+    if kind == "date":
+        return date.fromisoformat(obj["value"])
+    if kind == "enum":
+        return _load_enum(obj["cls"], obj["value"])
+    return obj
+
+
+def _restore(value: Any) -> Any:
+    """orjson 没有 object_hook，解码后递归还原类型标记"""
+    if isinstance(value, dict):
+        return _json_object_hook({k: _restore(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_restore(v) for v in value]
+    return value
+
+
+# ==================== 编解码器 ====================
+class Codec(ABC):
+    """编解码器"""
+
+    name: str
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        pass
+
+
+class JsonCodec(Codec):
+    """标准库 json"""
+
+    name = "json"
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(
+            value, ensure_ascii=False, separators=(",", ":"), default=_json_default
+        ).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data, object_hook=_json_object_hook)
+
+
+class OrjsonCodec(Codec):
+    """orjson，输出格式与 JsonCodec 相同"""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        # datetime 交给 default 加类型标记，而不是直接输出为字符串
+        self._option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def encode(self, value: Any) -> bytes:
+        return self._orjson.dumps(value, default=_json_default, option=self._option)
+
+    def decode(self, data: bytes) -> Any:
+        value = self._orjson.loads(data)
+        # 没有类型标记时跳过递归还原
+        return _restore(value) if _TYPE_FIELD_BYTES in data else value
+
+
+class MsgpackCodec(Codec):
+    """msgpack 二进制编码"""
+
+    name = "msgpack"
+
+    def __init__(self):
+        import msgpack
+
+        self._msgpack = msgpack
+
+    def _default(self, value: Any) -> Any:
+        ext = self._msgpack.ExtType
+        if isinstance(value, Decimal):
+            return ext(_EXT_DECIMAL, str(value).encode())
+        if isinstance(value, datetime):
+            return ext(_EXT_DATETIME, value.isoformat().encode())
+        if isinstance(value, date):
+            return ext(_EXT_DATE, value.isoformat().encode())
+        if isinstance(value, Enum):
+            return ext(_EXT_ENUM, self._pack([_enum_path(value), value.value]))
+        raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == _EXT_DECIMAL:
+            return Decimal(data.decode())
+        if code == _EXT_DATETIME:
+            return datetime.fromisoformat(data.decode())
+        if code == _EXT_DATE:
+            return date.fromisoformat(data.decode())
+        if code == _EXT_ENUM:
+            path, value = self._unpack(data)
+            return _load_enum(path, value)
+        return self._msgpack.ExtType(code, data)
+
+    def _pack(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, default=self._default, use_bin_type=True)
+
+    def _unpack(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+    def encode(self, value: Any) -> bytes:
+        return MSGPACK_MARKER + self._pack(value)
+
+    def decode(self, data: bytes) -> Any:
+        return self._unpack(data[len(MSGPACK_MARKER) :])
+
+
+_CODECS: dict[str, type[Codec]] = {
+    "json": JsonCodec,
+    "orjson": OrjsonCodec,
+    "msgpack": MsgpackCodec,
+}
+
+
+def create_codec(name: str) -> Codec:
+    """按名称创建编解码器，依赖未安装时回退到 json"""
+    candidates = ["orjson", "msgpack", "json"] if name == "auto" else [name, "json"]
+    for candidate in candidates:
+        codec_class = _CODECS.get(candidate)
+        if codec_class is None:
+            logger.warning(f"未知的编码: {candidate}")
+            continue
+        try:
+            return codec_class()
+        except ImportError:
+            if name != "auto":
+                logger.warning(f"编码 {candidate} 依赖未安装，回退到 json")
+    return JsonCodec()
+
+
+def _text_decoder() -> Codec:
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JsonCodec()
+
+
+# 全局编解码器实例
+_codec = create_codec(settings.cache_codec)
+# 解码器: JSON 文本优先用 orjson；msgpack 仅在遇到 msgpack 数据时创建
+_json_decoder = _codec if _codec.name != "msgpack" else _text_decoder()
+_msgpack_decoder: Codec | None = _codec if _codec.name == "msgpack" else None
+
+
+def get_codec() -> Codec:
+    """获取当前编解码器"""
+    return _codec
+
+
+def encode(value: Any) -> bytes:
+    """编码"""
+    return _codec.encode(value)
+
+
+def decode(data: bytes | str) -> Any:
+    """解码（根据数据识别编码）"""
+    global _msgpack_decoder
+    if isinstance(data, str):
+        data = data.encode()
+    if data.startswith(MSGPACK_MARKER):
+        if _msgpack_decoder is None:
+            _msgpack_decoder = MsgpackCodec()
+        return _msgpack_decoder.decode(data)
+    return _json_decoder.decode(data)
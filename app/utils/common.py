@@ -1,10 +1,17 @@
 """工具函数"""
 
-from typing import TypeVar
+import base64
+import json
+from datetime import datetime
+from typing import Any, TypeVar
 
+from tortoise.expressions import Q
+from tortoise.fields import DatetimeField
 from tortoise.models import Model
 from tortoise.queryset import QuerySet
 
+from app.core.exceptions import BadRequestException
+
 T = TypeVar("T", bound=Model)
 
 
@@ -29,3 +36,106 @@ async def paginate(
     offset = (page - 1) * page_size
     items = await queryset.offset(offset).limit(page_size)
     return items, total, pages
+
+
+async def paginate_ids(
+    queryset: QuerySet[T],
+    ordered_ids: list[int],
+    page: int = 1,
+    page_size: int = 20,
+) -> tuple[list[T], int, int]:
+    """
+    按给定ID顺序分页（如搜索相关度排序）
+
+    Args:
+        queryset: 已限定在 ordered_ids 范围内的查询集
+        ordered_ids: 排好序的ID列表
+        page: 页码
+        page_size: 每页数量
+
+    Returns:
+        (items, total, pages)
+    """
+    matched = set(await queryset.values_list("id", flat=True))
+    ids = [i for i in ordered_ids if i in matched]
+    total = len(ids)
+    pages = (total + page_size - 1) // page_size
+    offset = (page - 1) * page_size
+    page_ids = ids[offset : offset + page_size]
+    objects = {obj.pk: obj for obj in await queryset.filter(id__in=page_ids)}
+    items = [objects[i] for i in page_ids if i in objects]
+    return items, total, pages
+
+
+def _encode_cursor(values: list[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, model: type[Model], fields: list[str]) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v)
+            if isinstance(model._meta.fields_map[f], DatetimeField)
+            else v
+            for f, v in zip(fields, values, strict=True)
+        ]
+    except (ValueError, TypeError):
+        raise BadRequestException(message="无效的分页游标") from None
+
+
+async def paginate_cursor(
+    queryset: QuerySet[T],
+    order_by: list[str],
+    cursor: str | None = None,
+    page_size: int = 20,
+) -> tuple[list[T], str | None]:
+    """
+    游标（keyset）分页
+
+    不做 COUNT，也不使用 OFFSET：游标中编码上一页最后一条记录的排序键，
+    下一页通过 WHERE (排序键) 在其之后 + LIMIT 读取。
+
+    "在其之后"按列展开为 OR 条件以支持混合方向排序，数据库一般无法把它整体当作
+    索引范围；因此另对首列加上范围条件，借助与 order_by 列方向一致（或完全相反）的
+    索引定位到游标所在的首列值，再顺序扫描并过滤该值下游标之前的行。
+    首列取值分散时（如 created_at）接近一次索引查找，首列大量重复时（如 sort_order
+    多为 0）需要过滤的行随翻页深度增加，但仍不做 OFFSET 计数和整体排序。
+
+    Args:
+        queryset: 查询集（无需排序）
+        order_by: 排序字段，"-" 前缀表示倒序，最后一个字段必须唯一（如 "-id"）
+        cursor: 上一页返回的 next_cursor，None 或空字符串表示第一页
+        page_size: 每页数量
+
+    Returns:
+        (items, next_cursor)，没有下一页时 next_cursor 为 None
+    """
+    fields = [f.lstrip("-") for f in order_by]
+    queryset = queryset.order_by(*order_by)
+
+    if cursor:
+        values = _decode_cursor(cursor, queryset.model, fields)
+        # (a, b, c) 在游标之后 = a 之后 | (a 相等 & b 之后) | (a、b 相等 & c 之后)
+        conditions = []
+        ops = ["lt" if f.startswith("-") else "gt" for f in order_by]
+        for i, field in enumerate(fields):
+            equals = {fields[j]: values[j] for j in range(i)}
+            conditions.append(Q(**equals, **{f"{field}__{ops[i]}": values[i]}))
+        # 首列范围条件（冗余），供数据库按索引定位起点
+        queryset = queryset.filter(
+            Q(*conditions, join_type=Q.OR), **{f"{fields[0]}__{ops[0]}e": values[0]}
+        )
+
+    items = await queryset.limit(page_size + 1)
+    if len(items) <= page_size:
+        return items, None
+
+    items = items[:page_size]
+    last = items[-1]
+    return items, _encode_cursor([getattr(last, f) for f in fields])
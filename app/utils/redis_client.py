@@ -1,54 +1,183 @@
-"""Redis 客户端工具 - 支付系统专用"""
+"""Redis 客户端工具 - 连接管理、分布式锁、支付系统数据
+
+全局共享 Redis 客户端（连接池大小、超时由 Settings 配置）:
+- 文本客户端: 响应解码为 str，一般命令使用
+- 二进制客户端: 响应为 bytes，用于 app.utils.codec 编码的值（msgpack 等）
+
+两个客户端共用熔断:
+连续出现连接/超时错误达到阈值后熔断，get_redis() 直接返回 None，调用方走各自的降级逻辑
+（内存缓存等），不再为每个请求付出连接超时的延迟；熔断期间后台定时 PING，恢复后自动闭合。
+"""
 
 import asyncio
 import json
 import time
 
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import MaxConnectionsError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
 from app.config import get_settings
 from app.core.logger import logger
+from app.utils import codec
 
 settings = get_settings()
 
-# Redis 客户端（延迟初始化）
-_redis_client = None
-_redis_lock = asyncio.Lock()
-
 
-async def get_redis():
-    """获取 Redis 客户端"""
-    global _redis_client
-    if _redis_client is not None:
-        return _redis_client
+class _ManagedRedis(Redis):
+    """执行命令时向连接管理器报告连接状态"""
 
-    async with _redis_lock:
-        if _redis_client is not None:
-            return _redis_client
+    manager: "RedisManager"
 
-        if not settings.redis_url:
-            logger.warning("REDIS_URL 未配置")
+    async def execute_command(self, *args, **options):
+        try:
+            result = await super().execute_command(*args, **options)
+        except MaxConnectionsError:
+            # 连接池耗尽是本进程负载问题，不代表 Redis 不可用
+            raise
+        except (RedisConnectionError, RedisTimeoutError, OSError):
+            self.manager.record_failure()
+            raise
+        self.manager.record_success()
+        return result
+
+
+class RedisManager:
+    """Redis 连接管理（连接池 + 熔断）"""
+
+    def __init__(self):
+        self.client: _ManagedRedis | None = None
+        self.binary_client: _ManagedRedis | None = None
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe_task: asyncio.Task | None = None
+
+    @property
+    def is_open(self) -> bool:
+        """是否处于熔断状态"""
+        return self.opened_at is not None
+
+    def _create_client(self, decode_responses: bool) -> _ManagedRedis:
+        pool = ConnectionPool.from_url(
+            settings.redis_url,
+            decode_responses=decode_responses,
+            max_connections=settings.redis_max_connections,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_connect_timeout,
+        )
+        client = _ManagedRedis(connection_pool=pool)
+        client.manager = self
+        return client
+
+    def get(self, binary: bool = False) -> Redis | None:
+        """获取客户端；未配置或熔断中返回 None"""
+        if not settings.redis_url or self.is_open:
             return None
-
+        if binary:
+            if self.binary_client is None:
+                self.binary_client = self._create_client(decode_responses=False)
+            return self.binary_client
+        if self.client is None:
+            self.client = self._create_client(decode_responses=True)
+        return self.client
+
+    async def connect(self) -> bool:
+        """建立连接并检查可用性（应用启动时调用），不可用时直接进入熔断"""
+        client = self.get()
+        if client is None:
+            return False
         try:
-            import redis.asyncio as redis
-
-            _redis_client = redis.from_url(settings.redis_url, decode_responses=True)
-            await _redis_client.ping()
+            await client.ping()
             logger.info("Redis 连接成功")
-            return _redis_client
+            return True
         except Exception as e:
-            logger.warning(f"Redis 连接失败: {e}")
-            return None
+            logger.warning(f"Redis 连接失败，暂时使用降级逻辑: {e}")
+            self._trip()
+            return False
 
+    def record_failure(self) -> None:
+        self.failures += 1
+        if not self.is_open and self.failures >= settings.redis_breaker_threshold:
+            self._trip()
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.is_open:
+            self.opened_at = None
+            logger.info("Redis 已恢复，熔断关闭")
+
+    def _trip(self) -> None:
+        if not self.is_open:
+            self.opened_at = time.time()
+            logger.warning(f"Redis 不可用，熔断 (连续失败 {self.failures} 次)")
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe())
+
+    async def _probe(self) -> None:
+        """熔断期间定时探测，成功后由 record_success 闭合熔断"""
+        while self.is_open and self.client is not None:
+            await asyncio.sleep(settings.redis_probe_interval)
+            try:
+                await self.client.ping()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "configured": bool(settings.redis_url),
+            "circuit_open": self.is_open,
+            "opened_at": self.opened_at,
+            "consecutive_failures": self.failures,
+        }
 
-async def close_redis():
-    """关闭 Redis 连接"""
-    global _redis_client
-    if _redis_client:
-        await _redis_client.close()
-        _redis_client = None
+    async def close(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        if self.client is None and self.binary_client is None:
+            return
+        for client in (self.client, self.binary_client):
+            if client is not None:
+                await client.aclose()
+        self.client = None
+        self.binary_client = None
         logger.info("Redis 连接已关闭")
 
 
+# 全局连接管理器
+_manager = RedisManager()
+
+
+def get_redis_manager() -> RedisManager:
+    """获取 Redis 连接管理器"""
+    return _manager
+
+
+async def get_redis(binary: bool = False) -> Redis | None:
+    """
+    获取 Redis 客户端（未配置或熔断中返回 None，调用方需走降级逻辑）
+
+    Args:
+        binary: 返回二进制客户端（响应为 bytes，用于读写 codec 编码的值）
+    """
+    return _manager.get(binary)
+
+
+async def init_redis() -> bool:
+    """建立 Redis 连接（应用启动时调用）"""
+    return await _manager.connect()
+
+
+async def close_redis() -> None:
+    """关闭 Redis 连接"""
+    await _manager.close()
+
+
 # ==================== 分布式锁 ====================
 class DistributedLock:
     """Redis 分布式锁"""
@@ -131,13 +260,14 @@ class DistributedLock:
 
 
 # ==================== 待支付订单管理 ====================
+# 订单数据用 app.utils.codec 编码（保留 Decimal、datetime 等类型），读写使用二进制客户端
 PENDING_ORDERS_KEY = "payment:pending_orders"
 ORDER_TIMEOUT = 15 * 60  # 15分钟
 
 
 async def add_pending_order(order_no: str, payment_provider: str, payment_data: dict) -> bool:
     """添加待支付订单到 Redis"""
-    redis = await get_redis()
+    redis = await get_redis(binary=True)
     if not redis:
         return False
 
@@ -149,7 +279,7 @@ async def add_pending_order(order_no: str, payment_provider: str, payment_data:
             "created_at": time.time(),
             "expires_at": time.time() + ORDER_TIMEOUT,
         }
-        await redis.hset(PENDING_ORDERS_KEY, order_no, json.dumps(data))
+        await redis.hset(PENDING_ORDERS_KEY, order_no, codec.encode(data))
         return True
     except Exception as e:
         logger.error(f"添加待支付订单失败: {e}")
@@ -158,14 +288,14 @@ async def add_pending_order(order_no: str, payment_provider: str, payment_data:
 
 async def get_pending_order(order_no: str) -> dict | None:
     """获取待支付订单"""
-    redis = await get_redis()
+    redis = await get_redis(binary=True)
     if not redis:
         return None
 
     try:
         data = await redis.hget(PENDING_ORDERS_KEY, order_no)
         if data:
-            return json.loads(data)
+            return codec.decode(data)
         return None
     except Exception as e:
         logger.error(f"获取待支付订单失败: {e}")
@@ -174,7 +304,7 @@ async def get_pending_order(order_no: str) -> dict | None:
 
 async def remove_pending_order(order_no: str) -> bool:
     """移除待支付订单"""
-    redis = await get_redis()
+    redis = await get_redis(binary=True)
     if not redis:
         return False
 
@@ -188,7 +318,7 @@ async def remove_pending_order(order_no: str) -> bool:
 
 async def get_all_pending_orders() -> list[dict]:
     """获取所有待支付订单"""
-    redis = await get_redis()
+    redis = await get_redis(binary=True)
     if not redis:
         return []
 
@@ -196,7 +326,7 @@ async def get_all_pending_orders() -> list[dict]:
         all_data = await redis.hgetall(PENDING_ORDERS_KEY)
         orders = []
         for data in all_data.values():
-            orders.append(json.loads(data))
+            orders.append(codec.decode(data))
         return orders
     except Exception as e:
         logger.error(f"获取所有待支付订单失败: {e}")
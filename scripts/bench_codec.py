@@ -0,0 +1,118 @@
+"""缓存编码基准测试脚本
+
+对比原先的 json.dumps/json.loads 与 app.utils.codec 各编码（json / orjson / msgpack）
+在典型缓存数据上的编解码耗时和数据体积。未安装的编码会被跳过。
+
+用法:
+    python scripts/bench_codec.py
+    python scripts/bench_codec.py --rounds 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _product_detail(i: int) -> dict:
+    """与商品详情缓存结构相近的数据（已是 JSON 兼容类型）"""
+    return {
+        "id": i,
+        "name": f"澳门电信 5G 预付卡 #{i}",
+        "slug": f"macau-5g-{i}",
+        "product_type": "virtual",
+        "price": "99.00",
+        "stock": 42,
+        "is_active": True,
+        "sort_order": 0,
+        "created_at": "2025-01-01T00:00:00+00:00",
+        "updated_at": "2025-01-01T00:00:00+00:00",
+        "category": {"id": 1, "name": "电话卡", "slug": "sim", "parent_id": None},
+        "primary_image": f"/uploads/{i}.png",
+        "images": [{"id": j, "url": f"/uploads/{i}-{j}.png", "sort_order": j} for j in range(4)],
+        "tags": [{"id": j, "key": "地区", "value": f"澳门{j}"} for j in range(3)],
+        "intros": [{"id": 1, "title": "使用说明", "content": "<p>" + "说明文字" * 50 + "</p>"}],
+        "payment_methods": [{"id": 1, "name": "USDT", "icon": None}],
+    }
+
+
+def _pending_order(i: int) -> dict:
+    """待支付订单数据（含 Decimal、datetime，原 json 编码不支持）"""
+    return {
+        "order_no": f"ORD{i:010d}",
+        "provider": "trc20",
+        "payment_data": {
+            "amount": Decimal("12.345678"),
+            "address": "TXYZ" + "a" * 30,
+            "created_at": datetime(2025, 1, 1, 12, 0, 0),
+        },
+        "created_at": 1735732800.0,
+        "expires_at": 1735733700.0,
+    }
+
+
+def _measure(encode, decode, value, rounds: int) -> tuple[float, float, int]:
+    data = encode(value)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(value)
+    encode_us = (time.perf_counter() - start) / rounds * 1e6
+    start = time.perf_counter()
+    for _ in range(rounds):
+        decode(data)
+    decode_us = (time.perf_counter() - start) / rounds * 1e6
+    return encode_us, decode_us, len(data)
+
+
+def _report(label: str, result: tuple[float, float, int] | None) -> None:
+    if result is None:
+        print(f"  {label:<14} 不支持")
+        return
+    encode_us, decode_us, size = result
+    print(f"  {label:<14} 编码 {encode_us:8.2f} µs  解码 {decode_us:8.2f} µs  {size:6d} 字节")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="缓存编码基准测试")
+    parser.add_argument("--rounds", type=int, default=5000, help="每项测试的轮数")
+    args = parser.parse_args()
+
+    from app.utils.codec import JsonCodec, MsgpackCodec, OrjsonCodec
+
+    codecs = []
+    for codec_class in (JsonCodec, OrjsonCodec, MsgpackCodec):
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            print(f"{codec_class.name} 未安装，跳过")
+
+    samples = [
+        ("商品详情", _product_detail(1)),
+        ("商品详情 x20", [_product_detail(i) for i in range(20)]),
+        ("待支付订单", _pending_order(1)),
+    ]
+
+    def legacy_encode(value):
+        return json.dumps(value, ensure_ascii=False).encode()
+
+    for label, value in samples:
+        print(f"\n{label}（{args.rounds} 轮）:")
+        try:
+            legacy = _measure(legacy_encode, json.loads, value, args.rounds)
+        except TypeError:
+            legacy = None
+        _report("原 json", legacy)
+        for codec in codecs:
+            decoded = codec.decode(codec.encode(value))
+            assert decoded == value, f"{codec.name} 编解码结果不一致"
+            _report(codec.name, _measure(codec.encode, codec.decode, value, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -51,5 +51,8 @@ fi
 # 3. 初始化管理员 (原逻辑)
 uv run python /app/scripts/init_admin.py
 
+# 4. 校正商品冗余字段：可用库存、主图（新增字段后的回填 / 修复偏差）
+uv run python /app/scripts/reconcile_products.py
+
 echo "启动服务..."
 exec uv run uvicorn app.main:app --host 0.0.0.0 --port 8000
@@ -0,0 +1,60 @@
+"""校正商品冗余字段
+
+- 虚拟商品 Product.available_stock / stock: 随卡密新增/删除/预留/售出在事务中增量维护，
+  按 InventoryItem 实际未售且未预留的数量校正
+- Product.primary_image_url: 随商品图片写入维护，按 product_image 表校正
+
+用于新增字段后的数据回填，以及修复手工改库等原因造成的偏差。
+
+用法:
+    python scripts/reconcile_products.py            # 检查并修复
+    python scripts/reconcile_products.py --dry-run  # 只检查不修复
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+async def reconcile_products(dry_run: bool) -> None:
+    """校正商品冗余字段"""
+    from tortoise import Tortoise
+
+    from app.config import TORTOISE_ORM
+    from app.services.delivery import DeliveryService
+    from app.services.product import reconcile_primary_images
+
+    action = "发现" if dry_run else "已校正"
+    try:
+        await Tortoise.init(config=TORTOISE_ORM)
+
+        drifted = await DeliveryService.reconcile_available_stock(dry_run=dry_run)
+        for product_id, counter, actual in drifted:
+            print(f"商品 {product_id}: 可用库存计数器 {counter}, 实际可用 {actual}")
+        print(f"{action} {len(drifted)} 个商品的可用库存偏差")
+
+        drifted = await reconcile_primary_images(dry_run=dry_run)
+        for product_id, current, expected in drifted:
+            print(f"商品 {product_id}: 主图 {current!r} -> {expected!r}")
+        print(f"{action} {len(drifted)} 个商品的主图偏差")
+
+    except Exception as e:
+        print(f"校正商品数据失败: {e}")
+        # 不抛出异常，允许应用继续启动
+    finally:
+        await Tortoise.close_connections()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="校正商品冗余字段（可用库存、主图）")
+    parser.add_argument("--dry-run", action="store_true", help="只检查不修复")
+    args = parser.parse_args()
+    asyncio.run(reconcile_products(args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
 """测试配置"""
 
+from collections.abc import Callable
+from contextlib import contextmanager
+from decimal import Decimal
+
+import fakeredis
 import pytest
 from httpx import ASGITransport, AsyncClient
-from tortoise import Tortoise
+from tortoise import Tortoise, connections
 
+from app.config import get_settings
+from app.core import idempotency, rate_limit
+from app.core.deps import get_current_admin
+from app.core.middleware import get_response_cache
 from app.main import app
+from app.models.product import InventoryItem, PaymentMethod, Product
+from app.services import category, tag_facet
+from app.utils import cache
+from app.utils.redis_client import get_redis_manager
+
+settings = get_settings()
 
 
 @pytest.fixture(scope="session")
@@ -12,6 +27,23 @@ def anyio_backend():
     return "asyncio"
 
 
+@pytest.fixture(autouse=True)
+def reset_state(monkeypatch):
+    """清理进程内缓存状态，默认关闭限流（限流测试单独开启）"""
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    cache._memory_cache.clear()
+    cache._l1_cache.clear()
+    get_response_cache().entries.clear()
+    idempotency._memory_store.clear()
+    rate_limit._local_buckets.clear()
+    rate_limit.reset_rate_limit_stats()
+    tag_facet._memory_facets.clear()
+    monkeypatch.setattr(tag_facet, "_memory_ready", False)
+    monkeypatch.setattr(tag_facet, "_redis_stale", False)
+    monkeypatch.setattr(category, "_tree", None)
+    monkeypatch.setattr(category, "_tree_version", None)
+
+
 @pytest.fixture(scope="function")
 async def client():
     """测试客户端"""
@@ -20,6 +52,7 @@ async def client():
         db_url="sqlite://:memory:",
         modules={
             "models": [
+                "app.models.admin",
                 "app.models.platform",
                 "app.models.product",
                 "app.models.order",
@@ -35,3 +68,102 @@ async def client():
         yield ac
 
     await Tortoise.close_connections()
+
+
+@pytest.fixture
+def admin():
+    """跳过管理端登录校验"""
+    app.dependency_overrides[get_current_admin] = lambda: None
+    yield
+    app.dependency_overrides.pop(get_current_admin, None)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """用 fakeredis 替代 Redis（支持 Lua 脚本）"""
+    server = fakeredis.FakeServer()
+    text_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    binary_client = fakeredis.FakeAsyncRedis(server=server)
+    monkeypatch.setattr(settings, "redis_url", "redis://fake")
+    monkeypatch.setattr(
+        get_redis_manager(),
+        "get",
+        lambda binary=False: binary_client if binary else text_client,
+    )
+    return text_client
+
+
+@pytest.fixture
+async def payment_method(client) -> PaymentMethod:
+    return await PaymentMethod.create(name="USDT")
+
+
+@pytest.fixture
+def make_product(payment_method) -> Callable:
+    """创建商品，虚拟商品按 cards 数量生成卡密"""
+    counter = 0
+
+    async def factory(
+        product_type: str = "physical", stock: int = 10, cards: int = 0, **kwargs
+    ) -> Product:
+        nonlocal counter
+        counter += 1
+        if product_type == "virtual":
+            stock = cards
+        product = await Product.create(
+            name=kwargs.pop("name", f"商品{counter}"),
+            slug=kwargs.pop("slug", f"product-{counter}"),
+            product_type=product_type,
+            price=kwargs.pop("price", Decimal("9.90")),
+            stock=stock,
+            available_stock=cards,
+            **kwargs,
+        )
+        await product.payment_methods.add(payment_method)
+        for i in range(cards):
+            await InventoryItem.create(product=product, content=f"CARD-{product.id}-{i}")
+        return product
+
+    return factory
+
+
+@pytest.fixture
+def create_order(client, payment_method) -> Callable:
+    """调用前台下单接口"""
+
+    async def factory(*items: tuple[int, int], email: str = "buyer@example.com", **kwargs):
+        return await client.post(
+            "/api/v1/orders",
+            json={
+                "email": email,
+                "payment_method_id": payment_method.id,
+                "items": [{"product_id": pid, "quantity": qty} for pid, qty in items],
+            },
+            **kwargs,
+        )
+
+    return factory
+
+
+@contextmanager
+def count_queries():
+    """统计期间执行的 SQL 语句"""
+    conn = connections.get("default")
+    queries: list[str] = []
+    names = ("execute_query", "execute_query_dict", "execute_insert", "execute_many")
+    originals = {name: getattr(conn, name) for name in names}
+
+    def wrap(original):
+        async def wrapper(query, *args, **kwargs):
+            queries.append(query)
+            return await original(query, *args, **kwargs)
+
+        return wrapper
+
+    for name, original in originals.items():
+        setattr(conn, name, wrap(original))
+    try:
+        yield queries
+    finally:
+        for name, original in originals.items():
+            setattr(conn, name, original)
@@ -0,0 +1,60 @@
+"""虚拟商品可用库存计数器测试"""
+
+from tortoise.transactions import in_transaction
+
+from app.models.order import Order
+from app.models.product import Product
+from app.services.delivery import DeliveryService
+from app.services.inventory import InventoryService
+from app.services.order import OrderService
+
+
+async def test_virtual_order_updates_available_stock(make_product, create_order):
+    product = await make_product("virtual", cards=5)
+
+    response = await create_order((product.id, 2))
+
+    assert response.status_code == 200, response.text
+    assert await DeliveryService.get_virtual_stock_count(product.id) == 3
+    assert (await Product.get(id=product.id)).available_stock == 3
+    assert await DeliveryService.check_virtual_stock(product.id, 4) == (False, 3)
+    assert await DeliveryService.reconcile_available_stock(dry_run=True) == []
+
+
+async def test_virtual_stock_count_of_missing_product(client):
+    assert await DeliveryService.get_virtual_stock_count(999) == 0
+
+
+async def _place_order(create_order, product_id: int, quantity: int) -> Order:
+    response = await create_order((product_id, quantity))
+    return await Order.get(order_no=response.json()["data"]["order_no"])
+
+
+async def _counters(product_id: int) -> tuple[int, int]:
+    product = await Product.get(id=product_id)
+    return product.stock, product.available_stock
+
+
+async def test_selling_released_reservation_adjusts_both_counters(make_product, create_order):
+    product = await make_product("virtual", cards=5)
+    order = await _place_order(create_order, product.id, 2)
+    await InventoryService.release([order.id])
+    assert await _counters(product.id) == (5, 5)
+
+    async with in_transaction():
+        contents = await DeliveryService._sell_inventory(order.id, product.id, 2, product.name)
+
+    assert len(contents) == 2
+    assert await _counters(product.id) == (3, 3)
+    assert await DeliveryService.reconcile_available_stock(dry_run=True) == []
+
+
+async def test_cancel_restores_both_counters(make_product, create_order):
+    product = await make_product("virtual", cards=5)
+    order = await _place_order(create_order, product.id, 2)
+    assert await _counters(product.id) == (3, 3)
+
+    assert await OrderService.cancel_order(order)
+
+    assert await _counters(product.id) == (5, 5)
+    assert await DeliveryService.reconcile_available_stock(dry_run=True) == []
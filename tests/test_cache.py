@@ -0,0 +1,213 @@
+"""缓存工具测试：合并计算、L1 失效广播、命名空间版本、Redis 熔断"""
+
+import asyncio
+import json
+
+import fakeredis
+import pytest
+from fakeredis.aioredis import FakeAsyncRedisConnection
+from redis.asyncio import ConnectionPool
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.config import get_settings
+from app.utils import cache
+from app.utils.redis_client import RedisManager, _ManagedRedis, get_redis
+
+settings = get_settings()
+
+
+async def _eventually(predicate, timeout: float = 2.0) -> bool:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if await predicate():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+async def _subscribed(redis) -> bool:
+    counts = await redis.pubsub_numsub(cache.CACHE_INVALIDATION_CHANNEL)
+    return counts[0][1] > 0
+
+
+async def test_get_or_compute_single_flight(fake_redis):
+    """同一 key 的并发未命中只执行一次 loader"""
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"n": calls}
+
+    results = await asyncio.gather(
+        *(cache.get_or_compute("stampede", loader, ttl=60) for _ in range(20))
+    )
+
+    assert calls == 1
+    assert results == [{"n": 1}] * 20
+    assert not await fake_redis.exists(cache.COMPUTE_LOCK_PREFIX + "stampede")
+    # 之后的读取命中缓存
+    assert await cache.get_or_compute("stampede", loader, ttl=60) == {"n": 1}
+    assert calls == 1
+
+
+async def test_get_or_compute_waits_for_other_worker(fake_redis):
+    """其他 worker 持有计算锁时等待其结果，不重复计算"""
+    await fake_redis.set(cache.COMPUTE_LOCK_PREFIX + "shared", "other", ex=10)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        return "local"
+
+    async def other_worker():
+        await asyncio.sleep(0.1)
+        envelope = {"value": "remote", "delta": 0.1, "expires_at": 4102444800}
+        await cache.cache_set("shared", envelope, 60)
+        await fake_redis.delete(cache.COMPUTE_LOCK_PREFIX + "shared")
+
+    result, _ = await asyncio.gather(
+        cache.get_or_compute("shared", loader, ttl=60, beta=0), other_worker()
+    )
+
+    assert result == "remote"
+    assert calls == 0
+
+
+async def test_invalidation_broadcast_drops_l1(fake_redis):
+    """其他 worker 的失效广播清除本进程 L1，随后读到 Redis 中的新值"""
+    await cache.cache_set("config", "old", 60)
+    assert cache._l1_cache.get("config") == "old"
+
+    await cache.start_cache_invalidation_listener()
+    try:
+        assert await _eventually(lambda: _subscribed(fake_redis))
+        # 订阅时会清空 L1，重新读取填回
+        assert await cache.cache_get("config") == "old"
+        assert cache._l1_cache.get("config") == "old"
+
+        # 模拟另一个 worker: 直接写 Redis 并广播
+        binary = await get_redis(binary=True)
+        await binary.set("config", cache.codec.encode("new"))
+        await fake_redis.publish(
+            cache.CACHE_INVALIDATION_CHANNEL,
+            json.dumps({"origin": "other-worker", "kind": "keys", "items": ["config"]}),
+        )
+
+        async def dropped():
+            return cache._l1_cache.get("config") is None
+
+        assert await _eventually(dropped)
+        assert await cache.cache_get("config") == "new"
+    finally:
+        await cache.stop_cache_invalidation_listener()
+
+
+async def test_own_invalidation_broadcast_ignored(fake_redis):
+    """本进程发出的广播不重复处理"""
+    cache._l1_cache.set("mine", "value", 5)
+    message = json.dumps({"origin": cache._worker_id, "kind": "keys", "items": ["mine"]})
+
+    cache._handle_invalidation(message)
+
+    assert cache._l1_cache.get("mine") == "value"
+
+
+async def test_invalidate_namespace_bumps_version(fake_redis):
+    """命名空间失效后键的版本号递增，旧版本的值不再被读取"""
+    old_key = await cache.namespace_key("test-ns", "item")
+    await cache.cache_set(old_key, "old", 60)
+
+    await cache.invalidate_namespace("test-ns")
+
+    new_key = await cache.namespace_key("test-ns", "item")
+    assert new_key != old_key
+    assert new_key.startswith("test-ns:v")
+    assert await cache.cache_get(new_key) is None
+    assert await fake_redis.get(cache.NAMESPACE_VERSION_PREFIX + "test-ns") == "1"
+
+
+async def test_namespace_version_from_other_worker(fake_redis):
+    """其他 worker 递增版本并广播后，本进程的 L1 版本号失效"""
+    old_key = await cache.namespace_key("shared-ns", "item")
+    version_key = cache.NAMESPACE_VERSION_PREFIX + "shared-ns"
+
+    await fake_redis.incr(version_key)
+    # L1 中的旧版本号在广播到达前仍然有效
+    assert await cache.namespace_key("shared-ns", "item") == old_key
+    cache._handle_invalidation(
+        json.dumps({"origin": "other-worker", "kind": "keys", "items": [version_key]})
+    )
+
+    assert await cache.namespace_key("shared-ns", "item") != old_key
+
+
+async def test_namespace_without_redis():
+    """未配置 Redis 时使用进程内版本号"""
+    old_key = await cache.namespace_key("memory-ns", "item")
+    await cache.cache_set(old_key, "old", 60)
+
+    await cache.invalidate_namespace("memory-ns")
+
+    new_key = await cache.namespace_key("memory-ns", "item")
+    assert new_key != old_key
+    assert await cache.cache_get(new_key) is None
+
+
+@pytest.fixture
+async def breaker(monkeypatch):
+    """连接 fakeredis 的独立连接管理器，server.connected 控制 Redis 是否可用"""
+    monkeypatch.setattr(settings, "redis_url", "redis://fake")
+    monkeypatch.setattr(settings, "redis_breaker_threshold", 2)
+    monkeypatch.setattr(settings, "redis_probe_interval", 0.02)
+    server = fakeredis.FakeServer()
+    manager = RedisManager()
+    client = _ManagedRedis(
+        connection_pool=ConnectionPool(
+            connection_class=FakeAsyncRedisConnection, server=server, decode_responses=True
+        )
+    )
+    client.manager = manager
+    manager.client = client
+    yield manager, server
+    await manager.close()
+
+
+async def test_breaker_opens_after_failures(breaker):
+    """连续连接失败达到阈值后熔断，get() 返回 None"""
+    manager, server = breaker
+    server.connected = False
+
+    for _ in range(settings.redis_breaker_threshold):
+        with pytest.raises(RedisConnectionError):
+            await manager.client.get("key")
+
+    assert manager.is_open
+    assert manager.get() is None
+    assert manager.stats()["circuit_open"] is True
+
+
+async def test_breaker_recovers_after_probe(breaker):
+    """熔断期间探测失败保持熔断，Redis 恢复后探测成功闭合熔断"""
+    manager, server = breaker
+    server.connected = False
+    for _ in range(settings.redis_breaker_threshold):
+        with pytest.raises(RedisConnectionError):
+            await manager.client.ping()
+    assert manager.is_open
+
+    # 探测仍失败：保持熔断
+    await asyncio.sleep(settings.redis_probe_interval * 3)
+    assert manager.is_open
+
+    server.connected = True
+
+    async def closed():
+        return not manager.is_open
+
+    assert await _eventually(closed)
+    assert manager.failures == 0
+    assert manager.get() is manager.client
+    assert await manager.get().set("key", "value")
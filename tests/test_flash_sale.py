@@ -0,0 +1,104 @@
+"""秒杀模式测试"""
+
+import asyncio
+
+from app.models.order import Order
+from app.models.product import Product
+from app.services.flash_sale import (
+    FLASH_PENDING_KEY,
+    FlashItem,
+    FlashSaleService,
+)
+
+
+def _stock_key(product_id: int) -> str:
+    return f"flash:stock:{product_id}"
+
+
+async def test_acquire_in_redis_and_flush_in_batch(fake_redis, make_product, create_order):
+    product = await make_product(stock=10)
+    await FlashSaleService.enable(product.id)
+    assert await fake_redis.get(_stock_key(product.id)) == "10"
+
+    responses = await asyncio.gather(*[create_order((product.id, 1)) for _ in range(13)])
+
+    assert sorted(r.status_code for r in responses) == [200] * 10 + [400] * 3
+    assert await fake_redis.get(_stock_key(product.id)) == "0"
+    # 写回前不更新 product 行
+    assert (await Product.get(id=product.id)).stock == 10
+    assert await fake_redis.hget(FLASH_PENDING_KEY, str(product.id)) == "10"
+
+    assert await FlashSaleService.flush() == 1
+    assert (await Product.get(id=product.id)).stock == 0
+    assert not await fake_redis.exists(FLASH_PENDING_KEY)
+
+
+async def test_cancel_restocks_counter(client, fake_redis, make_product, create_order):
+    product = await make_product(stock=5)
+    await FlashSaleService.enable(product.id)
+    response = await create_order((product.id, 2))
+    order = await Order.get(order_no=response.json()["data"]["order_no"])
+
+    response = await client.post(
+        f"/api/v1/orders/{order.order_no}/cancel", params={"email": order.email}
+    )
+
+    assert response.status_code == 200
+    assert await fake_redis.get(_stock_key(product.id)) == "5"
+    await FlashSaleService.flush()
+    assert (await Product.get(id=product.id)).stock == 5
+
+
+async def test_failed_order_restocks_counter(fake_redis, make_product, create_order):
+    product = await make_product("virtual", cards=2)
+    await FlashSaleService.enable(product.id)
+    # 计数器高于实际卡密数时，由数据库预留兜底，失败后加回计数器
+    await fake_redis.set(_stock_key(product.id), 5)
+
+    response = await create_order((product.id, 3))
+
+    assert response.status_code == 400
+    assert await fake_redis.get(_stock_key(product.id)) == "5"
+    assert (await Product.get(id=product.id)).available_stock == 2
+
+
+async def test_restock_without_counter_updates_database(fake_redis, make_product):
+    product = await make_product(stock=3)
+
+    await FlashSaleService.restock([FlashItem(product.id, 2, persist=True)])
+
+    assert (await Product.get(id=product.id)).stock == 5
+
+
+async def test_missing_counter_rejected_until_reconciled(fake_redis, make_product, create_order):
+    product = await make_product(stock=4)
+    await FlashSaleService.enable(product.id)
+    await fake_redis.delete(_stock_key(product.id))
+
+    assert (await create_order((product.id, 1))).status_code == 503
+
+    await FlashSaleService.reconcile()
+    assert await fake_redis.get(_stock_key(product.id)) == "4"
+    assert (await create_order((product.id, 1))).status_code == 200
+
+
+async def test_disable_flushes_and_removes_counter(fake_redis, make_product, create_order):
+    product = await make_product(stock=4)
+    await FlashSaleService.enable(product.id)
+    assert (await create_order((product.id, 3))).status_code == 200
+
+    await FlashSaleService.disable(product.id)
+
+    refreshed = await Product.get(id=product.id)
+    assert not refreshed.is_flash_sale and refreshed.stock == 1
+    assert not await fake_redis.exists(_stock_key(product.id))
+    assert (await create_order((product.id, 2))).status_code == 400
+
+
+async def test_admin_toggle_requires_redis(client, admin, make_product):
+    product = await make_product()
+
+    response = await client.put(f"/api/admin/products/{product.id}", json={"is_flash_sale": True})
+
+    assert response.status_code == 400
+    assert not (await Product.get(id=product.id)).is_flash_sale
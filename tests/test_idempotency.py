@@ -0,0 +1,113 @@
+"""幂等键测试"""
+
+import asyncio
+import base64
+import json
+
+from app.core.idempotency import _fingerprint
+from app.models.order import Order
+from app.models.product import Product
+
+
+async def test_replay_returns_first_response(make_product, create_order):
+    product = await make_product(stock=10)
+    headers = {"Idempotency-Key": "order-1"}
+
+    first = await create_order((product.id, 1), headers=headers)
+    replay = await create_order((product.id, 1), headers=headers)
+
+    assert first.status_code == replay.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert replay.json() == first.json()
+    assert await Order.all().count() == 1
+    assert (await Product.get(id=product.id)).stock == 9
+
+
+async def test_key_reused_with_different_body(make_product, create_order):
+    product = await make_product(stock=10)
+    headers = {"Idempotency-Key": "order-1"}
+    await create_order((product.id, 1), headers=headers)
+
+    response = await create_order((product.id, 2), headers=headers)
+
+    assert response.status_code == 422
+    assert await Order.all().count() == 1
+
+
+async def test_concurrent_duplicates_wait_for_first(make_product, create_order, monkeypatch):
+    product = await make_product(stock=10)
+    create = Order.create
+
+    async def slow_create(**kwargs):
+        await asyncio.sleep(0.05)
+        return await create(**kwargs)
+
+    monkeypatch.setattr(Order, "create", slow_create)
+    headers = {"Idempotency-Key": "order-1"}
+
+    responses = await asyncio.gather(
+        *[create_order((product.id, 1), headers=headers) for _ in range(5)]
+    )
+
+    assert all(r.status_code == 200 for r in responses)
+    assert len({r.json()["data"]["order_no"] for r in responses}) == 1
+    assert sum("idempotent-replayed" in r.headers for r in responses) == 4
+    assert await Order.all().count() == 1
+
+
+async def test_server_error_is_not_stored(make_product, create_order, monkeypatch):
+    from app.api.v1 import order as order_api
+    from app.core.exceptions import ServiceUnavailableException
+
+    product = await make_product(stock=10)
+    create_records = order_api._create_order_records
+
+    async def unavailable(*args, **kwargs):
+        raise ServiceUnavailableException()
+
+    headers = {"Idempotency-Key": "order-1"}
+    monkeypatch.setattr(order_api, "_create_order_records", unavailable)
+    assert (await create_order((product.id, 1), headers=headers)).status_code == 503
+
+    monkeypatch.setattr(order_api, "_create_order_records", create_records)
+    response = await create_order((product.id, 1), headers=headers)
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+
+
+async def test_waits_for_request_on_other_worker(client, fake_redis, payment_method):
+    body = {
+        "email": "buyer@example.com",
+        "payment_method_id": payment_method.id,
+        "items": [{"product_id": 1, "quantity": 1}],
+    }
+    raw = json.dumps(body).encode()
+    scope = {"method": "POST", "path": "/api/v1/orders", "query_string": b""}
+    key = "idempotency:/api/v1/orders:order-1"
+    record = {"state": "processing", "fingerprint": _fingerprint(scope, raw)}
+    await fake_redis.set(key, json.dumps(record))
+
+    async def finish_elsewhere():
+        await asyncio.sleep(0.1)
+        done = {
+            **record,
+            "state": "done",
+            "status": 200,
+            "headers": [["content-type", "application/json"]],
+            "body": base64.b64encode(b'{"code":200}').decode(),
+        }
+        await fake_redis.set(key, json.dumps(done))
+
+    task = asyncio.create_task(finish_elsewhere())
+    response = await client.post(
+        "/api/v1/orders",
+        content=raw,
+        headers={"Idempotency-Key": "order-1", "Content-Type": "application/json"},
+    )
+    await task
+
+    assert response.status_code == 200
+    assert response.json() == {"code": 200}
+    assert response.headers["idempotent-replayed"] == "true"
+    assert await Order.all().count() == 0
@@ -0,0 +1,89 @@
+"""虚拟商品卡密预留测试"""
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+from app.models.order import Order
+from app.models.product import InventoryItem, Product
+from app.schemas.order import OrderStatus
+from app.services.payment.timeout import OrderTimeoutTask
+
+
+async def _expire(order_id: int) -> None:
+    await InventoryItem.filter(reserved_by_order_id=order_id).update(
+        reserved_until=datetime.now(UTC) - timedelta(seconds=1)
+    )
+
+
+async def test_expired_reservation_released_without_redis(make_product, create_order):
+    product = await make_product("virtual", cards=3)
+    response = await create_order((product.id, 2))
+    order = await Order.get(order_no=response.json()["data"]["order_no"])
+    await _expire(order.id)
+
+    task = OrderTimeoutTask()
+    await task.start()
+    try:
+        for _ in range(50):
+            if (await Order.get(id=order.id)).status == OrderStatus.CANCELLED:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await task.stop()
+
+    assert (await Order.get(id=order.id)).status == OrderStatus.CANCELLED
+    assert not await InventoryItem.filter(reserved_by_order_id=order.id).exists()
+    assert (await Product.get(id=product.id)).available_stock == 3
+
+
+async def _order(create_order, product_id: int, quantity: int) -> Order:
+    response = await create_order((product_id, quantity))
+    assert response.status_code == 200, response.text
+    return await Order.get(order_no=response.json()["data"]["order_no"])
+
+
+async def test_order_reserves_cards(make_product, create_order):
+    product = await make_product("virtual", cards=5)
+
+    order = await _order(create_order, product.id, 2)
+
+    reserved = await InventoryItem.filter(reserved_by_order_id=order.id)
+    assert len(reserved) == 2
+    assert all(item.reserved_until and not item.is_sold for item in reserved)
+    assert (await Product.get(id=product.id)).available_stock == 3
+    # 已预留的卡密不能被其他订单再次预留
+    assert (await create_order((product.id, 4))).status_code == 400
+
+
+async def test_cancel_releases_reserved_cards(client, make_product, create_order):
+    product = await make_product("virtual", cards=3)
+    order = await _order(create_order, product.id, 3)
+
+    response = await client.post(
+        f"/api/v1/orders/{order.order_no}/cancel", params={"email": order.email}
+    )
+
+    assert response.status_code == 200
+    assert not await InventoryItem.filter(reserved_by_order_id__isnull=False).exists()
+    assert (await Product.get(id=product.id)).available_stock == 3
+
+
+async def test_delivery_sells_own_reserved_cards(make_product, create_order):
+    from app.services.delivery import DeliveryService
+
+    product = await make_product("virtual", cards=4)
+    first = await _order(create_order, product.id, 2)
+    second = await _order(create_order, product.id, 2)
+    second_cards = set(
+        await InventoryItem.filter(reserved_by_order_id=second.id).values_list("id", flat=True)
+    )
+
+    success, message, _ = await DeliveryService.deliver_order(first)
+
+    assert success, message
+    sold = await InventoryItem.filter(is_sold=True).values_list("id", "reserved_by_order_id")
+    assert len(sold) == 2
+    assert all(order_id == first.id for _, order_id in sold)
+    assert not second_cards & {item_id for item_id, _ in sold}
+    assert (await Product.get(id=product.id)).available_stock == 0
+    assert await DeliveryService.reconcile_available_stock(dry_run=True) == []
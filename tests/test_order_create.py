@@ -0,0 +1,59 @@
+"""下单扣减库存测试"""
+
+import asyncio
+
+from app.models.order import Order, OrderItem
+from app.models.product import Product
+
+
+async def test_order_decrements_stock_per_product(make_product, create_order):
+    product = await make_product(stock=10)
+
+    response = await create_order((product.id, 2), (product.id, 3))
+
+    assert response.status_code == 200, response.text
+    data = response.json()["data"]
+    assert [item["quantity"] for item in data["items"]] == [2, 3]
+    assert all(item["id"] for item in data["items"])
+    assert (await Product.get(id=product.id)).stock == 5
+
+
+async def test_short_stock_rejected(make_product, create_order):
+    product = await make_product(stock=2)
+
+    response = await create_order((product.id, 3))
+
+    assert response.status_code == 400
+    assert (await Product.get(id=product.id)).stock == 2
+    assert await Order.all().count() == 0
+
+
+async def test_failed_decrement_rolls_back_whole_order(make_product, create_order, monkeypatch):
+    first = await make_product(stock=10)
+    second = await make_product(stock=1)
+    create = Order.create
+
+    async def create_after_concurrent_sale(**kwargs):
+        # 校验通过后、扣减前库存被并发订单买走
+        await Product.filter(id=second.id).update(stock=0)
+        return await create(**kwargs)
+
+    monkeypatch.setattr(Order, "create", create_after_concurrent_sale)
+
+    response = await create_order((first.id, 1), (second.id, 1))
+
+    assert response.status_code == 400
+    assert (await Product.get(id=first.id)).stock == 10
+    assert (await Product.get(id=second.id)).stock == 1
+    assert await Order.all().count() == 0
+    assert await OrderItem.all().count() == 0
+
+
+async def test_concurrent_orders_do_not_oversell(make_product, create_order):
+    product = await make_product(stock=3)
+
+    responses = await asyncio.gather(*[create_order((product.id, 1)) for _ in range(6)])
+
+    assert sorted(r.status_code for r in responses) == [200] * 3 + [400] * 3
+    assert (await Product.get(id=product.id)).stock == 0
+    assert await Order.all().count() == 3
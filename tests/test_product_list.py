@@ -0,0 +1,88 @@
+"""商品列表测试"""
+
+from tortoise import connections
+
+from app.api.v1.product import PRODUCT_LIST_ORDER
+from app.core.middleware import get_response_cache
+from app.models.product import Category, Product, ProductTag
+from app.services.product import ensure_product_list_index
+from tests.conftest import count_queries
+
+
+async def _list_products_queries(client, params: dict | None = None) -> int:
+    # 绕过响应缓存，统计实际查询
+    get_response_cache().entries.clear()
+    with count_queries() as queries:
+        response = await client.get("/api/v1/products", params=params)
+    assert response.status_code == 200, response.text
+    return len(queries)
+
+
+async def _make_products(make_product, count: int) -> None:
+    category = await Category.create(name="游戏", slug=f"game-{count}")
+    for i in range(count):
+        product = await make_product(category=category)
+        await ProductTag.create(product=product, key="platform", value="PC端")
+        await ProductTag.create(product=product, key="region", value=f"区{i}")
+
+
+async def test_list_query_count_independent_of_page_size(client, make_product):
+    await _make_products(make_product, 1)
+    single = await _list_products_queries(client)
+
+    await _make_products(make_product, 19)
+    many = await _list_products_queries(client)
+
+    assert many == single
+
+
+async def test_cursor_list_query_count_independent_of_page_size(client, make_product):
+    await _make_products(make_product, 1)
+    single = await _list_products_queries(client, {"cursor": ""})
+
+    await _make_products(make_product, 19)
+    many = await _list_products_queries(client, {"cursor": ""})
+
+    assert many == single
+
+
+async def test_admin_list_query_count_independent_of_page_size(client, admin, make_product):
+    await _make_products(make_product, 1)
+    with count_queries() as single:
+        assert (await client.get("/api/admin/products")).status_code == 200
+
+    await _make_products(make_product, 19)
+    with count_queries() as many:
+        assert (await client.get("/api/admin/products")).status_code == 200
+
+    assert len(many) == len(single)
+
+
+async def test_cursor_pages_follow_list_order(client, make_product):
+    for i in range(7):
+        product = await make_product(sort_order=i % 2)
+    # created_at 相同的商品由 id 区分先后
+    await Product.filter(id__lte=product.id - 2).update(created_at=product.created_at)
+    response = await client.get("/api/v1/products", params={"page_size": 100})
+    expected = [item["id"] for item in response.json()["data"]["items"]]
+
+    ids, cursor = [], ""
+    while cursor is not None:
+        response = await client.get("/api/v1/products", params={"cursor": cursor, "page_size": 2})
+        data = response.json()["data"]
+        ids += [item["id"] for item in data["items"]]
+        cursor = data["next_cursor"]
+
+    assert ids == expected
+    assert len(ids) == 7
+
+
+async def test_list_order_uses_index_without_sorting(client):
+    await ensure_product_list_index()
+    sql = Product.all().order_by(*PRODUCT_LIST_ORDER).limit(20).sql(params_inline=True)
+
+    rows = await connections.get("default").execute_query_dict(f"EXPLAIN QUERY PLAN {sql}")
+    plan = " | ".join(row["detail"] for row in rows)
+
+    assert "idx_product_list_order" in plan
+    assert "TEMP B-TREE" not in plan
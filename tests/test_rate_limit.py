@@ -0,0 +1,104 @@
+"""限流测试"""
+
+import pytest
+
+from app.config import get_settings
+from app.core import rate_limit
+
+
+@pytest.fixture(autouse=True)
+def enable_rate_limit(monkeypatch):
+    monkeypatch.setattr(get_settings(), "rate_limit_enabled", True)
+    monkeypatch.setattr(get_settings(), "rate_limit_trust_proxy", True)
+
+
+def use_rules(monkeypatch, **rules: str) -> None:
+    monkeypatch.setattr(
+        rate_limit, "_rules", [rate_limit._parse_rule(name, spec) for name, spec in rules.items()]
+    )
+
+
+async def _get_order(client, ip: str = "10.0.0.1"):
+    return await client.get(
+        "/api/v1/orders/CS0001", params={"email": "a@b.com"}, headers={"X-Real-IP": ip}
+    )
+
+
+async def _assert_limited(client) -> None:
+    assert (await _get_order(client)).status_code == 404
+    assert (await _get_order(client)).status_code == 404
+
+    response = await _get_order(client)
+
+    assert response.status_code == 429
+    assert response.json()["code"] == 429
+    assert int(response.headers["retry-after"]) >= 1
+    # 其他IP使用独立的桶
+    assert (await _get_order(client, "10.0.0.2")).status_code == 404
+
+    stats = rate_limit.get_rate_limit_stats()["rules"]["GET /api/v1/orders/{order_no}"]
+    assert stats["allowed"] == 3
+    assert stats["limited_by"] == {"ip": 1}
+
+
+async def test_order_create_limited_by_email(client, make_product, create_order):
+    product = await make_product(stock=100)
+
+    for _ in range(5):
+        assert (await create_order((product.id, 1))).status_code == 200
+    response = await create_order((product.id, 1))
+
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    assert (await create_order((product.id, 1), email="other@example.com")).status_code == 200
+
+
+async def test_in_process_fallback_without_redis(client, monkeypatch):
+    use_rules(monkeypatch, **{"GET /api/v1/orders/{order_no}": "ip:2/60"})
+    await _assert_limited(client)
+
+    assert rate_limit.get_rate_limit_stats()["fallbacks"] == 4
+
+
+async def test_redis_token_bucket(client, fake_redis, monkeypatch):
+    use_rules(monkeypatch, **{"GET /api/v1/orders/{order_no}": "ip:2/60"})
+    await _assert_limited(client)
+
+    assert rate_limit.get_rate_limit_stats()["fallbacks"] == 0
+    assert await fake_redis.keys("ratelimit:*")
+
+
+async def test_email_dimension_does_not_consume_ip_tokens(client, payment_method, monkeypatch):
+    use_rules(monkeypatch, **{"POST /api/v1/orders/query": "ip:3/60,email:1/60"})
+
+    async def query(email: str):
+        return await client.post("/api/v1/orders/query", json={"email": email})
+
+    assert (await query("a@b.com")).status_code == 200
+    assert (await query("a@b.com")).status_code == 429
+    assert (await query("b@b.com")).status_code == 200
+    assert (await query("c@b.com")).status_code == 200
+    assert (await query("d@b.com")).status_code == 429
+
+
+def test_invalid_rule_rejected():
+    with pytest.raises(ValueError):
+        rate_limit._parse_rule("GET /api/v1/orders", "user:1/60")
+
+
+def _scope(*headers: tuple[bytes, bytes]) -> dict:
+    return {"headers": list(headers), "client": ("203.0.113.9", 50000)}
+
+
+def test_client_ip_ignores_headers_unless_proxy_trusted(monkeypatch):
+    monkeypatch.setattr(get_settings(), "rate_limit_trust_proxy", False)
+
+    scope = _scope((b"x-real-ip", b"10.0.0.1"), (b"x-forwarded-for", b"10.0.0.2"))
+
+    assert rate_limit._client_ip(scope) == "203.0.113.9"
+
+
+def test_client_ip_uses_rightmost_forwarded_hop():
+    scope = _scope((b"x-forwarded-for", b"1.2.3.4, 198.51.100.7"))
+
+    assert rate_limit._client_ip(scope) == "198.51.100.7"
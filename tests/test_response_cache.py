@@ -0,0 +1,74 @@
+"""响应缓存测试"""
+
+from datetime import UTC, datetime, timedelta
+
+from app.models.order import Order
+from app.models.product import InventoryItem
+from app.schemas.order import OrderStatus
+from app.services.payment.timeout import OrderTimeoutTask
+
+
+async def test_product_detail_shows_live_stock(client, make_product, create_order):
+    product = await make_product("virtual", cards=5)
+
+    response = await client.get(f"/api/v1/products/{product.slug}")
+    assert response.json()["data"]["stock"] == 5
+    assert "x-cache" not in response.headers
+
+    assert (await create_order((product.id, 2))).status_code == 200
+
+    response = await client.get(f"/api/v1/products/{product.slug}")
+    assert response.json()["data"]["stock"] == 3
+
+
+async def test_product_list_is_cached(client, make_product):
+    await make_product()
+
+    first = await client.get("/api/v1/products")
+    second = await client.get("/api/v1/products")
+
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json()
+
+
+async def _list_stock(client, product_id: int) -> tuple[int, str]:
+    response = await client.get("/api/v1/products")
+    item = next(p for p in response.json()["data"]["items"] if p["id"] == product_id)
+    return item["stock"], response.headers["x-cache"]
+
+
+async def test_product_list_stock_follows_orders(client, make_product, create_order):
+    """下单、取消订单后商品列表不再返回缓存中的旧库存"""
+    product = await make_product("virtual", cards=5)
+    assert await _list_stock(client, product.id) == (5, "MISS")
+    assert await _list_stock(client, product.id) == (5, "HIT")
+
+    response = await create_order((product.id, 2))
+    assert response.status_code == 200
+    assert await _list_stock(client, product.id) == (3, "MISS")
+
+    order_no = response.json()["data"]["order_no"]
+    response = await client.post(
+        f"/api/v1/orders/{order_no}/cancel", params={"email": "buyer@example.com"}
+    )
+    assert response.status_code == 200
+    assert await _list_stock(client, product.id) == (5, "MISS")
+
+
+async def test_product_list_stock_follows_reservation_release(client, make_product, create_order):
+    """释放过期预留后商品列表不再返回缓存中的旧库存"""
+    product = await make_product("virtual", cards=5)
+    response = await create_order((product.id, 2))
+    order = await Order.get(order_no=response.json()["data"]["order_no"])
+    # 残留预留: 订单已不在待支付、待发货状态
+    await Order.filter(id=order.id).update(status=OrderStatus.COMPLETED)
+    await InventoryItem.filter(reserved_by_order_id=order.id).update(
+        reserved_until=datetime.now(UTC) - timedelta(seconds=1)
+    )
+    assert await _list_stock(client, product.id) == (3, "MISS")
+    assert await _list_stock(client, product.id) == (3, "HIT")
+
+    await OrderTimeoutTask()._check_expired_reservations()
+
+    assert await _list_stock(client, product.id) == (5, "MISS")
@@ -0,0 +1,60 @@
+"""商品搜索测试"""
+
+import pytest
+
+from app.config import get_settings
+from app.models.product import Product
+from app.services import search
+from app.services.search import SQLiteFTSSearchBackend
+
+
+@pytest.fixture
+async def fts_backend(client, monkeypatch):
+    backend = SQLiteFTSSearchBackend()
+    await backend.setup()
+    monkeypatch.setattr(search, "_backend", backend)
+    monkeypatch.setattr(get_settings(), "search_max_results", 2)
+    return backend
+
+
+async def _search_names(client, keyword: str) -> list[str]:
+    response = await client.get("/api/v1/products", params={"search": keyword})
+    assert response.status_code == 200, response.text
+    return [item["name"] for item in response.json()["data"]["items"]]
+
+
+async def test_result_cap_applies_after_filters(client, fts_backend, make_product):
+    # 下架商品名称更短，bm25 得分更高，不应占满结果上限
+    for i in range(3):
+        await make_product(name=f"游戏月卡{i}", is_active=False)
+    await make_product(name="游戏月卡 充值 在售")
+    await fts_backend.rebuild()
+
+    assert await _search_names(client, "月卡") == ["游戏月卡 充值 在售"]
+    assert await _search_names(client, "游戏月卡") == ["游戏月卡 充值 在售"]
+
+
+async def test_short_keyword_follows_list_order(client, fts_backend, make_product):
+    await make_product(name="会员A", sort_order=3)
+    await make_product(name="会员B", sort_order=1)
+    await make_product(name="会员C", sort_order=2)
+    await fts_backend.rebuild()
+
+    assert await _search_names(client, "会员") == ["会员B", "会员C"]
+
+
+async def test_failed_index_write_rolls_back_product_update(
+    client, admin, fts_backend, make_product, monkeypatch
+):
+    product = await make_product(name="游戏月卡")
+    await fts_backend.rebuild()
+
+    async def broken_index(product_id: int, name: str) -> None:
+        raise RuntimeError("index write failed")
+
+    monkeypatch.setattr(fts_backend, "index_product", broken_index)
+    with pytest.raises(RuntimeError):
+        await client.put(f"/api/admin/products/{product.id}", json={"name": "游戏季卡"})
+
+    assert (await Product.get(id=product.id)).name == "游戏月卡"
+    assert await _search_names(client, "游戏月卡") == ["游戏月卡"]
@@ -0,0 +1,75 @@
+"""标签筛选索引测试"""
+
+from app.models.product import ProductTag
+from app.services.tag_facet import (
+    FACET_READY_KEY,
+    add_product_tags,
+    get_tag_facets,
+    remove_product_tags,
+)
+from app.utils.redis_client import get_redis_manager
+
+
+async def test_memory_index_not_stale_after_redis_outage(
+    client, make_product, fake_redis, monkeypatch
+):
+    manager = get_redis_manager()
+    redis_get = manager.get
+    product = await make_product()
+    await ProductTag.create(product=product, key="platform", value="PC端")
+
+    # Redis 熔断期间建立内存索引
+    monkeypatch.setattr(manager, "get", lambda binary=False: None)
+    assert await get_tag_facets() == [{"key": "platform", "values": ["PC端"]}]
+
+    # Redis 恢复后的增量变更只写入 Redis
+    monkeypatch.setattr(manager, "get", redis_get)
+    await ProductTag.filter(product=product).update(value="移动端")
+    await remove_product_tags(product.id, [("platform", "PC端")])
+    await add_product_tags(product.id, [("platform", "移动端")])
+    assert await get_tag_facets() == [{"key": "platform", "values": ["移动端"]}]
+
+    # 再次回退到内存时不应返回熔断前的旧索引
+    monkeypatch.setattr(manager, "get", lambda binary=False: None)
+    assert await get_tag_facets() == [{"key": "platform", "values": ["移动端"]}]
+
+
+async def _change_tag_during_outage(product, manager, monkeypatch) -> None:
+    """Redis 索引就绪后，在熔断期间把商品标签从 PC端 改为 移动端"""
+    await ProductTag.create(product=product, key="platform", value="PC端")
+    assert await get_tag_facets() == [{"key": "platform", "values": ["PC端"]}]
+
+    redis_get = manager.get
+    monkeypatch.setattr(manager, "get", lambda binary=False: None)
+    await ProductTag.filter(product=product).update(value="移动端")
+    await remove_product_tags(product.id, [("platform", "PC端")])
+    await add_product_tags(product.id, [("platform", "移动端")])
+    assert await get_tag_facets() == [{"key": "platform", "values": ["移动端"]}]
+    monkeypatch.setattr(manager, "get", redis_get)
+
+
+async def test_redis_index_rebuilt_on_first_read_after_outage(
+    client, make_product, fake_redis, monkeypatch
+):
+    product = await make_product()
+    await _change_tag_during_outage(product, get_redis_manager(), monkeypatch)
+
+    assert await get_tag_facets() == [{"key": "platform", "values": ["移动端"]}]
+
+
+async def test_redis_index_invalidated_on_first_write_after_outage(
+    client, make_product, fake_redis, monkeypatch
+):
+    product = await make_product()
+    await _change_tag_during_outage(product, get_redis_manager(), monkeypatch)
+
+    # 恢复后的首次写入删除就绪标记，其他 worker 读取时重建
+    other = await make_product()
+    await ProductTag.create(product=other, key="region", value="国服")
+    await add_product_tags(other.id, [("region", "国服")])
+
+    assert not await fake_redis.exists(FACET_READY_KEY)
+    assert await get_tag_facets() == [
+        {"key": "platform", "values": ["移动端"]},
+        {"key": "region", "values": ["国服"]},
+    ]